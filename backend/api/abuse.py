@@ -0,0 +1,106 @@
+import logging
+import math
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from threading import Lock
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from . import metrics
+from .models import BlockEntry
+
+logger = logging.getLogger(__name__)
+
+MAX_BLOCK_DOUBLINGS = 6
+
+
+class AbuseDetector:
+    """
+    Per-IP violation scores that halve every half_life seconds. At most
+    max_tracked IPs are kept; the least recently seen one is evicted first,
+    which is also the one whose score has decayed the most.
+    """
+
+    def __init__(self, threshold=None, half_life=None, max_tracked=None):
+        self.threshold = threshold or getattr(settings, "ABUSE_SCORE_THRESHOLD", 50)
+        self.half_life = half_life or getattr(settings, "ABUSE_HALF_LIFE_SECONDS", 600)
+        self.max_tracked = max_tracked or getattr(settings, "ABUSE_MAX_TRACKED_IPS", 10000)
+        self.lock = Lock()
+        self.scores = OrderedDict()
+
+    def decayed(self, score, last_seen, now):
+        return score * math.pow(0.5, (now - last_seen) / self.half_life)
+
+    def score(self, ip, now=None):
+        now = now if now is not None else time.monotonic()
+        with self.lock:
+            entry = self.scores.get(ip)
+            return self.decayed(*entry, now) if entry else 0.0
+
+    def record(self, ip, weight=1.0, now=None):
+        """Adds a violation; returns the new score if it crossed the threshold, else None."""
+        if not ip:
+            return None
+        now = now if now is not None else time.monotonic()
+        with self.lock:
+            entry = self.scores.pop(ip, None)
+            score = (self.decayed(*entry, now) if entry else 0.0) + weight
+            if score >= self.threshold:
+                return score
+            self.scores[ip] = (score, now)
+            while len(self.scores) > self.max_tracked:
+                self.scores.popitem(last=False)
+        return None
+
+
+detector = AbuseDetector()
+
+
+def block_duration(strikes):
+    """Base duration, doubled for every earlier automatic block of the same IP."""
+    base = getattr(settings, "ABUSE_BLOCK_SECONDS", 3600)
+    return timedelta(seconds=base * 2 ** min(strikes, MAX_BLOCK_DOUBLINGS))
+
+
+def promote_offender(ip, score, now=None):
+    """
+    Creates (or re-arms) a time-limited BlockEntry for the IP. Manual entries
+    without an expiry are left alone.
+    """
+    now = now or timezone.now()
+    if BlockEntry.objects.filter(type="ip", value=ip, is_active=True).filter(
+        Q(expires_at__isnull=True) | Q(expires_at__gt=now)
+    ).exists():
+        return None
+    entry = BlockEntry.objects.filter(type="ip", value=ip).first()
+    if entry is None:
+        entry = BlockEntry(type="ip", value=ip)
+    reason = f"Auto: rate limit abuse (score {score:.0f})"
+    entry.reason = reason
+    entry.is_active = True
+    entry.expires_at = now + block_duration(entry.strikes)
+    entry.strikes += 1
+    entry.save()
+    metrics.inc("abuse_auto_blocks")
+    logger.warning(f"Auto-blocked {ip} until {entry.expires_at:%Y-%m-%d %H:%M} ({reason})")
+    return entry
+
+
+def record_violation(ip, weight=1.0):
+    score = detector.record(ip, weight)
+    if score is None:
+        return None
+    try:
+        return promote_offender(ip, score)
+    except Exception as e:
+        logger.error(f"Auto-block failed for {ip}: {e}")
+        return None
+
+
+def expire_block_entries(now=None):
+    """Deactivates BlockEntry rows whose expiry has passed; returns how many."""
+    now = now or timezone.now()
+    return BlockEntry.objects.filter(is_active=True, expires_at__lte=now).update(is_active=False)
@@ -37,9 +37,9 @@ class AIKeyForm(forms.ModelForm):
 @admin.register(AIKey)
 class AIKeyAdmin(admin.ModelAdmin):
     form = AIKeyForm
-    list_display = ('provider', 'get_masked_key', 'is_active', 'error_count', 'last_used', 'created_at')
+    list_display = ('provider', 'get_masked_key', 'is_active', 'success_count', 'error_count', 'token_count', 'last_used', 'created_at')
     list_filter = ('provider', 'is_active')
-    readonly_fields = ('last_used', 'error_count')
+    readonly_fields = ('last_used', 'error_count', 'success_count', 'token_count', 'total_latency', 'cooldown_until')
     change_list_template = "admin/api/aikey/change_list.html"  # We'll create this to add the button
     actions = ['export_as_json', 'reset_error_counts']
     
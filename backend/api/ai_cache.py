@@ -0,0 +1,73 @@
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from . import metrics
+from .models import AIResult
+
+DEFAULT_TTLS = {
+    "seo": 7 * 24 * 3600,
+    "inbox": 30 * 24 * 3600,
+    "write:excerpt": 24 * 3600,
+    "write:project_description": 24 * 3600,
+}
+
+
+def task_ttl(task):
+    """Seconds a task's answers are kept, or None for tasks that are never cached."""
+    if not task or not getattr(settings, "AI_CACHE_ENABLED", True):
+        return None
+    return getattr(settings, "AI_CACHE_TTLS", DEFAULT_TTLS).get(task)
+
+
+def normalize(text):
+    # Prompts are indented f-strings; whitespace never changes the answer.
+    return " ".join((text or "").split())
+
+
+def cache_key(task, provider, model, prompt, system_instruction=None):
+    instruction_hash = hashlib.sha256(normalize(system_instruction).encode()).hexdigest()
+    raw = "\0".join([task, provider, model, normalize(prompt), instruction_hash])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def lookup(key, task):
+    """The cached answer for key, or None; counts a hit or miss for the task."""
+    now = timezone.now()
+    row = AIResult.objects.filter(key=key, expires_at__gt=now).values_list("pk", "response").first()
+    metrics.inc("cache_requests", {"cache": f"ai:{task}", "result": "hit" if row else "miss"})
+    if row is None:
+        return None
+    AIResult.objects.filter(pk=row[0]).update(hits=F("hits") + 1, last_used_at=now)
+    return row[1]
+
+
+def prune():
+    """Drops expired answers, then the least recently used beyond AI_CACHE_MAX_ENTRIES."""
+    AIResult.objects.filter(expires_at__lte=timezone.now()).delete()
+    excess = AIResult.objects.count() - getattr(settings, "AI_CACHE_MAX_ENTRIES", 5000)
+    if excess > 0:
+        oldest = list(AIResult.objects.order_by("last_used_at").values_list("pk", flat=True)[:excess])
+        AIResult.objects.filter(pk__in=oldest).delete()
+
+
+def store(key, task, provider, model, response, ttl):
+    now = timezone.now()
+    values = {
+        "task": task, "provider": provider, "model": model, "response": response,
+        "expires_at": now + timezone.timedelta(seconds=ttl), "last_used_at": now,
+    }
+    try:
+        AIResult.objects.update_or_create(key=key, defaults=values)
+    except IntegrityError:
+        # A concurrent request stored the same answer first.
+        return
+    prune()
+
+
+alookup = sync_to_async(lookup)
+astore = sync_to_async(store)
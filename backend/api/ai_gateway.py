@@ -0,0 +1,224 @@
+import asyncio
+import json
+import weakref
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+
+import httpx
+from django.conf import settings
+from django.utils import timezone
+
+GEMINI_MODEL = "gemini-2.5-flash"
+GROQ_MODEL = "llama-3.1-8b-instant"
+MAX_OUTPUT_TOKENS = 2048
+TEMPERATURE = 0.7
+
+# Under ASGI the event loop lives as long as the process, so asgi.py turns
+# on one pooled client per loop (closed at lifespan shutdown). Under WSGI
+# every async view runs in a fresh asyncio.run() loop; each call then opens
+# and closes its own client.
+pool_clients = False
+_clients = weakref.WeakKeyDictionary()
+
+
+class ProviderError(Exception):
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def gemini_base_url():
+    return getattr(settings, "AI_GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta").rstrip("/")
+
+
+def groq_base_url():
+    return getattr(settings, "AI_GROQ_BASE_URL", "https://api.groq.com/openai/v1").rstrip("/")
+
+
+def new_client():
+    timeout = getattr(settings, "AI_REQUEST_TIMEOUT", 60)
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(timeout, connect=min(timeout, 10)),
+        limits=httpx.Limits(max_connections=getattr(settings, "AI_MAX_CONNECTIONS", 500), max_keepalive_connections=50),
+    )
+
+
+@asynccontextmanager
+async def http_client():
+    if not pool_clients:
+        async with new_client() as client:
+            yield client
+        return
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = _clients[loop] = new_client()
+    yield client
+
+
+async def close_clients():
+    """Closes the running loop's pooled client (ASGI lifespan shutdown)."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def parse_retry_after(value):
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - timezone.now()).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def raise_for_status(provider, response):
+    if response.status_code < 400:
+        return
+    try:
+        error = response.json().get("error") or {}
+        message = error.get("message") if isinstance(error, dict) else str(error)
+    except ValueError:
+        message = response.text[:200]
+    raise ProviderError(
+        f"{provider} HTTP {response.status_code}: {message or response.reason_phrase}",
+        status=response.status_code,
+        retry_after=parse_retry_after(response.headers.get("Retry-After")),
+    )
+
+
+async def sse_data(response):
+    """The data payloads of a server-sent event stream, up to OpenAI's [DONE] marker."""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        if data:
+            yield json.loads(data)
+
+
+def gemini_prompt(prompt, system_instruction=None):
+    if system_instruction:
+        return f"System Instruction: {system_instruction}\n\nTask: {prompt}"
+    return prompt
+
+
+def gemini_payload(prompt, system_instruction=None):
+    return {
+        "contents": [{"role": "user", "parts": [{"text": gemini_prompt(prompt, system_instruction)}]}],
+        "generationConfig": {"candidateCount": 1, "maxOutputTokens": MAX_OUTPUT_TOKENS, "temperature": TEMPERATURE},
+    }
+
+
+def gemini_text(data):
+    candidates = data.get("candidates") or [{}]
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    return "".join(part.get("text", "") for part in parts)
+
+
+def gemini_tokens(data):
+    return (data.get("usageMetadata") or {}).get("totalTokenCount")
+
+
+async def gemini_generate(api_key, prompt, system_instruction=None, model=GEMINI_MODEL, usage=None):
+    """
+    One generateContent call on the Gemini REST API; returns the text.
+    The tokens it used are stored in usage["tokens"] when usage is a dict.
+    """
+    async with http_client() as client:
+        response = await client.post(
+            f"{gemini_base_url()}/models/{model}:generateContent",
+            json=gemini_payload(prompt, system_instruction),
+            headers={"x-goog-api-key": api_key},
+        )
+    raise_for_status("Gemini", response)
+    data = response.json()
+    text = gemini_text(data)
+    if not text:
+        raise ProviderError("Empty response from Gemini")
+    if usage is not None:
+        usage["tokens"] = gemini_tokens(data) or 0
+    return text
+
+
+async def gemini_stream(api_key, prompt, system_instruction=None, model=GEMINI_MODEL, usage=None):
+    """
+    streamGenerateContent as SSE; yields text chunks as Gemini produces them.
+    HTTP errors are raised before the first chunk. Every chunk carries the
+    running token count, so usage["tokens"] is current whenever the stream stops.
+    """
+    async with http_client() as client, client.stream(
+        "POST", f"{gemini_base_url()}/models/{model}:streamGenerateContent",
+        params={"alt": "sse"}, json=gemini_payload(prompt, system_instruction), headers={"x-goog-api-key": api_key},
+    ) as response:
+        if response.status_code >= 400:
+            await response.aread()
+            raise_for_status("Gemini", response)
+        async for data in sse_data(response):
+            tokens = gemini_tokens(data)
+            if tokens and usage is not None:
+                usage["tokens"] = tokens
+            text = gemini_text(data)
+            if text:
+                yield text
+
+
+def groq_payload(messages, model=GROQ_MODEL, stream=False):
+    return {
+        "model": model,
+        "messages": messages,
+        "temperature": TEMPERATURE,
+        "max_tokens": MAX_OUTPUT_TOKENS,
+        "top_p": 1,
+        "stream": stream,
+    }
+
+
+def groq_tokens(data):
+    # Streams report usage in their last chunk, under x_groq.
+    usage = data.get("usage") or (data.get("x_groq") or {}).get("usage") or {}
+    return usage.get("total_tokens")
+
+
+async def groq_chat(api_key, messages, model=GROQ_MODEL, usage=None):
+    """One chat completion on Groq's OpenAI-compatible API; returns the text (tokens in usage, as gemini_generate)."""
+    async with http_client() as client:
+        response = await client.post(
+            f"{groq_base_url()}/chat/completions",
+            json=groq_payload(messages, model),
+            headers={"Authorization": f"Bearer {api_key}"},
+        )
+    raise_for_status("Groq", response)
+    data = response.json()
+    content = ((data.get("choices") or [{}])[0].get("message") or {}).get("content")
+    if not content:
+        raise ProviderError("Empty response from Groq")
+    if usage is not None:
+        usage["tokens"] = groq_tokens(data) or 0
+    return content
+
+
+async def groq_stream(api_key, messages, model=GROQ_MODEL, usage=None):
+    """Streaming chat completion on Groq; yields content deltas."""
+    async with http_client() as client, client.stream(
+        "POST", f"{groq_base_url()}/chat/completions",
+        json=groq_payload(messages, model, stream=True), headers={"Authorization": f"Bearer {api_key}"},
+    ) as response:
+        if response.status_code >= 400:
+            await response.aread()
+            raise_for_status("Groq", response)
+        async for data in sse_data(response):
+            tokens = groq_tokens(data)
+            if tokens and usage is not None:
+                usage["tokens"] = tokens
+            delta = ((data.get("choices") or [{}])[0].get("delta") or {}).get("content")
+            if delta:
+                yield delta
@@ -0,0 +1,231 @@
+import logging
+import time
+from datetime import datetime, timezone as dt_timezone
+from threading import Lock, Thread
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+
+from . import metrics
+from .ai_gateway import parse_retry_after
+from .crypto_utils import decrypt_value
+from .models import AIKey
+
+logger = logging.getLogger(__name__)
+
+# Share of the newest sample in the latency and success-rate averages.
+HEALTH_ALPHA = 0.3
+DEFAULT_LATENCY = 1.0
+# A cooled-down key with a poor record still gets probed now and then.
+MIN_SUCCESS_RATE = 0.05
+MIN_LATENCY = 0.05
+AUTH_FAILURES = (401, 403)
+
+
+def failure_details(error):
+    """(HTTP status, Retry-After seconds) of a provider error, either may be None."""
+    status = getattr(error, "status", None) or getattr(error, "status_code", None) or getattr(error, "code", None)
+    if not isinstance(status, int):
+        status = None
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is None:
+        headers = getattr(getattr(error, "response", None), "headers", None)
+        if headers is not None:
+            retry_after = parse_retry_after(headers.get("Retry-After"))
+    return status, retry_after
+
+
+class PooledKey:
+    """A decrypted AIKey and its health as seen by this process."""
+
+    def __init__(self, row, api_key):
+        self.id = row.id
+        self.provider = row.provider
+        self.ciphertext = row.key
+        self.api_key = api_key
+        self.latency = None
+        self.success_rate = 1.0
+        self.failures = 0
+        self.open_until = row.cooldown_until.timestamp() if row.cooldown_until else 0.0
+        self.current_weight = 0.0
+        # Breaker changed since the last write to AIKey.cooldown_until.
+        self.dirty = False
+
+    def weight(self, default_latency):
+        latency = self.latency if self.latency is not None else default_latency
+        return max(self.success_rate, MIN_SUCCESS_RATE) / max(latency, MIN_LATENCY)
+
+
+class KeyPool:
+    """
+    Active AI keys, decrypted once, with a circuit breaker per key. A 429
+    opens the breaker for Retry-After seconds (or an exponential cooldown),
+    401/403 for the maximum cooldown, other errors after failure_threshold
+    in a row. Calls go to healthy keys by smooth weighted round-robin, the
+    weight being the recent success rate over the recent latency. Every
+    AI_KEY_SYNC_SECONDS the next call reloads the keys (one SELECT; calls
+    arriving meanwhile keep using the loaded keys) and hands the write-back
+    of changed breakers to AIKey to a thread, so other workers skip cooling
+    keys and no request waits on a write. sync() does both inline, for the
+    scheduler. Usage counts are kept by api.ai_usage.
+    """
+
+    def __init__(self, sync_interval=None, failure_threshold=None, cooldown=None, max_cooldown=None):
+        self.sync_interval = sync_interval or getattr(settings, "AI_KEY_SYNC_SECONDS", 15)
+        self.failure_threshold = failure_threshold or getattr(settings, "AI_KEY_FAILURE_THRESHOLD", 3)
+        self.cooldown = cooldown or getattr(settings, "AI_KEY_COOLDOWN_SECONDS", 30)
+        self.max_cooldown = max_cooldown or getattr(settings, "AI_KEY_MAX_COOLDOWN_SECONDS", 3600)
+        self.lock = Lock()
+        self.sync_lock = Lock()
+        self.keys = {}
+        self.synced_at = None
+
+    def invalidate(self):
+        """Reload the keys before the next call (an AIKey was saved or deleted)."""
+        self.synced_at = None
+
+    def reset(self):
+        with self.lock:
+            self.keys = {}
+            self.synced_at = None
+
+    def needs_sync(self):
+        return self.synced_at is None or time.monotonic() - self.synced_at >= self.sync_interval
+
+    def prepare(self):
+        if self.needs_sync():
+            self.refresh()
+
+    async def aprepare(self):
+        if self.needs_sync():
+            await sync_to_async(self.refresh)()
+
+    def refresh(self):
+        """The request-path sync: breakers are written back on a thread, only the reload runs here."""
+        with self.lock:
+            dirty = any(key.dirty for key in self.keys.values())
+        if dirty:
+            Thread(target=self.write_in_thread, daemon=True, name="ai-key-cooldowns").start()
+        self.reload(wait=self.synced_at is None)
+
+    def sync(self):
+        """Writes changed breakers to the AIKey rows, then reloads the active keys."""
+        self.write_cooldowns()
+        self.reload()
+
+    def reload(self, wait=True):
+        # Without wait, a reload already running elsewhere is enough.
+        if not self.sync_lock.acquire(blocking=wait):
+            return
+        try:
+            rows = list(AIKey.objects.filter(is_active=True).order_by("error_count", "last_used", "id"))
+            with self.lock:
+                keys = {}
+                for row in rows:
+                    pooled = self.keys.get(row.id)
+                    if pooled is None or pooled.ciphertext != row.key:
+                        try:
+                            pooled = PooledKey(row, decrypt_value(row.key))
+                        except Exception as e:
+                            logger.error(f"AI key ID {row.id} could not be decrypted: {e}")
+                            continue
+                    elif row.cooldown_until:
+                        # Another worker may have opened the breaker.
+                        pooled.open_until = max(pooled.open_until, row.cooldown_until.timestamp())
+                    keys[row.id] = pooled
+                self.keys = keys
+                self.synced_at = time.monotonic()
+        finally:
+            self.sync_lock.release()
+
+    def write_in_thread(self):
+        try:
+            self.write_cooldowns()
+        except Exception as e:
+            logger.error(f"AI key cooldown write-back failed: {e}")
+        finally:
+            close_old_connections()
+
+    def write_cooldowns(self):
+        with self.lock:
+            changed = [(key.id, key.open_until) for key in self.keys.values() if key.dirty]
+            for key in self.keys.values():
+                key.dirty = False
+        now = datetime.now(dt_timezone.utc)
+        try:
+            for key_id, open_until in changed:
+                rows = AIKey.objects.filter(pk=key_id)
+                if open_until > now.timestamp():
+                    # Only ever raise: another worker may have opened it for longer.
+                    cooldown_until = datetime.fromtimestamp(open_until, dt_timezone.utc)
+                    rows.filter(Q(cooldown_until__isnull=True) | Q(cooldown_until__lt=cooldown_until)).update(
+                        cooldown_until=cooldown_until,
+                    )
+                else:
+                    # Only clear a cooldown that has run out, not one set since.
+                    rows.filter(cooldown_until__lte=now).update(cooldown_until=None)
+        except Exception:
+            # Try again at the next sync.
+            with self.lock:
+                for key_id, _ in changed:
+                    if key_id in self.keys:
+                        self.keys[key_id].dirty = True
+            raise
+
+    def select(self, provider, now=None):
+        """
+        The provider's keys with a closed breaker, best first: the first is
+        picked by weighted round-robin, the rest are fallbacks by weight.
+        """
+        now = now if now is not None else time.time()
+        with self.lock:
+            healthy = [key for key in self.keys.values() if key.provider == provider and key.open_until <= now]
+            if not healthy:
+                return []
+            measured = [key.latency for key in healthy if key.latency is not None]
+            default_latency = sum(measured) / len(measured) if measured else DEFAULT_LATENCY
+            weights = {key.id: key.weight(default_latency) for key in healthy}
+            for key in healthy:
+                key.current_weight += weights[key.id]
+            chosen = max(healthy, key=lambda key: key.current_weight)
+            chosen.current_weight -= sum(weights.values())
+            fallbacks = sorted((key for key in healthy if key is not chosen), key=lambda key: weights[key.id], reverse=True)
+            return [chosen] + fallbacks
+
+    def retry_in(self, provider, now=None):
+        """Seconds until the provider's first cooling key is tried again, or None."""
+        now = now if now is not None else time.time()
+        with self.lock:
+            waits = [key.open_until - now for key in self.keys.values() if key.provider == provider and key.open_until > now]
+        return min(waits) if waits else None
+
+    def record_success(self, key, latency):
+        with self.lock:
+            key.latency = latency if key.latency is None else HEALTH_ALPHA * latency + (1 - HEALTH_ALPHA) * key.latency
+            key.success_rate = HEALTH_ALPHA + (1 - HEALTH_ALPHA) * key.success_rate
+            key.failures = 0
+            if key.open_until:
+                key.open_until = 0.0
+                key.dirty = True
+
+    def record_failure(self, key, error):
+        status, retry_after = failure_details(error)
+        with self.lock:
+            key.success_rate = (1 - HEALTH_ALPHA) * key.success_rate
+            key.failures += 1
+            if status == 429:
+                cooldown = retry_after if retry_after is not None else self.cooldown * 2 ** (key.failures - 1)
+            elif status in AUTH_FAILURES:
+                cooldown = self.max_cooldown
+            elif key.failures >= self.failure_threshold:
+                cooldown = self.cooldown * 2 ** (key.failures - self.failure_threshold)
+            else:
+                return
+            key.open_until = time.time() + min(max(cooldown, 1), self.max_cooldown)
+            key.dirty = True
+        metrics.inc("ai_key_breaker_opens", {"provider": key.provider, "key": key.id})
+
+
+key_pool = KeyPool()
@@ -0,0 +1,130 @@
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+# Keys starting with these prefixes make the mock fail the way providers do.
+RATE_LIMITED_PREFIX = "ratelimited"
+INVALID_PREFIX = "invalid"
+RETRY_AFTER_SECONDS = 30
+
+JSON_ANSWER = {
+    "summary": "Mock summary.",
+    "sentiment": "Neutral",
+    "category": "Other",
+    "suggested_reply": "Thank you for your message.",
+    "score": 50,
+    "keywords": ["mock"],
+    "suggestions": ["Mock suggestion."],
+    "meta_title": "Mock title",
+    "meta_description": "Mock description.",
+}
+
+
+def mock_answer(prompt):
+    if "JSON" in prompt:
+        return json.dumps(JSON_ANSWER)
+    return f"<p>Mock response to: {prompt.strip()[-80:]}</p>"
+
+
+def mock_tokens(prompt):
+    answer = mock_answer(prompt)
+    return [answer[i:i + 8] for i in range(0, len(answer), 8)]
+
+
+def mock_token_count(prompt):
+    # One "token" per word of prompt and answer; reported as provider usage.
+    return len(prompt.split()) + len(mock_answer(prompt).split())
+
+
+class MockProviderHandler(BaseHTTPRequestHandler):
+    """
+    Answers Gemini generateContent and Groq chat/completions requests with
+    canned text after `server.delay` seconds, and their streaming variants
+    in 8-character chunks every `server.token_delay` seconds. Prompts asking
+    for JSON get a JSON object that fits every AIService task.
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_stream(self, chunks):
+        # HTTP/1.0: the body ends when the connection closes.
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        try:
+            for chunk in chunks:
+                data = chunk if isinstance(chunk, str) else json.dumps(chunk)
+                self.wfile.write(f"data: {data}\n\n".encode())
+                self.wfile.flush()
+                if self.server.token_delay:
+                    time.sleep(self.server.token_delay)
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.disconnects.append(self.path)
+
+    def api_key(self):
+        auth = self.headers.get("Authorization", "")
+        return self.headers.get("x-goog-api-key") or auth.removeprefix("Bearer ")
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        key = self.api_key()
+        self.server.requests.append((self.path, key))
+        if key.startswith(RATE_LIMITED_PREFIX):
+            return self.send_json(429, {"error": {"message": "Quota exceeded"}}, {"Retry-After": str(RETRY_AFTER_SECONDS)})
+        if not key or key.startswith(INVALID_PREFIX):
+            return self.send_json(401, {"error": {"message": "Invalid API key"}})
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        path = self.path.split("?", 1)[0]
+        if path.endswith(":streamGenerateContent"):
+            prompt = " ".join(part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", []))
+            chunks = [{"candidates": [{"content": {"role": "model", "parts": [{"text": token}]}}]} for token in mock_tokens(prompt)]
+            chunks[-1]["usageMetadata"] = {"totalTokenCount": mock_token_count(prompt)}
+            return self.send_stream(chunks)
+        if path.endswith("/chat/completions") and body.get("stream"):
+            prompt = " ".join(message.get("content", "") for message in body.get("messages", []))
+            chunks = [{"choices": [{"index": 0, "delta": {"content": token}}]} for token in mock_tokens(prompt)]
+            usage = {"choices": [], "x_groq": {"usage": {"total_tokens": mock_token_count(prompt)}}}
+            return self.send_stream(chunks + [usage, "[DONE]"])
+        if path.endswith(":generateContent"):
+            prompt = " ".join(part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", []))
+            return self.send_json(200, {
+                "candidates": [{"content": {"role": "model", "parts": [{"text": mock_answer(prompt)}]}}],
+                "usageMetadata": {"totalTokenCount": mock_token_count(prompt)},
+            })
+        if path.endswith("/chat/completions"):
+            prompt = " ".join(message.get("content", "") for message in body.get("messages", []))
+            return self.send_json(200, {
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": mock_answer(prompt)}}],
+                "usage": {"total_tokens": mock_token_count(prompt)},
+            })
+        return self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+
+def start_mock_provider(host="127.0.0.1", port=0, delay=0.0, token_delay=0.0):
+    """Starts the mock on a daemon thread; returns the server (server_address, delay, token_delay, requests, disconnects)."""
+    server = ThreadingHTTPServer((host, port), MockProviderHandler)
+    server.daemon_threads = True
+    server.delay = delay
+    server.token_delay = token_delay
+    server.requests = []
+    server.disconnects = []
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def mock_base_urls(server):
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/v1beta", f"http://{host}:{port}/openai/v1"
@@ -1,14 +1,33 @@
 import google.generativeai as genai
 from groq import Groq
 from django.utils import timezone
-from .models import AIKey, SiteSettings
-from .crypto_utils import decrypt_value
+from .models import SiteSettings
+from .ai_keys import key_pool
+from .ai_usage import usage_buffer
+from . import ai_cache, ai_gateway, metrics
+import asyncio
 import logging
 import json
 import re
+import time
+from contextlib import aclosing
 
 logger = logging.getLogger(__name__)
 
+WRITER_INSTRUCTION = "You are a professional content writer."
+INBOX_INSTRUCTION = "You are an intelligent inbox assistant. You strictly output valid JSON."
+COPILOT_INSTRUCTION = "You are the Global AI Copilot for the Portfolio Admin Panel. You assist the administrator with tasks, insights, and data management. Be concise and helpful."
+SEO_INSTRUCTION = "You are an SEO Expert. Output strict JSON."
+
+
+def record_ai_call(provider, key_obj, started, outcome, tokens=0):
+    duration = time.monotonic() - started
+    labels = {"provider": provider, "key": key_obj.id}
+    metrics.inc("ai_calls", {**labels, "outcome": outcome})
+    metrics.observe("ai_call_duration_seconds", duration, labels)
+    usage_buffer.record(key_obj.id, outcome, duration, tokens)
+
+
 class AIService:
     @staticmethod
     def get_system_prompt(base_instruction=""):
@@ -44,47 +63,131 @@ class AIService:
         return 'gemini' # Default
 
     @staticmethod
-    def generate_content_generic(prompt, system_instruction=None, json_mode=False):
+    def model_for(provider):
+        return {'gemini': ai_gateway.GEMINI_MODEL, 'groq': ai_gateway.GROQ_MODEL}.get(provider, '')
+
+    @staticmethod
+    def result_cache_key(task, provider, prompt, system_instruction):
+        """
+        Cache key when `task` has a TTL in AI_CACHE_TTLS, else None. Keyed on
+        the task's own instruction, not the dated system prompt around it.
+        """
+        if not ai_cache.task_ttl(task):
+            return None
+        return ai_cache.cache_key(task, provider, AIService.model_for(provider), prompt, system_instruction)
+
+    @staticmethod
+    def is_cacheable(result, json_mode):
+        if not result:
+            return False
+        if json_mode:
+            try:
+                AIService.parse_json_response(result)
+            except (ValueError, IndexError):
+                return False
+        return True
+
+    @staticmethod
+    def generate_content_generic(prompt, system_instruction=None, json_mode=False, task=None, use_cache=True):
+        """
+        Answers prompt with the active provider. Tasks listed in
+        AI_CACHE_TTLS are served from and stored in the result cache;
+        use_cache=False skips the lookup but still stores the fresh answer.
+        """
         provider = AIService.get_active_provider()
+        cache_key = AIService.result_cache_key(task, provider, prompt, system_instruction)
+        if cache_key and use_cache:
+            cached = ai_cache.lookup(cache_key, task)
+            if cached is not None:
+                return cached
         
         # Enhance system instruction with global defaults
         full_system_instruction = AIService.get_system_prompt(system_instruction or "You are a helpful assistant.")
         
         try:
             if provider == 'gemini':
-                return AIService.call_gemini(prompt, system_instruction=full_system_instruction)
+                result = AIService.call_gemini(prompt, system_instruction=full_system_instruction)
             elif provider == 'groq':
                 messages = [
                     {"role": "system", "content": full_system_instruction},
                     {"role": "user", "content": prompt}
                 ]
-                return AIService.call_groq(messages)
+                result = AIService.call_groq(messages)
             else:
                 raise Exception(f"Unknown provider: {provider}")
         except Exception as e:
             logger.error(f"Generation failed with {provider}: {e}")
             raise e
 
+        if cache_key and AIService.is_cacheable(result, json_mode):
+            ai_cache.store(cache_key, task, provider, AIService.model_for(provider), result, ai_cache.task_ttl(task))
+        return result
+
+    @staticmethod
+    async def aget_active_provider():
+        try:
+            settings = await SiteSettings.objects.afirst()
+            if settings:
+                return settings.ai_provider
+        except Exception:
+            pass
+        return 'gemini'
+
+    @staticmethod
+    async def agenerate_content_generic(prompt, system_instruction=None, json_mode=False, task=None, use_cache=True):
+        """Async generate_content_generic: awaits the provider over HTTP instead of blocking a worker."""
+        provider = await AIService.aget_active_provider()
+        cache_key = AIService.result_cache_key(task, provider, prompt, system_instruction)
+        if cache_key and use_cache:
+            cached = await ai_cache.alookup(cache_key, task)
+            if cached is not None:
+                return cached
+        full_system_instruction = AIService.get_system_prompt(system_instruction or "You are a helpful assistant.")
+
+        try:
+            if provider == 'gemini':
+                result = await AIService.acall_gemini(prompt, system_instruction=full_system_instruction)
+            elif provider == 'groq':
+                messages = [
+                    {"role": "system", "content": full_system_instruction},
+                    {"role": "user", "content": prompt}
+                ]
+                result = await AIService.acall_groq(messages)
+            else:
+                raise Exception(f"Unknown provider: {provider}")
+        except Exception as e:
+            logger.error(f"Generation failed with {provider}: {e}")
+            raise e
+
+        if cache_key and AIService.is_cacheable(result, json_mode):
+            await ai_cache.astore(cache_key, task, provider, AIService.model_for(provider), result, ai_cache.task_ttl(task))
+        return result
+
     @staticmethod
     def get_active_keys(provider):
-        # Get active keys ordered by error_count (prefer low errors) and then last_used (rotate)
-        keys = AIKey.objects.filter(provider=provider, is_active=True).order_by('error_count', 'last_used')
-        if not keys.exists():
-            return []
-        return keys
+        # Keys with a closed circuit breaker, best first (api.ai_keys)
+        key_pool.prepare()
+        return key_pool.select(provider)
+
+    @staticmethod
+    def no_keys_error(provider, label):
+        wait = key_pool.retry_in(provider)
+        if wait is not None:
+            return Exception(f"All {label} keys are cooling down; retry in {wait:.0f}s.")
+        return Exception(f"No active {label} keys found.")
 
     @staticmethod
     def call_gemini(prompt, system_instruction=None):
         keys = AIService.get_active_keys('gemini')
         if not keys:
-             raise Exception("No active Gemini keys found.")
+            raise AIService.no_keys_error('gemini', 'Gemini')
 
         last_exception = None
 
         for key_obj in keys:
+            started = time.monotonic()
             try:
-                api_key = decrypt_value(key_obj.key)
-                genai.configure(api_key=api_key)
+                genai.configure(api_key=key_obj.api_key)
                 
                 # Use gemini-2.5-flash as requested (2026 update)
                 model_name = 'gemini-2.5-flash' 
@@ -106,15 +209,15 @@ class AIService:
                 if not response.text:
                     raise Exception("Empty response from Gemini")
 
-                # Update usage
-                key_obj.last_used = timezone.now()
-                key_obj.save()
+                tokens = getattr(getattr(response, 'usage_metadata', None), 'total_token_count', 0)
+                record_ai_call('gemini', key_obj, started, 'success', tokens)
+                key_pool.record_success(key_obj, time.monotonic() - started)
                 
                 return response.text
             except Exception as e:
+                record_ai_call('gemini', key_obj, started, 'failure')
                 logger.error(f"Gemini error with key ID {key_obj.id}: {str(e)}")
-                key_obj.error_count += 1
-                key_obj.save()
+                key_pool.record_failure(key_obj, e)
                 last_exception = e
                 continue
         
@@ -124,14 +227,14 @@ class AIService:
     def call_groq(messages):
         keys = AIService.get_active_keys('groq')
         if not keys:
-             raise Exception("No active Groq keys found.")
+            raise AIService.no_keys_error('groq', 'Groq')
 
         last_exception = None
 
         for key_obj in keys:
+            started = time.monotonic()
             try:
-                api_key = decrypt_value(key_obj.key)
-                client = Groq(api_key=api_key)
+                client = Groq(api_key=key_obj.api_key)
                 
                 completion = client.chat.completions.create(
                     model="llama-3.1-8b-instant",
@@ -147,27 +250,160 @@ class AIService:
                 if not content:
                     raise Exception("Empty response from Groq")
 
-                # Update usage
-                key_obj.last_used = timezone.now()
-                key_obj.save()
+                tokens = getattr(getattr(completion, 'usage', None), 'total_tokens', 0)
+                record_ai_call('groq', key_obj, started, 'success', tokens)
+                key_pool.record_success(key_obj, time.monotonic() - started)
                 
                 return content
             except Exception as e:
+                record_ai_call('groq', key_obj, started, 'failure')
                 logger.error(f"Groq error with key ID {key_obj.id}: {str(e)}")
-                key_obj.error_count += 1
-                key_obj.save()
+                key_pool.record_failure(key_obj, e)
                 last_exception = e
                 continue
                 
         raise last_exception or Exception("All Groq keys failed")
 
-    # --- Feature Implementations ---
+    @staticmethod
+    async def aget_active_keys(provider):
+        await key_pool.aprepare()
+        return key_pool.select(provider)
 
     @staticmethod
-    def writing_assistant(topic, tone="professional", type="blog"):
+    async def acall_with_keys(provider, label, request):
         """
-        AI Writing Assistant: Helps write/edit content.
+        Tries the provider's keys in call_gemini/call_groq order, awaiting
+        request(api_key, usage) for each; records usage the same way, with
+        the tokens the request stored in usage["tokens"].
+        """
+        keys = await AIService.aget_active_keys(provider)
+        if not keys:
+            raise AIService.no_keys_error(provider, label)
+
+        last_exception = None
+        for key_obj in keys:
+            started = time.monotonic()
+            try:
+                usage = {}
+                result = await request(key_obj.api_key, usage)
+                record_ai_call(provider, key_obj, started, 'success', usage.get('tokens', 0))
+                key_pool.record_success(key_obj, time.monotonic() - started)
+                return result
+            except Exception as e:
+                record_ai_call(provider, key_obj, started, 'failure')
+                logger.error(f"{label} error with key ID {key_obj.id}: {str(e)}")
+                key_pool.record_failure(key_obj, e)
+                last_exception = e
+                continue
+
+        raise last_exception or Exception(f"All {label} keys failed")
+
+    @staticmethod
+    async def acall_gemini(prompt, system_instruction=None):
+        return await AIService.acall_with_keys(
+            'gemini', 'Gemini', lambda api_key, usage: ai_gateway.gemini_generate(api_key, prompt, system_instruction, usage=usage),
+        )
+
+    @staticmethod
+    async def acall_groq(messages):
+        return await AIService.acall_with_keys(
+            'groq', 'Groq', lambda api_key, usage: ai_gateway.groq_chat(api_key, messages, usage=usage),
+        )
+
+    @staticmethod
+    async def astream_with_keys(provider, label, open_stream):
+        """
+        Streaming acall_with_keys: yields text chunks from open_stream(api_key, usage).
+        Keys fail over until one produces its first chunk; after that errors
+        reach the caller. Closing the generator (client gone) closes the
+        provider stream.
+        """
+        keys = await AIService.aget_active_keys(provider)
+        if not keys:
+            raise AIService.no_keys_error(provider, label)
+
+        last_exception = None
+        for key_obj in keys:
+            started = time.monotonic()
+            usage = {}
+            stream = open_stream(key_obj.api_key, usage)
+            try:
+                first = await anext(stream)
+            except Exception as e:
+                await stream.aclose()
+                if isinstance(e, StopAsyncIteration):
+                    e = Exception(f"Empty response from {label}")
+                record_ai_call(provider, key_obj, started, 'failure')
+                logger.error(f"{label} error with key ID {key_obj.id}: {str(e)}")
+                key_pool.record_failure(key_obj, e)
+                last_exception = e
+                continue
+
+            first_token = time.monotonic() - started
+            metrics.observe("ai_time_to_first_token_seconds", first_token, {"provider": provider})
+            # Streams are compared by time to first token.
+            key_pool.record_success(key_obj, first_token)
+            outcome = 'failure'
+            try:
+                yield first
+                async for text in stream:
+                    yield text
+                outcome = 'success'
+            except (GeneratorExit, asyncio.CancelledError):
+                outcome = 'cancelled'
+                raise
+            except Exception as e:
+                logger.error(f"{label} stream broke with key ID {key_obj.id}: {str(e)}")
+                key_pool.record_failure(key_obj, e)
+                raise
+            finally:
+                await stream.aclose()
+                record_ai_call(provider, key_obj, started, outcome, usage.get('tokens', 0))
+            return
+
+        raise last_exception or Exception(f"All {label} keys failed")
+
+    @staticmethod
+    async def astream_generic(prompt, system_instruction=None, task=None, use_cache=True):
         """
+        Streaming agenerate_content_generic: yields the answer in chunks as
+        the provider produces them. A cached answer comes as one chunk.
+        """
+        provider = await AIService.aget_active_provider()
+        cache_key = AIService.result_cache_key(task, provider, prompt, system_instruction)
+        if cache_key and use_cache:
+            cached = await ai_cache.alookup(cache_key, task)
+            if cached is not None:
+                yield cached
+                return
+        full_system_instruction = AIService.get_system_prompt(system_instruction or "You are a helpful assistant.")
+
+        if provider == 'gemini':
+            stream = AIService.astream_with_keys(
+                'gemini', 'Gemini', lambda api_key, usage: ai_gateway.gemini_stream(api_key, prompt, full_system_instruction, usage=usage),
+            )
+        elif provider == 'groq':
+            messages = [
+                {"role": "system", "content": full_system_instruction},
+                {"role": "user", "content": prompt}
+            ]
+            stream = AIService.astream_with_keys(
+                'groq', 'Groq', lambda api_key, usage: ai_gateway.groq_stream(api_key, messages, usage=usage),
+            )
+        else:
+            raise Exception(f"Unknown provider: {provider}")
+        chunks = []
+        async with aclosing(stream):
+            async for text in stream:
+                chunks.append(text)
+                yield text
+        if cache_key and chunks:
+            await ai_cache.astore(cache_key, task, provider, AIService.model_for(provider), "".join(chunks), ai_cache.task_ttl(task))
+
+    # --- Feature Implementations ---
+
+    @staticmethod
+    def writing_prompt(topic, tone="professional", type="blog"):
         if type == "excerpt":
             prompt = f"Write a {tone} short excerpt (summary) about: {topic}. \n\nKeep it under 300 characters. No headings, just plain text. Do not use HTML tags like <p>."
         elif type == "project_description":
@@ -205,14 +441,28 @@ class AIService:
             8. Ensure paragraphs are concise and not too far apart.
             """
         
-        return AIService.generate_content_generic(prompt, system_instruction="You are a professional content writer.")
+        return prompt
 
     @staticmethod
-    def smart_inbox_analysis(message_text, sender_email=""):
+    def writing_assistant(topic, tone="professional", type="blog", use_cache=True):
         """
-        Smart Inbox: Analyzes message for summary, sentiment, category.
+        AI Writing Assistant: Helps write/edit content.
         """
-        prompt = f"""
+        prompt = AIService.writing_prompt(topic, tone, type)
+        return AIService.generate_content_generic(
+            prompt, system_instruction=WRITER_INSTRUCTION, task=f"write:{type}", use_cache=use_cache,
+        )
+
+    @staticmethod
+    async def awriting_assistant(topic, tone="professional", type="blog", use_cache=True):
+        prompt = AIService.writing_prompt(topic, tone, type)
+        return await AIService.agenerate_content_generic(
+            prompt, system_instruction=WRITER_INSTRUCTION, task=f"write:{type}", use_cache=use_cache,
+        )
+
+    @staticmethod
+    def inbox_prompt(message_text, sender_email=""):
+        return f"""
         Analyze the following message from {sender_email}:
         "{message_text}"
         
@@ -224,25 +474,60 @@ class AIService:
         
         Ensure the output is pure JSON without Markdown formatting.
         """
+
+    @staticmethod
+    def parse_json_response(response):
+        # Clean up if markdown is present
+        if "```json" in response:
+            response = response.split("```json")[1].split("```")[0]
+        elif "```" in response:
+            response = response.split("```")[1].split("```")[0]
+        return json.loads(response.strip())
+
+    @staticmethod
+    def inbox_fallback():
+        return {
+            "summary": "Error analyzing message.",
+            "sentiment": "Neutral",
+            "category": "Other",
+            "suggested_reply": "Thank you for your message."
+        }
+
+    @staticmethod
+    def awriting_assistant_stream(topic, tone="professional", type="blog", use_cache=True):
+        return AIService.astream_generic(
+            AIService.writing_prompt(topic, tone, type), system_instruction=WRITER_INSTRUCTION,
+            task=f"write:{type}", use_cache=use_cache,
+        )
+
+    @staticmethod
+    def smart_inbox_analysis(message_text, sender_email="", use_cache=True):
+        """
+        Smart Inbox: Analyzes message for summary, sentiment, category.
+        """
+        prompt = AIService.inbox_prompt(message_text, sender_email)
         try:
             # Use generic generator but force JSON parsing
-            response = AIService.generate_content_generic(prompt, system_instruction="You are an intelligent inbox assistant. You strictly output valid JSON.")
-            
-            # Clean up if markdown is present
-            if "```json" in response:
-                response = response.split("```json")[1].split("```")[0]
-            elif "```" in response:
-                response = response.split("```")[1].split("```")[0]
-            return json.loads(response.strip())
+            response = AIService.generate_content_generic(
+                prompt, system_instruction=INBOX_INSTRUCTION, json_mode=True, task="inbox", use_cache=use_cache,
+            )
+            return AIService.parse_json_response(response)
         except Exception as e:
             logger.error(f"Smart Inbox JSON parse error: {e}")
             # Fallback simple structure
-            return {
-                "summary": "Error analyzing message.",
-                "sentiment": "Neutral",
-                "category": "Other",
-                "suggested_reply": "Thank you for your message."
-            }
+            return AIService.inbox_fallback()
+
+    @staticmethod
+    async def asmart_inbox_analysis(message_text, sender_email="", use_cache=True):
+        prompt = AIService.inbox_prompt(message_text, sender_email)
+        try:
+            response = await AIService.agenerate_content_generic(
+                prompt, system_instruction=INBOX_INSTRUCTION, json_mode=True, task="inbox", use_cache=use_cache,
+            )
+            return AIService.parse_json_response(response)
+        except Exception as e:
+            logger.error(f"Smart Inbox JSON parse error: {e}")
+            return AIService.inbox_fallback()
 
     @staticmethod
     def global_copilot(query, context=""):
@@ -250,14 +535,21 @@ class AIService:
         Global AI Copilot: Chatbot for admin tasks.
         """
         prompt = f"Context: {context}\n\nQuestion: {query}"
-        return AIService.generate_content_generic(prompt, system_instruction="You are the Global AI Copilot for the Portfolio Admin Panel. You assist the administrator with tasks, insights, and data management. Be concise and helpful.")
+        return AIService.generate_content_generic(prompt, system_instruction=COPILOT_INSTRUCTION)
 
     @staticmethod
-    def seo_optimizer(content, target_keyword=""):
-        """
-        SEO Optimizer: Analyzes content for SEO.
-        """
-        prompt = f"""
+    async def aglobal_copilot(query, context=""):
+        prompt = f"Context: {context}\n\nQuestion: {query}"
+        return await AIService.agenerate_content_generic(prompt, system_instruction=COPILOT_INSTRUCTION)
+
+    @staticmethod
+    def aglobal_copilot_stream(query, context=""):
+        prompt = f"Context: {context}\n\nQuestion: {query}"
+        return AIService.astream_generic(prompt, system_instruction=COPILOT_INSTRUCTION)
+
+    @staticmethod
+    def seo_prompt(content, target_keyword=""):
+        return f"""
         Analyze the following content for SEO optimization targeting the keyword: "{target_keyword}" (if empty, identify the main topic).
         
         Content:
@@ -275,29 +567,52 @@ class AIService:
         - Ensure "keywords" are comma-separated strings if returning a list.
         - Ensure output is valid JSON.
         """
+
+    @staticmethod
+    def seo_result(response):
+        result = AIService.parse_json_response(response)
+
+        # Map keys to frontend expectations if necessary
+        if 'meta_title' in result and 'title' not in result:
+            result['title'] = result['meta_title']
+        if 'meta_description' in result and 'description' not in result:
+            # Double check to remove any HTML tags if AI slipped up
+            clean_desc = re.sub(r'<[^>]+>', '', result['meta_description'])
+            result['description'] = clean_desc
+
+        return result
+
+    @staticmethod
+    def seo_fallback(error):
+        return {
+            "score": 0,
+            "error": "Could not analyze SEO",
+            "suggestions": [str(error)]
+        }
+
+    @staticmethod
+    def seo_optimizer(content, target_keyword="", use_cache=True):
+        """
+        SEO Optimizer: Analyzes content for SEO.
+        """
+        prompt = AIService.seo_prompt(content, target_keyword)
         try:
-            response = AIService.generate_content_generic(prompt, system_instruction="You are an SEO Expert. Output strict JSON.")
-            
-            if "```json" in response:
-                response = response.split("```json")[1].split("```")[0]
-            elif "```" in response:
-                response = response.split("```")[1].split("```")[0]
-            
-            result = json.loads(response.strip())
-            
-            # Map keys to frontend expectations if necessary
-            if 'meta_title' in result and 'title' not in result:
-                result['title'] = result['meta_title']
-            if 'meta_description' in result and 'description' not in result:
-                # Double check to remove any HTML tags if AI slipped up
-                clean_desc = re.sub(r'<[^>]+>', '', result['meta_description'])
-                result['description'] = clean_desc
-                
-            return result
+            response = AIService.generate_content_generic(
+                prompt, system_instruction=SEO_INSTRUCTION, json_mode=True, task="seo", use_cache=use_cache,
+            )
+            return AIService.seo_result(response)
+        except Exception as e:
+            logger.error(f"SEO Optimizer error: {e}")
+            return AIService.seo_fallback(e)
+
+    @staticmethod
+    async def aseo_optimizer(content, target_keyword="", use_cache=True):
+        prompt = AIService.seo_prompt(content, target_keyword)
+        try:
+            response = await AIService.agenerate_content_generic(
+                prompt, system_instruction=SEO_INSTRUCTION, json_mode=True, task="seo", use_cache=use_cache,
+            )
+            return AIService.seo_result(response)
         except Exception as e:
             logger.error(f"SEO Optimizer error: {e}")
-            return {
-                "score": 0,
-                "error": "Could not analyze SEO",
-                "suggestions": [str(e)]
-            }
+            return AIService.seo_fallback(e)
@@ -0,0 +1,136 @@
+import asyncio
+import atexit
+import copy
+import logging
+import time
+from threading import Lock, Thread
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import AIKey
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("success_count", "error_count", "token_count", "total_latency")
+
+
+class UsageBuffer:
+    """
+    AIKey usage since the last flush, per key id. Calls only touch memory;
+    every flush_interval seconds flush() adds the counters to the rows with
+    F() expressions in one bulk_update, so concurrent workers never
+    overwrite each other's counts. Calls made on an event loop hand the
+    flush to a thread, as the ORM is synchronous.
+    """
+
+    def __init__(self, flush_interval=None):
+        self.flush_interval = flush_interval if flush_interval is not None else getattr(settings, "AI_USAGE_FLUSH_SECONDS", 10)
+        self.lock = Lock()
+        self.pending = {}
+        self.last_flush = time.monotonic()
+
+    def record(self, key_id, outcome, latency, tokens=0):
+        if not isinstance(tokens, int):
+            tokens = 0
+        with self.lock:
+            stats = self.pending.get(key_id)
+            if stats is None:
+                stats = self.pending[key_id] = {name: 0 for name in COUNTERS}
+                stats["last_used"] = None
+            if outcome == "failure":
+                stats["error_count"] += 1
+            else:
+                stats["success_count"] += 1
+                stats["last_used"] = timezone.now()
+            stats["token_count"] += tokens
+            stats["total_latency"] += latency
+            due = time.monotonic() - self.last_flush >= self.flush_interval
+            if due:
+                self.last_flush = time.monotonic()
+        if not due:
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush_quietly()
+        else:
+            Thread(target=self.flush_in_thread, daemon=True, name="ai-usage-flush").start()
+
+    def apply(self, key):
+        """
+        A copy of an AIKey instance with this process's unflushed usage added,
+        for display; the instance itself is left as loaded.
+        """
+        with self.lock:
+            stats = self.pending.get(key.id)
+            if stats is None:
+                return key
+            stats = dict(stats)
+        key = copy.copy(key)
+        for name in COUNTERS:
+            setattr(key, name, getattr(key, name) + stats[name])
+        if stats["last_used"] and (key.last_used is None or stats["last_used"] > key.last_used):
+            key.last_used = stats["last_used"]
+        return key
+
+    def flush(self):
+        """Writes the buffered usage; returns how many keys were updated."""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.last_flush = time.monotonic()
+        if not pending:
+            return 0
+        keys = []
+        for key_id, stats in pending.items():
+            key = AIKey(id=key_id)
+            for name in COUNTERS:
+                setattr(key, name, F(name) + stats[name])
+            key.last_used = stats["last_used"] or F("last_used")
+            keys.append(key)
+        try:
+            # Rows deleted in the meantime simply match nothing.
+            AIKey.objects.bulk_update(keys, [*COUNTERS, "last_used"])
+        except Exception:
+            with self.lock:
+                for key_id, stats in pending.items():
+                    self.merge(key_id, stats)
+            raise
+        return len(keys)
+
+    def flush_quietly(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"AI usage flush failed: {e}")
+
+    def flush_in_thread(self):
+        try:
+            self.flush_quietly()
+        finally:
+            close_old_connections()
+
+    def merge(self, key_id, stats):
+        # Puts back usage whose flush failed, next to anything recorded since.
+        current = self.pending.setdefault(key_id, stats)
+        if current is stats:
+            return
+        for name in COUNTERS:
+            current[name] += stats[name]
+        if current["last_used"] is None:
+            current["last_used"] = stats["last_used"]
+
+    def clear(self):
+        with self.lock:
+            self.pending = {}
+            self.last_flush = time.monotonic()
+
+
+usage_buffer = UsageBuffer()
+atexit.register(usage_buffer.flush_quietly)
+
+
+def flush_usage():
+    return usage_buffer.flush()
@@ -1,20 +1,123 @@
+from asgiref.sync import sync_to_async
+from contextlib import aclosing
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from functools import wraps
+from rest_framework import exceptions
 from rest_framework.decorators import api_view, permission_classes, parser_classes
 from rest_framework.permissions import IsAdminUser
+from rest_framework.request import Request
 from rest_framework.response import Response
-from rest_framework.parsers import MultiPartParser
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.settings import api_settings
 from .ai_service import AIService
+from .ai_usage import usage_buffer
 from .models import AIKey
 from .crypto_utils import encrypt_value, decrypt_value
 import csv
 import json
 import io
 
+
+def authenticate_admin(request):
+    """
+    What @api_view + IsAdminUser do before the view runs: authenticate with
+    the DRF authenticators, parse the body, check is_staff. Returns the DRF
+    Request (data already parsed) or an error JsonResponse.
+    """
+    drf_request = Request(
+        request,
+        parsers=[JSONParser(), FormParser(), MultiPartParser()],
+        authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+    )
+    try:
+        user = drf_request.user
+        if not (user and user.is_authenticated):
+            raise exceptions.NotAuthenticated()
+        if not user.is_staff:
+            raise exceptions.PermissionDenied()
+        drf_request.data
+    except exceptions.APIException as e:
+        response = JsonResponse({"detail": str(e.detail)}, status=e.status_code)
+        if isinstance(e, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            # Same as APIView: 401 with the first authenticator's challenge, else 403.
+            header = drf_request.authenticators[0].authenticate_header(drf_request) if drf_request.authenticators else None
+            if header:
+                response["WWW-Authenticate"] = header
+            else:
+                response.status_code = 403
+        return response
+    return drf_request
+
+
+def async_admin_post(view):
+    """
+    Async counterpart of @api_view(['POST']) + @permission_classes([IsAdminUser])
+    for the AI endpoints: auth and parsing run in a thread, then the view
+    awaits the provider without holding a worker (under ASGI).
+    """
+    @csrf_exempt
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != "POST":
+            return JsonResponse({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+        result = await sync_to_async(authenticate_admin)(request)
+        if isinstance(result, JsonResponse):
+            return result
+        return await view(result, *args, **kwargs)
+    return wrapper
+
+def use_cache(request):
+    # {"refresh": true} skips the AI result cache (the fresh answer is stored).
+    return str(request.data.get('refresh', '')).lower() not in ('1', 'true', 'yes')
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def sse_response(tokens):
+    """
+    Streams an AIService *_stream generator as server-sent events: `token`
+    events with {"text"}, then `done`, or `error` if the provider breaks
+    mid-answer. Failures before the first token (every key failed) are a
+    plain 500 like the non-streaming endpoints. Needs ASGI; under WSGI
+    Django buffers async streams. A client disconnect cancels the
+    generator, which closes the provider stream.
+    """
+    try:
+        first = await anext(tokens)
+    except StopAsyncIteration:
+        first = ""
+    except Exception as e:
+        await tokens.aclose()
+        return JsonResponse({"error": str(e)}, status=500)
+
+    async def events():
+        async with aclosing(tokens):
+            try:
+                if first:
+                    yield sse_event("token", {"text": first})
+                async for text in tokens:
+                    yield sse_event("token", {"text": text})
+                yield sse_event("done", {})
+            except Exception as e:
+                yield sse_event("error", {"error": str(e)})
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Keep nginx from buffering the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def list_ai_keys(request):
     keys = AIKey.objects.all().order_by('-created_at')
     data = []
     for key in keys:
+        key = usage_buffer.apply(key)
         decrypted_key = decrypt_value(key.key)
         masked_key = f"{decrypted_key[:8]}...{decrypted_key[-4:]}" if len(decrypted_key) > 12 else "****"
         data.append({
@@ -24,7 +127,11 @@ def list_ai_keys(request):
             "is_active": key.is_active,
             "created_at": key.created_at,
             "last_used": key.last_used,
-            "error_count": key.error_count
+            "error_count": key.error_count,
+            "success_count": key.success_count,
+            "token_count": key.token_count,
+            "average_latency": key.average_latency,
+            "cooldown_until": key.cooldown_until,
         })
     return Response(data)
 
@@ -126,66 +233,83 @@ def delete_ai_key(request, key_id):
     except AIKey.DoesNotExist:
         return Response({"error": "Key not found"}, status=404)
 
-@api_view(['POST'])
-@permission_classes([IsAdminUser])
-def ai_write(request):
+@async_admin_post
+async def ai_write(request):
     topic = request.data.get('topic')
     tone = request.data.get('tone', 'professional')
     type_ = request.data.get('type', 'blog')
     
     if not topic:
-        return Response({"error": "Topic is required"}, status=400)
+        return JsonResponse({"error": "Topic is required"}, status=400)
         
     try:
-        content = AIService.writing_assistant(topic, tone, type_)
-        return Response({"content": content})
+        content = await AIService.awriting_assistant(topic, tone, type_, use_cache=use_cache(request))
+        return JsonResponse({"content": content})
     except Exception as e:
-        return Response({"error": str(e)}, status=500)
+        return JsonResponse({"error": str(e)}, status=500)
 
-@api_view(['POST'])
-@permission_classes([IsAdminUser])
-def ai_analyze_message(request):
+@async_admin_post
+async def ai_write_stream(request):
+    topic = request.data.get('topic')
+    tone = request.data.get('tone', 'professional')
+    type_ = request.data.get('type', 'blog')
+
+    if not topic:
+        return JsonResponse({"error": "Topic is required"}, status=400)
+
+    return await sse_response(AIService.awriting_assistant_stream(topic, tone, type_, use_cache=use_cache(request)))
+
+@async_admin_post
+async def ai_analyze_message(request):
     message = request.data.get('message')
     sender = request.data.get('sender', '')
     
     if not message:
-        return Response({"error": "Message is required"}, status=400)
+        return JsonResponse({"error": "Message is required"}, status=400)
         
     try:
-        analysis = AIService.smart_inbox_analysis(message, sender)
-        return Response(analysis)
+        analysis = await AIService.asmart_inbox_analysis(message, sender, use_cache=use_cache(request))
+        return JsonResponse(analysis)
     except Exception as e:
-        return Response({"error": str(e)}, status=500)
+        return JsonResponse({"error": str(e)}, status=500)
 
-@api_view(['POST'])
-@permission_classes([IsAdminUser])
-def ai_chat(request):
+@async_admin_post
+async def ai_chat(request):
     query = request.data.get('query')
     context = request.data.get('context', '')
     
     if not query:
-        return Response({"error": "Query is required"}, status=400)
+        return JsonResponse({"error": "Query is required"}, status=400)
         
     try:
-        response = AIService.global_copilot(query, context)
-        return Response({"response": response})
+        response = await AIService.aglobal_copilot(query, context)
+        return JsonResponse({"response": response})
     except Exception as e:
-        return Response({"error": str(e)}, status=500)
+        return JsonResponse({"error": str(e)}, status=500)
 
-@api_view(['POST'])
-@permission_classes([IsAdminUser])
-def ai_seo(request):
+@async_admin_post
+async def ai_chat_stream(request):
+    query = request.data.get('query')
+    context = request.data.get('context', '')
+
+    if not query:
+        return JsonResponse({"error": "Query is required"}, status=400)
+
+    return await sse_response(AIService.aglobal_copilot_stream(query, context))
+
+@async_admin_post
+async def ai_seo(request):
     content = request.data.get('content')
     keyword = request.data.get('keyword', '')
     
     if not content:
-        return Response({"error": "Content is required"}, status=400)
+        return JsonResponse({"error": "Content is required"}, status=400)
         
     try:
-        analysis = AIService.seo_optimizer(content, keyword)
-        return Response(analysis)
+        analysis = await AIService.aseo_optimizer(content, keyword, use_cache=use_cache(request))
+        return JsonResponse(analysis)
     except Exception as e:
-        return Response({"error": str(e)}, status=500)
+        return JsonResponse({"error": str(e)}, status=500)
 
 @api_view(['POST'])
 @permission_classes([IsAdminUser])
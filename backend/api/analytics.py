@@ -0,0 +1,307 @@
+import hashlib
+import logging
+import math
+import re
+import time
+from datetime import timedelta
+from functools import lru_cache
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from . import metrics
+from .models import DailyAnalytics
+
+logger = logging.getLogger(__name__)
+
+# GET endpoints the public site reads; each successful hit counts as a page view.
+PUBLIC_CONTENT_PREFIXES = (
+    "/api/profile/", "/api/home-content/", "/api/about-content/", "/api/social-links/",
+    "/api/skills/", "/api/skill-categories/", "/api/experience/", "/api/education/",
+    "/api/projects/", "/api/project-categories/", "/api/certificates/",
+    "/api/certificate-categories/", "/api/blog-posts/", "/api/blog-categories/",
+)
+
+DEVICES = ("desktop", "mobile", "tablet", "bot")
+BROWSERS = ("chrome", "safari", "firefox", "edge", "opera", "samsung", "other")
+DEVICE_COLORS = {"desktop": "#6366F1", "mobile": "#22C55E", "tablet": "#F59E0B"}
+
+BOT_PATTERN = re.compile(r"bot|crawl|spider|slurp|curl|wget|python-requests|httpclient|headless|lighthouse", re.I)
+TABLET_PATTERN = re.compile(r"ipad|tablet|kindle|silk|playbook|android(?!.*mobile)", re.I)
+MOBILE_PATTERN = re.compile(r"mobi|iphone|ipod|windows phone|blackberry|opera mini", re.I)
+BROWSER_PATTERNS = (
+    ("edge", re.compile(r"edg(e|a|ios)?/", re.I)),
+    ("opera", re.compile(r"opr/|opera", re.I)),
+    ("samsung", re.compile(r"samsungbrowser", re.I)),
+    ("firefox", re.compile(r"firefox/|fxios", re.I)),
+    ("chrome", re.compile(r"chrome/|crios", re.I)),
+    ("safari", re.compile(r"safari/", re.I)),
+)
+
+
+class HyperLogLog:
+    """
+    Fixed-size cardinality sketch (2**precision one-byte registers, 4 KiB at
+    the default precision, ~1.6% standard error). Sketches for different days
+    merge losslessly by taking the register-wise max.
+    """
+
+    def __init__(self, precision=12, registers=None):
+        self.precision = precision
+        self.size = 1 << precision
+        if registers and len(registers) == self.size:
+            self.registers = bytearray(registers)
+        else:
+            self.registers = bytearray(self.size)
+
+    @classmethod
+    def from_bytes(cls, data, precision=12):
+        return cls(precision, bytes(data) if data else None)
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+    def add(self, value):
+        x = int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+        index = x >> (64 - self.precision)
+        rest = (x << self.precision) & 0xFFFFFFFFFFFFFFFF
+        rank = min(64 - rest.bit_length() + 1, 64 - self.precision + 1)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+@lru_cache(maxsize=2048)
+def classify_user_agent(user_agent):
+    """Returns (device, browser) for a User-Agent string."""
+    if not user_agent or BOT_PATTERN.search(user_agent):
+        return "bot", "other"
+    if TABLET_PATTERN.search(user_agent):
+        device = "tablet"
+    elif MOBILE_PATTERN.search(user_agent):
+        device = "mobile"
+    else:
+        device = "desktop"
+    for browser, pattern in BROWSER_PATTERNS:
+        if pattern.search(user_agent):
+            return device, browser
+    return device, "other"
+
+
+def is_page_view(request, response):
+    if request.method != "GET" or not (200 <= getattr(response, "status_code", 0) < 300):
+        return False
+    user = getattr(request, "user", None)
+    if user is not None and getattr(user, "is_staff", False):
+        return False
+    return (request.path or "").startswith(PUBLIC_CONTENT_PREFIXES)
+
+
+class AnalyticsBuffer:
+    """
+    Per-process visitor analytics for the current day: one HyperLogLog, a
+    page-view counter and fixed device/browser tallies. Flushed into the
+    day's DailyAnalytics row every flush_interval seconds.
+    """
+
+    def __init__(self, flush_interval=None):
+        self.flush_interval = flush_interval if flush_interval is not None else getattr(settings, "ANALYTICS_FLUSH_SECONDS", 30)
+        self.lock = Lock()
+        self.last_flush = time.monotonic()
+        self.reset(None)
+
+    def reset(self, day):
+        self.day = day
+        self.sketch = HyperLogLog()
+        self.page_views = 0
+        self.devices = dict.fromkeys(DEVICES, 0)
+        self.browsers = dict.fromkeys(BROWSERS, 0)
+
+    def record(self, visitor, user_agent, day=None):
+        day = day or timezone.now().date()
+        device, browser = classify_user_agent(user_agent or "")
+        snapshots = []
+        with self.lock:
+            if self.day is not None and day != self.day:
+                snapshots.append(self._take_locked())
+            if self.day is None:
+                self.day = day
+            self.devices[device] += 1
+            if device != "bot":
+                self.page_views += 1
+                self.browsers[browser] += 1
+                self.sketch.add(visitor)
+            if time.monotonic() - self.last_flush >= self.flush_interval:
+                snapshots.append(self._take_locked())
+        for snapshot in snapshots:
+            self._write(snapshot)
+
+    def flush(self):
+        with self.lock:
+            snapshot = self._take_locked()
+        self._write(snapshot)
+
+    def _take_locked(self):
+        snapshot = (self.day, self.sketch, self.page_views, self.devices, self.browsers)
+        self.reset(None)
+        self.last_flush = time.monotonic()
+        return snapshot
+
+    def _write(self, snapshot):
+        day, sketch, page_views, devices, browsers = snapshot
+        if day is None or not any(devices.values()):
+            return
+        try:
+            merge_into_day(day, sketch, page_views, devices, browsers)
+        except Exception as e:
+            logger.error(f"Analytics flush failed for {day}: {e}")
+
+
+RANGE_VERSION_KEY = "analytics:range:version"
+
+
+def range_version():
+    """Part of every range_summary key; replaced to drop all cached ranges at once."""
+    version = cache.get(RANGE_VERSION_KEY)
+    if version is None:
+        cache.add(RANGE_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(RANGE_VERSION_KEY)
+    return version
+
+
+def invalidate_ranges():
+    cache.set(RANGE_VERSION_KEY, time.time_ns(), None)
+
+
+def merge_into_day(day, sketch, page_views, devices, browsers):
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                row, _ = DailyAnalytics.objects.select_for_update().get_or_create(day=day)
+                merged = HyperLogLog.from_bytes(row.visitors_sketch).merge(sketch)
+                row.visitors_sketch = merged.to_bytes()
+                row.unique_visitors = merged.count()
+                row.page_views += page_views
+                row.device_counts = {k: row.device_counts.get(k, 0) + v for k, v in devices.items()}
+                row.browser_counts = {k: row.browser_counts.get(k, 0) + v for k, v in browsers.items()}
+                row.save()
+            if day < timezone.now().date():
+                # Late visits for a closed day; cached ranges may include it.
+                invalidate_ranges()
+            return
+        except IntegrityError:
+            # Lost the race to create the day's row; the retry will lock it.
+            if attempt:
+                raise
+
+
+analytics_buffer = AnalyticsBuffer()
+
+
+def record_visit(request, response, ip):
+    if not is_page_view(request, response):
+        return
+    user_agent = request.META.get("HTTP_USER_AGENT", "")
+    analytics_buffer.record(f"{ip}|{user_agent}", user_agent)
+
+
+def merged_sketch(first_day, last_day):
+    sketch = HyperLogLog()
+    for data in DailyAnalytics.objects.filter(day__gte=first_day, day__lte=last_day).values_list("visitors_sketch", flat=True):
+        sketch.merge(HyperLogLog.from_bytes(data))
+    return sketch
+
+
+def range_summary(first_day, last_day, today=None):
+    """
+    Unique visitors and page views for a closed day range. Ranges that end
+    before today are cached indefinitely; visits merged into a past day
+    later (merge_into_day) invalidate them.
+    """
+    today = today or timezone.now().date()
+    key = f"analytics:range:{range_version()}:{first_day}:{last_day}"
+    summary = cache.get(key)
+    metrics.inc("cache_requests", {"cache": "analytics_range", "result": "miss" if summary is None else "hit"})
+    if summary is None:
+        views = DailyAnalytics.objects.filter(day__gte=first_day, day__lte=last_day).aggregate(total=Sum("page_views"))["total"] or 0
+        summary = {"visitors": merged_sketch(first_day, last_day).count(), "pageViews": views}
+        cache.set(key, summary, None if last_day < today else 60)
+    return summary
+
+
+def weekly_visitors(today=None):
+    today = today or timezone.now().date()
+    first = today - timedelta(days=6)
+    rows = {row.day: row for row in DailyAnalytics.objects.filter(day__gte=first).only("day", "unique_visitors", "page_views")}
+    result = []
+    for offset in range(7):
+        day = first + timedelta(days=offset)
+        row = rows.get(day)
+        result.append({
+            "day": day.strftime("%a"),
+            "visitors": row.unique_visitors if row else 0,
+            "pageViews": row.page_views if row else 0,
+        })
+    return result
+
+
+def monthly_visitors(months=6, today=None):
+    today = today or timezone.now().date()
+    year, month = today.year, today.month - (months - 1)
+    while month < 1:
+        month += 12
+        year -= 1
+    result = []
+    for _ in range(months):
+        first = today.replace(year=year, month=month, day=1)
+        next_month = (first + timedelta(days=32)).replace(day=1)
+        summary = range_summary(first, min(next_month - timedelta(days=1), today), today)
+        result.append({"month": first.strftime("%b"), **summary})
+        year, month = next_month.year, next_month.month
+    return result
+
+
+def total_views(days=30, today=None):
+    """Returns (page views in the last `days` days, % change vs the period before)."""
+    today = today or timezone.now().date()
+    current_start = today - timedelta(days=days - 1)
+    previous_start = current_start - timedelta(days=days)
+    rows = DailyAnalytics.objects.all()
+    current = rows.filter(day__gte=current_start).aggregate(total=Sum("page_views"))["total"] or 0
+    previous = rows.filter(day__gte=previous_start, day__lt=current_start).aggregate(total=Sum("page_views"))["total"] or 0
+    if not previous:
+        return current, 0
+    return current, round((current - previous) * 100 / previous)
+
+
+def device_stats(days=30, today=None):
+    today = today or timezone.now().date()
+    totals = dict.fromkeys(DEVICE_COLORS, 0)
+    for counts in DailyAnalytics.objects.filter(day__gte=today - timedelta(days=days - 1)).values_list("device_counts", flat=True):
+        for device in totals:
+            totals[device] += counts.get(device, 0)
+    overall = sum(totals.values())
+    return [
+        {
+            "name": device.capitalize(),
+            "value": round(count * 100 / overall) if overall else 0,
+            "color": DEVICE_COLORS[device],
+        }
+        for device, count in totals.items()
+    ]
@@ -1,6 +1,17 @@
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from .signals import connect_signals
+        connect_signals()
+        # Background jobs only in web processes that opt in; never under `manage.py test`.
+        if getattr(settings, "SCHEDULER_ENABLED", False) and sys.argv[1:2] != ["test"]:
+            from .jobs import register_jobs
+            register_jobs().start()
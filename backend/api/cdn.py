@@ -0,0 +1,137 @@
+import hashlib
+import os
+import re
+from urllib.parse import unquote, urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+
+from .models import SiteSettings
+
+BASE_CACHE_KEY = "cdn:base"
+BASE_CACHE_SECONDS = 300
+TOKEN_LENGTH = 12
+HASH_BUFFER = 1024 * 1024
+# Names that already embed their SHA-256 (cas/aa/bb/<sha256>.ext) change URL
+# whenever the content changes, so they never need a token.
+CONTENT_HASHED_NAME_RE = re.compile(r"(?:^|/)[0-9a-f]{64}(?:\.[^/]*)?$")
+# src="...", href='...', url(...) and srcset candidates in rich text.
+CONTENT_URL_RE = re.compile(r"""(?P<url>(?:https?://[^/"'\s()<>]+)?/[^"'\s()<>]+)""")
+
+
+def cdn_base():
+    """SiteSettings.cdn_url without the trailing slash, or "" when unset."""
+    base = cache.get(BASE_CACHE_KEY)
+    if base is None:
+        base = (SiteSettings.objects.values_list("cdn_url", flat=True).first() or "").strip().rstrip("/")
+        cache.set(BASE_CACHE_KEY, base, BASE_CACHE_SECONDS)
+    return base
+
+
+def invalidate_cdn_base():
+    cache.delete(BASE_CACHE_KEY)
+
+
+def url_prefixes():
+    """(prefix, root directory) for the URL spaces the CDN mirrors."""
+    return (
+        ("/" + settings.MEDIA_URL.strip("/") + "/", str(settings.MEDIA_ROOT)),
+        ("/" + settings.STATIC_URL.strip("/") + "/", str(settings.STATIC_ROOT or "")),
+    )
+
+
+def content_token(root, name):
+    """
+    First TOKEN_LENGTH hex chars of the file's SHA-256; "" when the name is
+    content-hashed already, outside root or missing. The token is cached
+    without expiry under the file's path, size and mtime, so a changed file
+    gets a new key and an unchanged one is hashed once.
+    """
+    if CONTENT_HASHED_NAME_RE.search(name) or not root:
+        return ""
+    try:
+        path = safe_join(root, name)
+    except SuspiciousFileOperation:
+        return ""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return ""
+    key = "cdn:token:" + hashlib.sha1(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+    token = cache.get(key)
+    if token is None:
+        digest = hashlib.sha256()
+        try:
+            with open(path, "rb") as f:
+                while True:
+                    block = f.read(HASH_BUFFER)
+                    if not block:
+                        break
+                    digest.update(block)
+        except OSError:
+            return ""
+        token = digest.hexdigest()[:TOKEN_LENGTH]
+        cache.set(key, token, None)
+    return token
+
+
+def with_token(url, token):
+    if not token:
+        return url
+    return f"{url}{'&' if '?' in url else '?'}v={token}"
+
+
+def rewrite_url(url, origin_hosts=()):
+    """
+    Moves a media or static URL (relative, or absolute on one of
+    origin_hosts / CDN_ORIGIN_HOSTS) onto the CDN base with a content token.
+    Anything else is returned unchanged.
+    """
+    base = cdn_base()
+    if not base or not url or not isinstance(url, str):
+        return url
+    parts = urlsplit(url)
+    if parts.netloc:
+        hosts = set(origin_hosts) | set(getattr(settings, "CDN_ORIGIN_HOSTS", ()))
+        if parts.scheme not in ("http", "https") or parts.netloc not in hosts:
+            return url
+    elif not url.startswith("/"):
+        return url
+    for prefix, root in url_prefixes():
+        if parts.path.startswith(prefix):
+            rewritten = base + parts.path + (f"?{parts.query}" if parts.query else "")
+            rewritten = with_token(rewritten, content_token(root, unquote(parts.path[len(prefix):])))
+            return rewritten + (f"#{parts.fragment}" if parts.fragment else "")
+    return url
+
+
+def rewrite_content(html, origin_hosts=()):
+    """
+    rewrite_url applied to every URL in a block of HTML. The result is
+    cached by content hash, CDN base and origin, so each content version is
+    rewritten once.
+    """
+    base = cdn_base()
+    if not base or not html:
+        return html
+    prefixes = tuple(prefix for prefix, _ in url_prefixes())
+    if not any(prefix in html for prefix in prefixes):
+        return html
+    fingerprint = hashlib.sha256("\0".join([base, *sorted(origin_hosts), html]).encode()).hexdigest()
+    key = f"cdn:content:{fingerprint}"
+    rewritten = cache.get(key)
+    if rewritten is None:
+        rewritten = CONTENT_URL_RE.sub(lambda m: rewrite_url(m.group("url"), origin_hosts), html)
+        cache.set(key, rewritten, getattr(settings, "CDN_CONTENT_CACHE_SECONDS", 3600))
+    return rewritten
+
+
+def request_hosts(request):
+    if request is None:
+        return ()
+    try:
+        return (request.get_host(),)
+    except Exception:
+        return ()
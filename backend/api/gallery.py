@@ -0,0 +1,101 @@
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from PIL import Image, UnidentifiedImageError
+
+from .image_proxy import track_for_instance
+from .images import schedule_derivatives
+from .media_library import owner_label
+from .models import ProjectImage
+from .storage import commit_references, deferred_references
+
+logger = logging.getLogger(__name__)
+
+GALLERY_UPLOAD_TO = "projects/gallery/"
+
+
+class GalleryError(Exception):
+    pass
+
+
+def inspect_upload(file):
+    """Decodes the image header and checks the file structure; returns None or an error."""
+    try:
+        file.seek(0)
+        with Image.open(file) as image:
+            image.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError, ValueError) as e:
+        return f"{file.name}: not a valid image ({e})"
+    finally:
+        file.seek(0)
+    return None
+
+
+def gallery_pool_size():
+    return max(1, getattr(settings, "GALLERY_INGEST_WORKERS", 4))
+
+
+def validate_gallery_uploads(files):
+    """Checks every uploaded file in parallel; raises GalleryError listing the bad ones."""
+    if not files:
+        return
+    with ThreadPoolExecutor(max_workers=min(gallery_pool_size(), len(files))) as pool:
+        errors = [error for error in pool.map(inspect_upload, files) if error]
+    if errors:
+        raise GalleryError("; ".join(errors))
+
+
+def store_uploads(files):
+    """
+    Saves the files to storage in parallel (hashing and moving them is the
+    slow part); the StoredBlob/MediaAsset rows are deferred and returned.
+    """
+    field = ProjectImage._meta.get_field("image")
+    with deferred_references() as pending:
+        def save(file):
+            return field.storage.save(field.generate_filename(None, file.name), file)
+
+        with ThreadPoolExecutor(max_workers=min(gallery_pool_size(), len(files))) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, save, file) for file in files]
+            names = [future.result() for future in futures]
+    return names, pending
+
+
+def ingest_gallery(project, files=(), urls=()):
+    """
+    Adds uploaded files and image URLs to the project's gallery, in that
+    order, after the current last image. Files are stored in parallel, then
+    every row goes in with one bulk_create inside one transaction; the
+    derivatives and remote image fetches are queued for after the commit.
+    Returns the new images.
+    """
+    files = list(files)
+    urls = [url for url in urls if url and isinstance(url, str)]
+    if not files and not urls:
+        return []
+    names, pending = store_uploads(files) if files else ([], [])
+    with transaction.atomic():
+        current = ProjectImage.objects.filter(project=project).aggregate(last=Max("order"))["last"]
+        start = 0 if current is None else current + 1
+        rows = [ProjectImage(project=project, image=name) for name in names]
+        rows += [ProjectImage(project=project, image_url=url) for url in urls]
+        for offset, row in enumerate(rows):
+            row.order = start + offset
+        ProjectImage.objects.bulk_create(rows)
+        # bulk_create skips post_save, and MySQL does not return primary keys.
+        created = list(ProjectImage.objects.filter(project=project, order__gte=start).order_by("order"))
+        owners = {}
+        for image in created:
+            if image.image:
+                owners.setdefault(image.image.name, []).append(owner_label(image, "image"))
+        commit_references(pending, owners)
+        for name in set(names):
+            transaction.on_commit(lambda name=name: schedule_derivatives(name))
+        for image in created:
+            # The image proxy's post_save hook, for the URL rows.
+            track_for_instance(image)
+    return created
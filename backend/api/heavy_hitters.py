@@ -0,0 +1,110 @@
+import time
+from threading import Lock
+
+from django.conf import settings
+
+DIMENSIONS = ("ip", "path", "origin", "user_agent")
+WINDOW_MINUTES = 5
+MAX_KEY_LENGTH = 200
+
+
+class SpaceSaving:
+    """
+    Space-Saving top-k summary with a fixed number of counters. Counts are
+    upper bounds; `error` is how much of a count may belong to evicted keys.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counters = {}
+
+    def add(self, key, weight=1):
+        counter = self.counters.get(key)
+        if counter is not None:
+            counter[0] += weight
+        elif len(self.counters) < self.capacity:
+            self.counters[key] = [weight, 0]
+        else:
+            victim = min(self.counters, key=lambda k: self.counters[k][0])
+            floor = self.counters.pop(victim)[0]
+            self.counters[key] = [floor + weight, floor]
+
+    def merge(self, other):
+        for key, (count, error) in other.counters.items():
+            counter = self.counters.setdefault(key, [0, 0])
+            counter[0] += count
+            counter[1] += error
+        if len(self.counters) > self.capacity:
+            keep = sorted(self.counters.items(), key=lambda item: item[1][0], reverse=True)[:self.capacity]
+            self.counters = dict(keep)
+        return self
+
+    def top(self, n):
+        ranked = sorted(self.counters.items(), key=lambda item: item[1][0], reverse=True)[:n]
+        return [{"key": key, "count": count, "error": error} for key, (count, error) in ranked]
+
+
+class HeavyHitterTracker:
+    """
+    Top talkers per dimension for a rolling window (one summary per minute,
+    the last WINDOW_MINUTES merged on read) and for the current day. Memory
+    is fixed at capacity counters per summary; state is per process.
+    """
+
+    def __init__(self, capacity=None):
+        self.capacity = capacity or getattr(settings, "HEAVY_HITTER_CAPACITY", 64)
+        self.lock = Lock()
+        self.minutes = {}
+        self.day = None
+        self.daily = self._new_summaries()
+
+    def _new_summaries(self):
+        return {dimension: SpaceSaving(self.capacity) for dimension in DIMENSIONS}
+
+    def record(self, values, now=None):
+        now = now if now is not None else time.time()
+        minute = int(now // 60)
+        day = time.strftime("%Y-%m-%d", time.gmtime(now))
+        with self.lock:
+            if day != self.day:
+                self.day = day
+                self.daily = self._new_summaries()
+            summaries = self.minutes.get(minute)
+            if summaries is None:
+                summaries = self.minutes[minute] = self._new_summaries()
+                for old in [m for m in self.minutes if m <= minute - WINDOW_MINUTES]:
+                    del self.minutes[old]
+            for dimension in DIMENSIONS:
+                value = values.get(dimension)
+                if not value:
+                    continue
+                value = value[:MAX_KEY_LENGTH]
+                summaries[dimension].add(value)
+                self.daily[dimension].add(value)
+
+    def snapshot(self, n=10, now=None):
+        now = now if now is not None else time.time()
+        current = int(now // 60)
+        with self.lock:
+            window = self._new_summaries()
+            for minute, summaries in self.minutes.items():
+                if minute > current - WINDOW_MINUTES:
+                    for dimension in DIMENSIONS:
+                        window[dimension].merge(summaries[dimension])
+            return {
+                "window_minutes": WINDOW_MINUTES,
+                "window": {dimension: window[dimension].top(n) for dimension in DIMENSIONS},
+                "day": {dimension: self.daily[dimension].top(n) for dimension in DIMENSIONS},
+            }
+
+
+tracker = HeavyHitterTracker()
+
+
+def record_talker(request, ip, domain):
+    tracker.record({
+        "ip": ip,
+        "path": request.path or "",
+        "origin": domain,
+        "user_agent": request.META.get("HTTP_USER_AGENT", ""),
+    })
@@ -0,0 +1,255 @@
+import hashlib
+import logging
+import mimetypes
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from urllib.parse import urljoin, urlparse
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import metrics
+from .images import schedule_derivatives
+from .models import RemoteImage
+from .uploads import AssembledFile
+
+logger = logging.getLogger(__name__)
+
+COPY_BUFFER = 64 * 1024
+MAX_REDIRECTS = 5
+READY_CACHE_SECONDS = 3600
+PENDING_CACHE_SECONDS = 60
+
+# Model fields holding third-party image URLs, by model label.
+REMOTE_IMAGE_FIELDS = {
+    "api.Project": ("cover_image_url",),
+    "api.ProjectImage": ("image_url",),
+    "api.Certificate": ("image",),
+    "api.BlogPost": ("coverImage",),
+}
+
+
+class ProxyError(Exception):
+    pass
+
+
+def url_hash(url):
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def proxy_cache_key(url):
+    return f"image_proxy:{url_hash(url)}"
+
+
+def host_allowed(url):
+    """http(s) URLs whose host is, or is a subdomain of, an IMAGE_PROXY_ALLOWED_HOSTS entry."""
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return False
+    host = (parsed.hostname or "").lower()
+    if parsed.scheme not in ("http", "https") or not host:
+        return False
+    for allowed in getattr(settings, "IMAGE_PROXY_ALLOWED_HOSTS", ()):
+        allowed = allowed.lower().lstrip(".")
+        if host == allowed or host.endswith("." + allowed):
+            return True
+    return False
+
+
+def download(url):
+    """
+    Streams an allowed image URL into a temp file. Redirects are followed by
+    hand so every hop is checked against the allowlist; the body is capped at
+    IMAGE_PROXY_MAX_BYTES and the whole fetch at IMAGE_PROXY_TIMEOUT seconds.
+    Returns (temp path, content type, size).
+    """
+    timeout = getattr(settings, "IMAGE_PROXY_TIMEOUT", 10)
+    max_bytes = getattr(settings, "IMAGE_PROXY_MAX_BYTES", 15 * 1024 * 1024)
+    deadline = time.monotonic() + timeout
+    for _ in range(MAX_REDIRECTS + 1):
+        if not host_allowed(url):
+            raise ProxyError(f"Host not allowed: {urlparse(url).hostname}")
+        response = requests.get(
+            url, stream=True, allow_redirects=False, timeout=(min(timeout, 5), timeout),
+            headers={"User-Agent": "portfolio-image-proxy/1.0", "Accept": "image/*"},
+        )
+        if not response.is_redirect:
+            break
+        response.close()
+        url = urljoin(url, response.headers["Location"])
+    else:
+        raise ProxyError("Too many redirects")
+
+    with response:
+        if response.status_code != 200:
+            raise ProxyError(f"HTTP {response.status_code}")
+        content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if not content_type.startswith("image/") or content_type == "image/svg+xml":
+            raise ProxyError(f"Not a raster image: {content_type or 'no content type'}")
+        if int(response.headers.get("Content-Length") or 0) > max_bytes:
+            raise ProxyError("Image too large")
+        fd, tmp_path = tempfile.mkstemp(prefix="image-proxy-")
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for block in response.iter_content(COPY_BUFFER):
+                    size += len(block)
+                    if size > max_bytes:
+                        raise ProxyError("Image too large")
+                    if time.monotonic() > deadline:
+                        raise ProxyError("Timed out")
+                    f.write(block)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    return tmp_path, content_type, size
+
+
+def cache_remote_image(url):
+    """Fetches and stores one remote image in the calling thread; returns the RemoteImage."""
+    remote, _ = RemoteImage.objects.get_or_create(url_hash=url_hash(url), defaults={"url": url})
+    remote.attempts += 1
+    remote.fetched_at = timezone.now()
+    started = time.monotonic()
+    try:
+        tmp_path, content_type, size = download(url)
+    except (ProxyError, requests.RequestException, OSError) as e:
+        remote.status = "failed"
+        remote.error = str(e)[:500]
+        remote.save()
+        cache.delete(proxy_cache_key(url))
+        metrics.inc("image_proxy_fetches", {"outcome": "failed"})
+        logger.warning(f"Image proxy could not fetch {url}: {e}")
+        return remote
+    try:
+        ext = mimetypes.guess_extension(content_type) or ".img"
+        with open(tmp_path, "rb") as f:
+            remote.file.save(f"{remote.url_hash[:16]}{ext}", AssembledFile(f, name=f"{remote.url_hash[:16]}{ext}"), save=False)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    remote.status = "ready"
+    remote.content_type = content_type
+    remote.bytes = size
+    remote.error = ""
+    remote.save()
+    cache.delete(proxy_cache_key(url))
+    metrics.inc("image_proxy_fetches", {"outcome": "stored"})
+    metrics.observe("image_proxy_fetch_duration_seconds", time.monotonic() - started)
+    schedule_derivatives(remote.file.name)
+    return remote
+
+
+_pool = None
+_pool_lock = Lock()
+_pending = set()
+
+
+def get_proxy_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, "IMAGE_PROXY_WORKERS", 4), thread_name_prefix="image-proxy",
+            )
+        return _pool
+
+
+def _fetch_in_pool(url):
+    try:
+        return cache_remote_image(url)
+    except Exception as e:
+        logger.error(f"Image proxy failed for {url}: {e}")
+    finally:
+        with _pool_lock:
+            _pending.discard(url)
+        close_old_connections()
+
+
+def schedule_fetch(url):
+    """Queues a fetch unless one is already queued or the queue is full."""
+    with _pool_lock:
+        if url in _pending or len(_pending) >= getattr(settings, "IMAGE_PROXY_QUEUE_LIMIT", 100):
+            return None
+        _pending.add(url)
+    return get_proxy_pool().submit(_fetch_in_pool, url)
+
+
+def proxy_enabled(url):
+    return bool(url) and getattr(settings, "IMAGE_PROXY_ENABLED", False) and host_allowed(url)
+
+
+def track_remote_url(url):
+    """
+    Makes sure an allowed URL has a RemoteImage row and queues its fetch
+    when it is new, still pending or failed more than
+    IMAGE_PROXY_RETRY_SECONDS ago.
+    """
+    if not proxy_enabled(url):
+        return None
+    remote, created = RemoteImage.objects.get_or_create(url_hash=url_hash(url), defaults={"url": url})
+    retry_after = timezone.now() - timezone.timedelta(seconds=getattr(settings, "IMAGE_PROXY_RETRY_SECONDS", 3600))
+    if created or remote.status == "pending" or (
+        remote.status == "failed" and (remote.fetched_at is None or remote.fetched_at < retry_after)
+    ):
+        schedule_fetch(url)
+    return remote
+
+
+def track_for_instance(instance):
+    """Tracks the remote image URLs of a saved instance (post_save)."""
+    for field_name in REMOTE_IMAGE_FIELDS.get(instance._meta.label, ()):
+        url = getattr(instance, field_name)
+        if proxy_enabled(url):
+            transaction.on_commit(lambda url=url: track_remote_url(url))
+
+
+def retry_remote_images():
+    """Re-queues pending fetches and failures older than IMAGE_PROXY_RETRY_SECONDS (scheduler job)."""
+    retry_after = timezone.now() - timezone.timedelta(seconds=getattr(settings, "IMAGE_PROXY_RETRY_SECONDS", 3600))
+    stale = RemoteImage.objects.filter(
+        Q(status="pending") | Q(status="failed", fetched_at__lt=retry_after)
+    ).order_by("fetched_at")
+    queued = 0
+    for url in stale.values_list("url", flat=True)[:getattr(settings, "IMAGE_PROXY_QUEUE_LIMIT", 100)]:
+        if host_allowed(url) and schedule_fetch(url) is not None:
+            queued += 1
+    return queued
+
+
+def cached_name(url):
+    """
+    Storage name of the local copy of url, or None while it is not available.
+    Only reads: rows are created and fetches queued when the models holding
+    the URLs are saved (track_for_instance).
+    """
+    if not proxy_enabled(url):
+        return None
+    key = proxy_cache_key(url)
+    name = cache.get(key)
+    if name is not None:
+        return name or None
+    remote = RemoteImage.objects.filter(url_hash=url_hash(url), status="ready").only("file").first()
+    if remote is not None and remote.file:
+        cache.set(key, remote.file.name, READY_CACHE_SECONDS)
+        return remote.file.name
+    cache.set(key, "", PENDING_CACHE_SECONDS)
+    return None
+
+
+def proxied_url(url, request=None):
+    """The local URL for a cached remote image, else the original URL."""
+    name = cached_name(url)
+    if not name:
+        return url
+    local = default_storage.url(name)
+    return request.build_absolute_uri(local) if request is not None else local
@@ -0,0 +1,183 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.dispatch import Signal
+from PIL import features
+
+from .imaging import DERIVATIVE_PREFIX, render_image
+from .media_library import record_asset
+from .models import ImageDerivative, MediaAsset
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WIDTHS = (320, 640, 960, 1280, 1920)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tif", ".tiff", ".avif", ".heic")
+SRCSET_CACHE_SECONDS = 3600
+# Images still being processed; their entries are also dropped once recorded.
+PENDING_CACHE_SECONDS = 60
+PLACEHOLDER_FIELDS = ("width", "height", "dominant_color", "blurhash")
+
+# Image fields that get derivatives, per model label.
+IMAGE_FIELDS = {
+    "api.Project": ("cover_image",),
+    "api.ProjectImage": ("image",),
+    "api.BlogPost": ("coverImageFile",),
+    "api.Profile": ("heroImageFile", "aboutImageFile"),
+    "api.HomeContent": ("heroImageFile",),
+    "api.AboutContent": ("aboutImageFile",),
+}
+
+# Sent with `source` once an image's derivatives and placeholder are recorded.
+image_processed = Signal()
+
+
+def derivative_formats():
+    formats = ["webp", "jpeg"]
+    if features.check("avif"):
+        formats.append("avif")
+    return formats
+
+
+def derivative_widths():
+    return tuple(getattr(settings, "IMAGE_DERIVATIVE_WIDTHS", DEFAULT_WIDTHS))
+
+
+def is_image_name(name):
+    return bool(name) and name.lower().endswith(IMAGE_EXTENSIONS) and not name.startswith(DERIVATIVE_PREFIX)
+
+
+def record_derivatives(source, results):
+    with transaction.atomic():
+        ImageDerivative.objects.filter(source=source).delete()
+        ImageDerivative.objects.bulk_create([
+            ImageDerivative(source=source, width=r["width"], height=r["height"], format=r["format"], file=r["name"], bytes=r["bytes"])
+            for r in results
+        ])
+    cache.delete(srcset_cache_key(source))
+
+
+def record_placeholder(source, placeholder):
+    """Stores width/height/dominant colour/blurhash on the image's MediaAsset."""
+    values = {field: placeholder[field] for field in PLACEHOLDER_FIELDS}
+    if not MediaAsset.objects.filter(path=source).update(**values):
+        if record_asset(source) is not None:
+            MediaAsset.objects.filter(path=source).update(**values)
+    cache.delete(image_meta_cache_key(source))
+
+
+def record_rendered(source, rendered):
+    record_derivatives(source, rendered["derivatives"])
+    record_placeholder(source, rendered["placeholder"])
+    image_processed.send(sender=None, source=source)
+
+
+def generate_derivatives(source):
+    """Renders and records derivatives and placeholder data in the calling process."""
+    rendered = render_image(source, str(settings.MEDIA_ROOT), derivative_widths(), derivative_formats())
+    record_rendered(source, rendered)
+    return rendered["derivatives"]
+
+
+_pool = None
+_pool_lock = Lock()
+_pending = set()
+
+
+def get_image_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=getattr(settings, "IMAGE_WORKERS", 2))
+        return _pool
+
+
+def reset_image_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _on_rendered(source, future):
+    try:
+        record_rendered(source, future.result())
+    except BrokenProcessPool:
+        reset_image_pool()
+        logger.error(f"Image pool died while processing {source}")
+    except Exception as e:
+        logger.error(f"Derivative generation failed for {source}: {e}")
+    finally:
+        _pending.discard(source)
+        close_old_connections()
+
+
+def schedule_derivatives(source):
+    """Queues derivative generation for a stored image on the process pool."""
+    if not is_image_name(source) or source in _pending:
+        return None
+    _pending.add(source)
+    args = (source, str(settings.MEDIA_ROOT), derivative_widths(), derivative_formats())
+    try:
+        future = get_image_pool().submit(render_image, *args)
+    except (BrokenProcessPool, RuntimeError):
+        reset_image_pool()
+        future = get_image_pool().submit(render_image, *args)
+    future.add_done_callback(lambda f: _on_rendered(source, f))
+    return future
+
+
+def schedule_for_instance(instance):
+    """Schedules derivatives for the instance's image fields once the save commits."""
+    for field_name in IMAGE_FIELDS.get(instance._meta.label, ()):
+        name = getattr(getattr(instance, field_name), "name", "")
+        if is_image_name(name) and not ImageDerivative.objects.filter(source=name).exists():
+            transaction.on_commit(lambda name=name: schedule_derivatives(name))
+
+
+def srcset_cache_key(source):
+    return f"images:srcset:{source}"
+
+
+def srcset_for(source, request=None):
+    """{format: {width: url}} for a stored image, or {} while it is pending."""
+    if not source:
+        return {}
+    key = srcset_cache_key(source)
+    names = cache.get(key)
+    if names is None:
+        names = {}
+        for fmt, width, file in ImageDerivative.objects.filter(source=source).values_list("format", "width", "file"):
+            names.setdefault(fmt, {})[str(width)] = file
+        cache.set(key, names, SRCSET_CACHE_SECONDS if names else PENDING_CACHE_SECONDS)
+    result = {}
+    for fmt, widths in names.items():
+        urls = {}
+        for width, file in sorted(widths.items(), key=lambda item: int(item[0])):
+            url = default_storage.url(file)
+            urls[width] = request.build_absolute_uri(url) if request is not None else url
+        result[fmt] = urls
+    return result
+
+
+def image_meta_cache_key(source):
+    return f"images:meta:{source}"
+
+
+def image_meta_for(source):
+    """{width, height, dominant_color, blurhash} for a stored image, or {} if unknown."""
+    if not source:
+        return {}
+    key = image_meta_cache_key(source)
+    meta = cache.get(key)
+    if meta is None:
+        row = MediaAsset.objects.filter(path=source).values(*PLACEHOLDER_FIELDS).first()
+        meta = row if row and row["width"] else {}
+        cache.set(key, meta, SRCSET_CACHE_SECONDS if meta.get("blurhash") else PENDING_CACHE_SECONDS)
+    return meta
@@ -0,0 +1,159 @@
+import math
+import os
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+# Pool workers import only this module, so it must not touch Django.
+DERIVATIVE_PREFIX = "derivatives/"
+
+SAVE_OPTIONS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "jpeg": {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True},
+    "avif": {"format": "AVIF", "quality": 60},
+}
+
+
+def derivative_name(source, width, fmt):
+    stem = os.path.splitext(source)[0]
+    return f"{DERIVATIVE_PREFIX}{stem}/{width}w.{fmt}"
+
+
+def load_image(path):
+    with Image.open(path) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "P") else "RGB")
+    return image
+
+
+def write_derivatives(image, source, media_root, widths, formats):
+    results = []
+    # Never upscale: widths above the original collapse into the original width.
+    targets = sorted({min(width, image.width) for width in widths})
+    for width in targets:
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for fmt in formats:
+            frame = resized
+            if fmt == "jpeg" and frame.mode == "RGBA":
+                frame = flatten(frame)
+            name = derivative_name(source, width, fmt)
+            path = Path(media_root) / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.name + ".tmp")
+            frame.save(tmp, **SAVE_OPTIONS[fmt])
+            os.replace(tmp, path)
+            results.append({"width": width, "height": height, "format": fmt, "name": name, "bytes": path.stat().st_size})
+    return results
+
+
+def flatten(image, background=(255, 255, 255)):
+    flattened = Image.new("RGB", image.size, background)
+    flattened.paste(image, mask=image.getchannel("A"))
+    return flattened
+
+
+def render_derivatives(source, media_root, widths, formats):
+    """
+    Worker-side: decodes the source once, writes every width/format under
+    MEDIA_ROOT/derivatives/ and returns what it wrote. Touches only the file
+    system so it can run in a pool process without Django's DB connection.
+    """
+    return write_derivatives(load_image(os.path.join(media_root, source)), source, media_root, widths, formats)
+
+
+def render_image(source, media_root, widths, formats):
+    """render_derivatives plus the placeholder data, from a single decode."""
+    image = load_image(os.path.join(media_root, source))
+    return {
+        "derivatives": write_derivatives(image, source, media_root, widths, formats),
+        "placeholder": placeholder(image),
+    }
+
+
+def placeholder(image):
+    """Dimensions, dominant colour (#rrggbb) and a 4x3 blurhash for first paint."""
+    small = image.copy()
+    if small.mode == "RGBA":
+        small = flatten(small)
+    small.thumbnail((BLURHASH_SAMPLE, BLURHASH_SAMPLE))
+    return {
+        "width": image.width,
+        "height": image.height,
+        "dominant_color": dominant_color(small),
+        "blurhash": blurhash_encode(small),
+    }
+
+
+def dominant_color(image):
+    quantized = image.quantize(colors=5)
+    palette = quantized.getpalette()
+    count, index = max(quantized.getcolors())
+    r, g, b = palette[index * 3:index * 3 + 3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+# Blurhash (https://blurha.sh) encoder. Only runs on a BLURHASH_SAMPLE-pixel
+# thumbnail, so plain Python is fast enough.
+BLURHASH_SAMPLE = 32
+BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+def encode83(value, length):
+    return "".join(BASE83[(value // 83 ** (length - i)) % 83] for i in range(1, length + 1))
+
+
+def srgb_to_linear(value):
+    v = value / 255
+    return v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+
+
+def linear_to_srgb(value):
+    v = max(0.0, min(1.0, value))
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def sign_pow(value, exp):
+    return math.copysign(abs(value) ** exp, value)
+
+
+def blurhash_encode(image, x_components=4, y_components=3):
+    width, height = image.size
+    pixels = [tuple(srgb_to_linear(c) for c in pixel) for pixel in image.convert("RGB").getdata()]
+    cos_x = [[math.cos(math.pi * i * x / width) for x in range(width)] for i in range(x_components)]
+    cos_y = [[math.cos(math.pi * j * y / height) for y in range(height)] for j in range(y_components)]
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            norm = 1 if i == 0 and j == 0 else 2
+            r = g = b = 0.0
+            for y in range(height):
+                row = y * width
+                cy = cos_y[j][y]
+                for x in range(width):
+                    basis = cos_x[i][x] * cy
+                    pr, pg, pb = pixels[row + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = norm / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = encode83((x_components - 1) + (y_components - 1) * 9, 1)
+    if ac:
+        quantised_max = max(0, min(82, int(max(abs(v) for f in ac for v in f) * 166 - 0.5)))
+        max_value = (quantised_max + 1) / 166
+        result += encode83(quantised_max, 1)
+    else:
+        max_value = 1
+        result += encode83(0, 1)
+    result += encode83((linear_to_srgb(dc[0]) << 16) + (linear_to_srgb(dc[1]) << 8) + linear_to_srgb(dc[2]), 4)
+    for f in ac:
+        q = [max(0, min(18, int(sign_pow(v / max_value, 0.5) * 9 + 9.5))) for v in f]
+        result += encode83(q[0] * 19 * 19 + q[1] * 19 + q[2], 2)
+    return result
@@ -0,0 +1,29 @@
+from django.conf import settings
+
+from .ai_keys import key_pool
+from .ai_usage import flush_usage
+from .image_proxy import retry_remote_images
+from .media_gc import scheduled_media_gc
+from .middleware import sweep_expired_blocks
+from .scheduler import scheduler
+from .snapshots import flush_pending
+from .uploads import expire_stale_uploads
+
+
+def register_jobs():
+    """
+    Adds the periodic maintenance jobs to the scheduler; does not start it.
+    The AI key sync and usage flush work on per-process state and run in
+    every process; the others are exclusive.
+    """
+    scheduler.add_job("expire_block_entries", getattr(settings, "ABUSE_SWEEP_SECONDS", 60), sweep_expired_blocks)
+    scheduler.add_job("expire_stale_uploads", 3600, expire_stale_uploads, exclusive=True)
+    scheduler.add_job("ai_key_sync", getattr(settings, "AI_KEY_SYNC_SECONDS", 15), key_pool.sync)
+    scheduler.add_job("ai_usage_flush", getattr(settings, "AI_USAGE_FLUSH_SECONDS", 10), flush_usage)
+    if getattr(settings, "IMAGE_PROXY_ENABLED", False):
+        scheduler.add_job("image_proxy_retry", getattr(settings, "IMAGE_PROXY_RETRY_SECONDS", 3600), retry_remote_images, exclusive=True)
+    if getattr(settings, "MEDIA_GC_INTERVAL_HOURS", 0):
+        scheduler.add_job("media_gc", settings.MEDIA_GC_INTERVAL_HOURS * 3600, scheduled_media_gc, exclusive=True)
+    if getattr(settings, "SNAPSHOT_DIR", ""):
+        scheduler.add_job("snapshot_rebuild", getattr(settings, "SNAPSHOT_DEBOUNCE_SECONDS", 10), flush_pending, exclusive=True)
+    return scheduler
@@ -0,0 +1,202 @@
+import logging
+import re
+import time
+from datetime import timedelta
+from threading import Lock
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import RouteLatency
+
+logger = logging.getLogger(__name__)
+
+# 2**SUB_BUCKET_BITS linear sub-buckets per power of two: every recorded
+# value is off by at most 1/32 (~3%) of itself, whatever its magnitude.
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+PERCENTILES = (50, 90, 99)
+UNMATCHED_ROUTE = "<unmatched>"
+
+NAMED_GROUP = re.compile(r"\(\?P<(\w+)>[^)]*\)")
+PATH_CONVERTER = re.compile(r"<(?:\w+:)?(\w+)>")
+
+
+def bucket_index(value):
+    if value < SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+
+def bucket_upper_bound(index):
+    if index < SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    return ((index % SUB_BUCKETS + SUB_BUCKETS + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """
+    HDR-style log-linear histogram of integer microseconds. Only non-empty
+    buckets are stored, so a route needs a few dozen counters at most, and
+    histograms merge exactly by adding counts.
+    """
+
+    def __init__(self, counts=None, total=0, maximum=0):
+        self.counts = {int(k): v for k, v in (counts or {}).items()}
+        self.total = total
+        self.maximum = maximum
+
+    @property
+    def count(self):
+        return sum(self.counts.values())
+
+    def record(self, micros):
+        micros = max(int(micros), 0)
+        index = bucket_index(micros)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += micros
+        self.maximum = max(self.maximum, micros)
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.maximum = max(self.maximum, other.maximum)
+        return self
+
+    def percentile(self, p):
+        count = self.count
+        if not count:
+            return 0
+        rank = max(1, -(-count * p // 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(bucket_upper_bound(index), self.maximum)
+        return self.maximum
+
+    def summary(self):
+        count = self.count
+        result = {f"p{p}_ms": round(self.percentile(p) / 1000, 1) for p in PERCENTILES}
+        result["max_ms"] = round(self.maximum / 1000, 1)
+        result["mean_ms"] = round(self.total / count / 1000, 1) if count else 0
+        result["count"] = count
+        return result
+
+
+def normalize_route(request):
+    """
+    Route template for the request, e.g. /api/projects/{id}/. Unresolved
+    paths share one key so scanners cannot grow the table without bound.
+    """
+    match = getattr(request, "resolver_match", None)
+    route = getattr(match, "route", None)
+    if not route:
+        return UNMATCHED_ROUTE
+    route = NAMED_GROUP.sub(r"{\1}", route)
+    route = PATH_CONVERTER.sub(r"{\1}", route)
+    route = route.replace("{pk}", "{id}").replace("\\.", ".").replace("/?$", "").strip("^$")
+    return "/" + route.replace("/^", "/")
+
+
+class LatencyRecorder:
+    """
+    Per-process histograms keyed by (hour, route, method, status class),
+    merged into RouteLatency rows every flush_interval seconds.
+    """
+
+    def __init__(self, flush_interval=None):
+        self.flush_interval = flush_interval if flush_interval is not None else getattr(settings, "LATENCY_FLUSH_SECONDS", 30)
+        self.lock = Lock()
+        self.pending = {}
+        self.last_flush = time.monotonic()
+        self.last_prune = 0
+
+    def record(self, route, method, status_code, micros, now=None):
+        now = now or timezone.now()
+        hour = now.replace(minute=0, second=0, microsecond=0)
+        key = (hour, route, method, f"{int(status_code or 0) // 100}xx")
+        with self.lock:
+            histogram = self.pending.get(key)
+            if histogram is None:
+                histogram = self.pending[key] = LatencyHistogram()
+            histogram.record(micros)
+            due = time.monotonic() - self.last_flush >= self.flush_interval
+        if due:
+            self.flush(now)
+
+    def flush(self, now=None):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.last_flush = time.monotonic()
+        for key, histogram in pending.items():
+            try:
+                merge_into_hour(key, histogram)
+            except Exception as e:
+                logger.error(f"Latency flush failed for {key[1]} {key[2]}: {e}")
+        self.prune(now or timezone.now())
+
+    def prune(self, now):
+        if time.monotonic() - self.last_prune < 3600:
+            return
+        self.last_prune = time.monotonic()
+        retention = getattr(settings, "LATENCY_RETENTION_DAYS", 30)
+        RouteLatency.objects.filter(hour__lt=now - timedelta(days=retention)).delete()
+
+
+def row_histogram(row):
+    return LatencyHistogram(row.buckets, row.total_us, row.max_us)
+
+
+def merge_into_hour(key, histogram):
+    hour, route, method, status_class = key
+    lookup = {"hour": hour, "route": route[:255], "method": method, "status_class": status_class}
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                row, _ = RouteLatency.objects.select_for_update().get_or_create(**lookup)
+                merged = row_histogram(row).merge(histogram)
+                row.count = merged.count
+                row.total_us = merged.total
+                row.max_us = merged.maximum
+                row.buckets = {str(k): v for k, v in merged.counts.items()}
+                row.save()
+            return
+        except IntegrityError:
+            # Lost the race to create the row; the retry will lock it.
+            if attempt:
+                raise
+
+
+latency_recorder = LatencyRecorder()
+
+
+def record_latency(request, response, duration, route=None):
+    latency_recorder.record(
+        route or normalize_route(request),
+        request.method,
+        getattr(response, "status_code", 0),
+        duration * 1_000_000,
+    )
+
+
+def route_latency_summary(start, end):
+    """Percentiles per route/method/status class over [start, end), slowest p99 first."""
+    merged = {}
+    rows = RouteLatency.objects.filter(hour__gte=start, hour__lt=end)
+    for row in rows.only("route", "method", "status_class", "total_us", "max_us", "buckets"):
+        key = (row.route, row.method, row.status_class)
+        if key in merged:
+            merged[key].merge(row_histogram(row))
+        else:
+            merged[key] = row_histogram(row)
+    result = [
+        {"route": route, "method": method, "status_class": status_class, **histogram.summary()}
+        for (route, method, status_class), histogram in merged.items()
+    ]
+    result.sort(key=lambda item: item["p99_ms"], reverse=True)
+    return result
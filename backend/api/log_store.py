@@ -0,0 +1,663 @@
+import atexit
+import csv
+import io
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, timedelta
+from pathlib import Path
+from queue import Full, Queue
+from threading import Lock, Thread
+
+from django.conf import settings
+
+from . import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Each log file (logs_<date>.json) gets a sibling index (logs_<date>.idx)
+# holding the byte offset of every record as a little-endian uint64.
+OFFSET_FORMAT = "<Q"
+OFFSET_SIZE = struct.calcsize(OFFSET_FORMAT)
+SUCCESS_THRESHOLD = 400
+MAX_RANGE_DAYS = 31
+
+
+def get_log_dir():
+    return Path(getattr(settings, "API_LOG_DIR", None) or settings.BASE_DIR)
+
+
+def log_file_path(date_str, log_dir=None):
+    return Path(log_dir or get_log_dir()) / f"logs_{date_str}.json"
+
+
+def index_file_path(date_str, log_dir=None):
+    return Path(log_dir or get_log_dir()) / f"logs_{date_str}.idx"
+
+
+def _lock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+
+def _unlock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def append_log_entry(entry, date_str, log_dir=None):
+    """
+    Appends one record to the day's log file and its offset to the index.
+    Both writes happen under an exclusive lock on the data file so concurrent
+    workers cannot interleave records and offsets.
+    """
+    line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+    data_path = log_file_path(date_str, log_dir)
+    with open(data_path, "ab") as f:
+        _lock(f)
+        try:
+            offset = f.seek(0, os.SEEK_END)
+            f.write(line)
+            f.flush()
+            with open(index_file_path(date_str, log_dir), "ab") as idx:
+                idx.write(struct.pack(OFFSET_FORMAT, offset))
+        finally:
+            _unlock(f)
+    return offset
+
+
+class LogWriter:
+    """
+    Bounded queue drained by one daemon thread, so requests never wait on the
+    log file lock. When the queue is full the record is dropped and counted
+    rather than blocking the request. API_LOG_QUEUE_SIZE = 0 writes inline.
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize if maxsize is not None else getattr(settings, "API_LOG_QUEUE_SIZE", 10000)
+        self.queue = Queue(self.maxsize) if self.maxsize else None
+        self.thread = None
+        self.start_lock = Lock()
+        self.dropped = 0
+
+    def submit(self, entry, date_str, log_dir=None):
+        log_dir = log_dir or get_log_dir()
+        if self.queue is None:
+            self.write(entry, date_str, log_dir)
+            return True
+        self.ensure_started()
+        try:
+            self.queue.put_nowait((entry, date_str, log_dir))
+            return True
+        except Full:
+            self.dropped += 1
+            metrics.inc("log_queue_dropped")
+            return False
+
+    def ensure_started(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.start_lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = Thread(target=self.run, name="api-log-writer", daemon=True)
+                self.thread.start()
+
+    def depth(self):
+        return self.queue.qsize() if self.queue is not None else 0
+
+    def write(self, entry, date_str, log_dir):
+        try:
+            append_log_entry(entry, date_str, log_dir)
+            metrics.inc("log_records_written")
+        except Exception as e:
+            logger.error(f"Log write failed for {date_str}: {e}")
+
+    def run(self):
+        while True:
+            entry, date_str, log_dir = self.queue.get()
+            try:
+                self.write(entry, date_str, log_dir)
+            finally:
+                self.queue.task_done()
+
+    def flush(self, timeout=5):
+        """Waits (up to timeout seconds) for queued records to be written."""
+        if self.queue is None or self.thread is None:
+            return
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+
+log_writer = LogWriter()
+metrics.registry.register_gauge("log_queue_depth", log_writer.depth)
+atexit.register(log_writer.flush, 2)
+
+
+def _scan_line_offsets(path, start):
+    offsets = []
+    with open(path, "rb") as f:
+        f.seek(start)
+        position = start
+        for line in f:
+            if line.strip():
+                offsets.append(position)
+            position += len(line)
+    return offsets
+
+
+def ensure_log_index(date_str, log_dir=None):
+    """
+    Makes sure the index covers every record in the data file. Files written
+    before the index existed (or by a worker that died between the two writes)
+    are caught up by scanning only the unindexed tail.
+    """
+    data_path = log_file_path(date_str, log_dir)
+    if not data_path.exists():
+        return False
+    idx_path = index_file_path(date_str, log_dir)
+    with open(data_path, "rb") as f:
+        _lock(f)
+        try:
+            data_size = os.fstat(f.fileno()).st_size
+            with open(idx_path, "a+b") as idx:
+                idx_size = os.fstat(idx.fileno()).st_size
+                usable = idx_size - (idx_size % OFFSET_SIZE)
+                if usable != idx_size:
+                    idx.truncate(usable)
+                start = 0
+                if usable:
+                    idx.seek(usable - OFFSET_SIZE)
+                    (last_offset,) = struct.unpack(OFFSET_FORMAT, idx.read(OFFSET_SIZE))
+                    f.seek(last_offset)
+                    f.readline()
+                    start = f.tell()
+                if start < data_size:
+                    missing = _scan_line_offsets(data_path, start)
+                    if missing:
+                        idx.seek(0, os.SEEK_END)
+                        idx.write(b"".join(struct.pack(OFFSET_FORMAT, o) for o in missing))
+        finally:
+            _unlock(f)
+    return True
+
+
+class LogFileReader:
+    """
+    Random access over a day's log file. Offsets come from the index and
+    records are decoded straight out of a memory map, so reading one page
+    never touches the rest of the file.
+    """
+
+    def __init__(self, date_str, log_dir=None):
+        self.date_str = date_str
+        self.log_dir = log_dir
+        self._data_file = None
+        self._data = None
+        self._index = None
+        self._index_file = None
+        self.count = 0
+
+    def __enter__(self):
+        if not ensure_log_index(self.date_str, self.log_dir):
+            return self
+        self._data_file = open(log_file_path(self.date_str, self.log_dir), "rb")
+        self._index_file = open(index_file_path(self.date_str, self.log_dir), "rb")
+        data_size = os.fstat(self._data_file.fileno()).st_size
+        index_size = os.fstat(self._index_file.fileno()).st_size
+        if data_size and index_size >= OFFSET_SIZE:
+            self._data = mmap.mmap(self._data_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._index = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.count = index_size // OFFSET_SIZE
+        return self
+
+    def __exit__(self, *exc):
+        for handle in (self._data, self._index, self._data_file, self._index_file):
+            if handle is not None:
+                handle.close()
+        self._data = self._index = self._data_file = self._index_file = None
+
+    def __len__(self):
+        return self.count
+
+    def offset(self, number):
+        return struct.unpack_from(OFFSET_FORMAT, self._index, number * OFFSET_SIZE)[0]
+
+    def raw_record(self, number):
+        start = self.offset(number)
+        end = self._data.find(b"\n", start)
+        if end == -1:
+            end = len(self._data)
+        return self._data[start:end]
+
+    def read_record(self, number):
+        try:
+            return json.loads(self.raw_record(number))
+        except Exception:
+            return None
+
+    def read_records(self, numbers):
+        entries = []
+        for number in numbers:
+            entry = self.read_record(number)
+            if entry is not None:
+                entries.append(entry)
+        return entries
+
+    def iter_raw(self):
+        for number in range(self.count):
+            yield number, self.raw_record(number)
+
+
+def parse_log_filters(params):
+    """Normalizes the monitor's query params; returns None when nothing filters."""
+    filters = {
+        "domain": (params.get("domain") or "").strip().lower(),
+        "ip": (params.get("ip") or "").strip(),
+        "endpoint": (params.get("endpoint") or "").strip(),
+        "method": (params.get("method") or "").strip().upper(),
+        "status": (params.get("status") or "").strip(),
+        "blocked": None,
+    }
+    blocked = params.get("blocked")
+    if blocked is not None and blocked != "":
+        filters["blocked"] = str(blocked).lower() in ["1", "true", "yes"]
+    if not any(value not in ("", None) for value in filters.values()):
+        return None
+    # Substrings that must appear in the raw JSON line for a record to match.
+    # Only ASCII needles are used so bytes.lower() stays equivalent to str.lower().
+    needles = []
+    for key in ("ip", "endpoint"):
+        if filters[key]:
+            needles.append((json.dumps(filters[key], ensure_ascii=False)[1:-1].encode("utf-8"), False))
+    if filters["domain"] and filters["domain"].isascii():
+        needles.append((json.dumps(filters["domain"], ensure_ascii=False)[1:-1].encode("utf-8"), True))
+    filters["needles"] = [n for n in needles if n[0].isascii()]
+    return filters
+
+
+def log_entry_matches(entry, filters):
+    domain = filters["domain"]
+    if domain and str(entry.get("origin", "")).lower().find(domain) == -1 and str(entry.get("host", "")).lower().find(domain) == -1:
+        return False
+    if filters["ip"] and str(entry.get("ip", "")) != filters["ip"]:
+        return False
+    if filters["endpoint"] and str(entry.get("path", "")).find(filters["endpoint"]) == -1:
+        return False
+    if filters["method"] and str(entry.get("method", "")).upper() != filters["method"]:
+        return False
+    if filters["status"]:
+        try:
+            if int(entry.get("status_code", 0)) != int(filters["status"]):
+                return False
+        except Exception:
+            return False
+    if filters["blocked"] is not None and bool(entry.get("blocked", False)) != filters["blocked"]:
+        return False
+    return True
+
+
+def raw_line_may_match(raw, filters):
+    lowered = None
+    for needle, case_insensitive in filters.get("needles", ()):
+        if case_insensitive:
+            if lowered is None:
+                lowered = raw.lower()
+            if needle not in lowered:
+                return False
+        elif needle not in raw:
+            return False
+    return True
+
+
+def hour_bucket(timestamp):
+    if isinstance(timestamp, str) and len(timestamp) >= 13 and timestamp[10] == "T":
+        return f"{timestamp[11:13]}:00"
+    return "unknown"
+
+
+class LogScan:
+    """Accumulates counts and per-hour stats while a day is being streamed."""
+
+    def __init__(self):
+        self.total = 0
+        self.success_count = 0
+        self.error_count = 0
+        self.per_hour = {}
+
+    def merge(self, other):
+        self.total += other.total
+        self.success_count += other.success_count
+        self.error_count += other.error_count
+        for key, value in other.per_hour.items():
+            self.per_hour[key] = self.per_hour.get(key, 0) + value
+
+    def add(self, entry):
+        self.total += 1
+        try:
+            code = int(entry.get("status_code", 0))
+        except Exception:
+            code = None
+        if code is not None:
+            if code < SUCCESS_THRESHOLD:
+                self.success_count += 1
+            else:
+                self.error_count += 1
+        if entry.get("timestamp"):
+            key = hour_bucket(entry["timestamp"])
+            self.per_hour[key] = self.per_hour.get(key, 0) + 1
+
+
+def page_bounds(total, page, page_size):
+    if page_size <= 0:
+        page_size = 50
+    total_pages = (total + page_size - 1) // page_size
+    if page < 1:
+        page = 1
+    if total_pages > 0 and page > total_pages:
+        page = total_pages
+    start = (page - 1) * page_size
+    return page, start, start + page_size, total_pages
+
+
+def read_log_page(date_str, page, page_size, filters=None, log_dir=None, collect_stats=True):
+    """
+    Returns one page of a day's records plus the stats shown next to it.
+    Only the requested page is decoded into the result; filtering keeps the
+    record numbers of the current window (and a page-sized tail in case the
+    page number has to be clamped), so memory is bounded by page_size.
+    Without filters and with collect_stats=False nothing but the page is read.
+    """
+    scan = LogScan()
+    with LogFileReader(date_str, log_dir) as reader:
+        if not filters:
+            if collect_stats:
+                for _, raw in reader.iter_raw():
+                    try:
+                        scan.add(json.loads(raw))
+                    except Exception:
+                        continue
+            page, start, end, total_pages = page_bounds(len(reader), page, page_size)
+            items = reader.read_records(range(start, min(end, len(reader))))
+            return {"items": items, "total": len(reader), "total_pages": total_pages, "page": page, "scan": scan}
+
+        requested_start = (max(page, 1) - 1) * page_size
+        window = []
+        tail = deque(maxlen=page_size)
+        for number, raw in reader.iter_raw():
+            if not raw_line_may_match(raw, filters):
+                continue
+            try:
+                entry = json.loads(raw)
+            except Exception:
+                continue
+            if not log_entry_matches(entry, filters):
+                continue
+            ordinal = scan.total
+            scan.add(entry)
+            if requested_start <= ordinal < requested_start + page_size:
+                window.append(number)
+            tail.append(number)
+
+        page, start, end, total_pages = page_bounds(scan.total, page, page_size)
+        if start != requested_start:
+            # Requested page was past the end; serve the last page from the tail.
+            window = list(tail)[-(scan.total - start):] if scan.total else []
+        items = reader.read_records(window)
+    return {"items": items, "total": scan.total, "total_pages": total_pages, "page": page, "scan": scan}
+
+
+def date_range(date_from, date_to):
+    """Inclusive list of ISO dates, oldest first, capped at MAX_RANGE_DAYS."""
+    start = date.fromisoformat(date_from)
+    end = date.fromisoformat(date_to)
+    if end < start:
+        start, end = end, start
+    days = min((end - start).days + 1, MAX_RANGE_DAYS)
+    return [(start + timedelta(days=offset)).isoformat() for offset in range(days)]
+
+
+def scan_log_day(date_str, log_dir, filters, head_limit, page_size, collect_stats=True):
+    """
+    Scans one day for a range query; runs inside a pool worker, so it only
+    deals in plain data. Returns the match count, the record numbers of the
+    first head_limit and last page_size matches, and the day's stats.
+    """
+    scan = LogScan()
+    with LogFileReader(date_str, log_dir) as reader:
+        if not filters:
+            total = len(reader)
+            if collect_stats:
+                for _, raw in reader.iter_raw():
+                    try:
+                        scan.add(json.loads(raw))
+                    except Exception:
+                        continue
+            head = list(range(min(total, head_limit)))
+            tail = list(range(max(0, total - page_size), total))
+            return {"date": date_str, "total": total, "head": head, "tail": tail, "scan": scan}
+
+        total = 0
+        head = []
+        tail = deque(maxlen=page_size)
+        for number, raw in reader.iter_raw():
+            if not raw_line_may_match(raw, filters):
+                continue
+            try:
+                entry = json.loads(raw)
+            except Exception:
+                continue
+            if not log_entry_matches(entry, filters):
+                continue
+            total += 1
+            scan.add(entry)
+            if len(head) < head_limit:
+                head.append(number)
+            tail.append(number)
+    return {"date": date_str, "total": total, "head": head, "tail": list(tail), "scan": scan}
+
+
+_scan_pool = None
+_scan_pool_lock = Lock()
+
+
+def get_scan_pool():
+    global _scan_pool
+    with _scan_pool_lock:
+        if _scan_pool is None:
+            workers = getattr(settings, "LOG_SCAN_WORKERS", None) or min(4, os.cpu_count() or 1)
+            _scan_pool = ProcessPoolExecutor(max_workers=workers)
+        return _scan_pool
+
+
+def reset_scan_pool():
+    global _scan_pool
+    with _scan_pool_lock:
+        if _scan_pool is not None:
+            _scan_pool.shutdown(wait=False, cancel_futures=True)
+        _scan_pool = None
+
+
+def _collect_window(day_results, start, end, log_dir):
+    items = []
+    offset = 0
+    for result in day_results:
+        total = result["total"]
+        first, last = max(start - offset, 0), min(end - offset, total)
+        offset += total
+        if first >= last:
+            continue
+        head, tail = result["head"], result["tail"]
+        if last <= len(head):
+            numbers = head[first:last]
+        else:
+            tail_start = total - len(tail)
+            numbers = tail[first - tail_start:last - tail_start]
+        with LogFileReader(result["date"], log_dir) as reader:
+            items.extend(reader.read_records(numbers))
+    return items
+
+
+def _run_day_scans(args):
+    """Yields scan_log_day results in day order, falling back to in-process scans."""
+    futures = [None] * len(args)
+    if len(args) > 1:
+        try:
+            pool = get_scan_pool()
+            futures = [pool.submit(scan_log_day, *a) for a in args]
+        except (BrokenProcessPool, RuntimeError):
+            reset_scan_pool()
+    try:
+        for a, future in zip(args, futures):
+            if future is None:
+                yield scan_log_day(*a)
+                continue
+            try:
+                yield future.result()
+            except BrokenProcessPool:
+                reset_scan_pool()
+                yield scan_log_day(*a)
+    finally:
+        # The consumer may stop early (client disconnected); drop queued days.
+        for future in futures:
+            if future is not None:
+                future.cancel()
+
+
+def iter_log_range(dates, page, page_size, filters=None, log_dir=None, collect_stats=True):
+    """
+    Range query over several day files, each scanned in a pool worker.
+
+    Yields a "page" event as soon as every day up to the one that completes
+    the requested page has finished (later days may still be running), then
+    a "summary" event with merged totals and stats once all days are done.
+    """
+    log_dir = str(log_dir or get_log_dir())
+    requested_start = (max(page, 1) - 1) * page_size
+    requested_end = requested_start + page_size
+    args = [(d, log_dir, filters, requested_end, page_size, collect_stats) for d in dates]
+
+    day_results = []
+    merged = LogScan()
+    per_day = {}
+    matched = 0
+    page_sent = False
+    for result in _run_day_scans(args):
+        day_results.append(result)
+        matched += result["total"]
+        merged.merge(result["scan"])
+        per_day[result["date"]] = result["total"]
+        if not page_sent and matched >= requested_end:
+            page_sent = True
+            yield {
+                "event": "page",
+                "page": page,
+                "items": _collect_window(day_results, requested_start, requested_end, log_dir),
+            }
+
+    page, start, end, total_pages = page_bounds(matched, page, page_size)
+    if not page_sent:
+        yield {"event": "page", "page": page, "items": _collect_window(day_results, start, end, log_dir)}
+    yield {
+        "event": "summary",
+        "page": page,
+        "total": matched,
+        "total_pages": total_pages,
+        "success_count": merged.success_count,
+        "error_count": merged.error_count,
+        "per_hour": merged.per_hour,
+        "per_day": per_day,
+    }
+
+
+EXPORT_CSV_FIELDS = [
+    "timestamp", "ip", "origin", "host", "path", "method", "status_code",
+    "user_agent", "referer", "user_id", "username", "blocked", "block_reason",
+    "rate_limited", "duration_ms",
+]
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+def iter_log_lines(dates, filters=None, log_dir=None):
+    """
+    Yields raw JSON lines (bytes, no newline) for the given days in order.
+    Unfiltered records are passed through without being decoded.
+    """
+    for date_str in dates:
+        with LogFileReader(date_str, log_dir) as reader:
+            for _, raw in reader.iter_raw():
+                raw = raw.rstrip(b"\r")
+                if filters:
+                    if not raw_line_may_match(raw, filters):
+                        continue
+                    try:
+                        if not log_entry_matches(json.loads(raw), filters):
+                            continue
+                    except Exception:
+                        continue
+                yield raw
+
+
+def _batched(chunks, size=EXPORT_CHUNK_SIZE):
+    buffer = []
+    buffered = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size:
+            yield b"".join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def export_ndjson(lines):
+    for raw in lines:
+        yield raw + b"\n"
+
+
+def export_csv(lines):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=EXPORT_CSV_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for raw in lines:
+        try:
+            writer.writerow(json.loads(raw))
+        except Exception:
+            continue
+        if out.tell() >= EXPORT_CHUNK_SIZE:
+            yield out.getvalue().encode("utf-8")
+            out.seek(0)
+            out.truncate()
+    yield out.getvalue().encode("utf-8")
+
+
+def gzip_stream(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_log_stream(dates, filters=None, fmt="ndjson", compress=False, log_dir=None):
+    """Constant-memory byte stream of the selected records as NDJSON or CSV."""
+    lines = iter_log_lines(dates, filters, log_dir)
+    chunks = export_csv(lines) if fmt == "csv" else _batched(export_ndjson(lines))
+    if compress:
+        chunks = gzip_stream(chunks)
+    return chunks
@@ -0,0 +1,81 @@
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+
+from api.images import srcset_cache_key
+from api.models import ImageDerivative
+from api.storage import CAS_PREFIX, add_reference, cas_name, hash_file
+
+
+class Command(BaseCommand):
+    help = 'Moves files referenced by FileFields/ImageFields into content-addressed storage, merging duplicates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+        parser.add_argument('--workers', type=int, default=4, help='Parallel hashing threads')
+
+    def collect_references(self):
+        """{file name: [(model, field name, pk), ...]} for every non-CAS file reference."""
+        references = defaultdict(list)
+        for model in apps.get_app_config('api').get_models():
+            for field in model._meta.fields:
+                if not isinstance(field, models.FileField):
+                    continue
+                rows = model.objects.exclude(**{field.attname: ''}).exclude(**{f'{field.attname}__isnull': True})
+                for pk, name in rows.values_list('pk', field.attname):
+                    if not name.startswith(CAS_PREFIX):
+                        references[name].append((model, field.attname, pk))
+        return references
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        references = self.collect_references()
+        present = [name for name in references if os.path.isfile(os.path.join(settings.MEDIA_ROOT, name))]
+        for name in sorted(set(references) - set(present)):
+            self.stdout.write(self.style.WARNING(f'Missing file, left as is: {name}'))
+
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            hashes = dict(zip(present, pool.map(lambda n: hash_file(os.path.join(settings.MEDIA_ROOT, n)), present)))
+
+        moved = merged = reclaimed = 0
+        for name in sorted(present):
+            digest, size = hashes[name]
+            target = cas_name(digest, name)
+            source_path = os.path.join(settings.MEDIA_ROOT, name)
+            target_path = os.path.join(settings.MEDIA_ROOT, target)
+            duplicate = os.path.exists(target_path)
+            self.stdout.write(f'{name} -> {target}{" (duplicate)" if duplicate else ""}')
+            if duplicate:
+                merged += 1
+                reclaimed += size
+            else:
+                moved += 1
+            if dry_run:
+                continue
+            if duplicate:
+                os.remove(source_path)
+            else:
+                os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                os.replace(source_path, target_path)
+            with transaction.atomic():
+                for model, attname, pk in references[name]:
+                    model.objects.filter(pk=pk).update(**{attname: target})
+                derivatives = ImageDerivative.objects.filter(source=name)
+                if ImageDerivative.objects.filter(source=target).exists():
+                    derivatives.delete()
+                else:
+                    derivatives.update(source=target)
+                add_reference(target, digest, size, count=len(references[name]))
+            cache.delete_many([srcset_cache_key(name), srcset_cache_key(target)])
+
+        verb = 'Would move' if dry_run else 'Moved'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {moved} files, merged {merged} duplicates ({reclaimed / 1024 / 1024:.1f} MiB reclaimed). '
+            'Files not referenced by a model (e.g. embedded in rich text) were left in place.'
+        ))
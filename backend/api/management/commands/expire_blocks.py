@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.abuse import expire_block_entries
+
+
+class Command(BaseCommand):
+    help = 'Deactivates BlockEntry rows whose expires_at has passed (the expire_block_entries job also does this every ABUSE_SWEEP_SECONDS)'
+
+    def handle(self, *args, **kwargs):
+        expired = expire_block_entries()
+        self.stdout.write(self.style.SUCCESS(f'Expired {expired} block entries'))
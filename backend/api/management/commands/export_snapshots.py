@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.snapshots import build_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Renders the public API to static JSON (plus .gz copies and manifest.json) for CDN hosting'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None, help='Target directory (default SNAPSHOT_DIR)')
+        parser.add_argument('--only', nargs='+', default=None, metavar='TAG',
+                            help='Only re-render files depending on these tags, e.g. api.project:12 api.skill')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+
+    def handle(self, *args, **options):
+        root = options['output'] or getattr(settings, 'SNAPSHOT_DIR', '')
+        if not root:
+            raise CommandError('Pass --output or set SNAPSHOT_DIR')
+        changes = set(options['only']) if options['only'] else None
+        report = build_snapshot(root, changes=changes, dry_run=options['dry_run'])
+        for key in report['written']:
+            self.stdout.write(f'  {"would write" if options["dry_run"] else "wrote"} {key}')
+        for key in report['removed']:
+            self.stdout.write(f'  {"would remove" if options["dry_run"] else "removed"} {key}')
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(report['written'])} written, {report['unchanged']} unchanged, {len(report['removed'])} removed in {root}"
+        ))
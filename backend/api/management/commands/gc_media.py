@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.media_gc import collect_garbage
+
+
+class Command(BaseCommand):
+    help = 'Finds media files no model, URL field or rich-text content references, and quarantines or deletes them'
+
+    def add_arguments(self, parser):
+        mode = parser.add_mutually_exclusive_group()
+        mode.add_argument('--dry-run', action='store_true', help='Only report what would be collected')
+        mode.add_argument('--delete', action='store_true', help='Delete instead of moving to media/.quarantine/')
+        parser.add_argument('--min-age-hours', type=float, default=None,
+                            help='Skip files modified more recently (default MEDIA_GC_MIN_AGE_HOURS)')
+        parser.add_argument('--workers', type=int, default=4, help='Parallel directory scanners')
+        parser.add_argument('--verbose-files', action='store_true', help='List every collected file')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            mode = 'dry-run'
+        elif options['delete']:
+            mode = 'delete'
+        else:
+            mode = getattr(settings, 'MEDIA_GC_MODE', 'quarantine')
+        report = collect_garbage(mode=mode, min_age_hours=options['min_age_hours'], workers=options['workers'])
+        if options['verbose_files'] or mode == 'dry-run':
+            for path in report['files']:
+                self.stdout.write(f'  {path}')
+        mib = report['bytes'] / 1024 / 1024
+        if mode == 'dry-run':
+            self.stdout.write(self.style.SUCCESS(f"Would reclaim {mib:.1f} MiB from {len(report['files'])} unreferenced files"))
+        elif mode == 'quarantine':
+            self.stdout.write(self.style.SUCCESS(
+                f"Quarantined {len(report['files'])} files ({mib:.1f} MiB) in {report['quarantine'] or '-'}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Deleted {len(report['files'])} files, reclaimed {mib:.1f} MiB"))
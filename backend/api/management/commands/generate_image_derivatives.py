@@ -0,0 +1,64 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.images import IMAGE_FIELDS, derivative_formats, derivative_widths, is_image_name, record_rendered
+from api.imaging import render_image
+from api.models import ImageDerivative, MediaAsset, RemoteImage
+
+
+class Command(BaseCommand):
+    help = 'Generates responsive WebP/JPEG (and AVIF) derivatives and placeholder data (size, colour, blurhash) for existing images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate images that already have derivatives and placeholders')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+
+    def collect_sources(self):
+        sources = set()
+        for label, fields in IMAGE_FIELDS.items():
+            model = apps.get_model(label)
+            for field_name in fields:
+                names = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+                sources.update(names.values_list(field_name, flat=True))
+        sources.update(RemoteImage.objects.filter(status='ready').exclude(file='').values_list('file', flat=True))
+        uploads = os.path.join(settings.MEDIA_ROOT, 'uploads')
+        for root, dirs, files in os.walk(uploads):
+            for file in files:
+                sources.add(os.path.relpath(os.path.join(root, file), settings.MEDIA_ROOT).replace('\\', '/'))
+        return sorted(name for name in sources if is_image_name(name))
+
+    def handle(self, *args, **options):
+        sources = self.collect_sources()
+        if not options['force']:
+            done = set(ImageDerivative.objects.values_list('source', flat=True).distinct())
+            done &= set(MediaAsset.objects.exclude(blurhash='').values_list('path', flat=True))
+            sources = [name for name in sources if name not in done]
+        missing = [name for name in sources if not os.path.exists(os.path.join(settings.MEDIA_ROOT, name))]
+        sources = [name for name in sources if name not in missing]
+        for name in missing:
+            self.stdout.write(self.style.WARNING(f'Missing file, skipped: {name}'))
+        if not sources:
+            self.stdout.write(self.style.SUCCESS('All images already have derivatives and placeholders'))
+            return
+
+        media_root = str(settings.MEDIA_ROOT)
+        widths, formats = derivative_widths(), derivative_formats()
+        processed = failed = 0
+        with ProcessPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            futures = {pool.submit(render_image, name, media_root, widths, formats): name for name in sources}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    rendered = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(f'{name}: {e}'))
+                    continue
+                record_rendered(name, rendered)
+                processed += 1
+                self.stdout.write(f"{name}: {len(rendered['derivatives'])} derivatives, {rendered['placeholder']['blurhash']}")
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} images ({failed} failed)'))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.ai_mock import mock_base_urls, start_mock_provider
+
+
+class Command(BaseCommand):
+    help = 'Runs a local stand-in for the Gemini and Groq APIs (point AI_GEMINI_BASE_URL / AI_GROQ_BASE_URL at it)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--delay', type=float, default=2.0, help='Seconds each answer takes, to mimic model latency')
+
+    def handle(self, *args, **options):
+        server = start_mock_provider(options['host'], options['port'], options['delay'])
+        gemini_url, groq_url = mock_base_urls(server)
+        self.stdout.write(self.style.SUCCESS(f'Mock AI provider listening (delay {options["delay"]}s)'))
+        self.stdout.write(f'  AI_GEMINI_BASE_URL={gemini_url}')
+        self.stdout.write(f'  AI_GROQ_BASE_URL={groq_url}')
+        self.stdout.write('  Keys starting with "ratelimited" get 429 + Retry-After, "invalid" get 401.')
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
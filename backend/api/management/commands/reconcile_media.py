@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from api.media_library import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Syncs the MediaAsset index with MEDIA_ROOT (files copied in by hand, deleted files, owner references)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+
+    def handle(self, *args, **options):
+        stats = reconcile(dry_run=options['dry_run'])
+        verb = 'Would index' if options['dry_run'] else 'Indexed'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {stats['added']} new files, refreshed {stats['updated']}, "
+            f"removed {stats['removed']} missing, fixed owners on {stats['owners']}"
+        ))
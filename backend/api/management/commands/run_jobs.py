@@ -0,0 +1,33 @@
+import math
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.jobs import register_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs the periodic maintenance jobs in the foreground. With --once every job '
+        '(or each --only job) runs a single time, for cron when SCHEDULER_ENABLED is off.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run the jobs once and exit')
+        parser.add_argument('--only', action='append', default=[], metavar='JOB', help='Run only this job (repeatable)')
+
+    def handle(self, *args, **options):
+        scheduler = register_jobs()
+        unknown = set(options['only']) - set(scheduler.jobs)
+        if unknown:
+            raise CommandError(f"Unknown job(s): {', '.join(sorted(unknown))}. Jobs: {', '.join(sorted(scheduler.jobs))}")
+        if options['only']:
+            scheduler.jobs = {name: job for name, job in scheduler.jobs.items() if name in options['only']}
+        if options['once']:
+            scheduler.run_pending(now=math.inf)
+            self.stdout.write(self.style.SUCCESS(f"Ran {', '.join(sorted(scheduler.jobs))}"))
+            return
+        self.stdout.write(f"Running {', '.join(sorted(scheduler.jobs))} (Ctrl+C to stop)")
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            scheduler.stop()
@@ -0,0 +1,150 @@
+import logging
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models
+from django.utils import timezone
+
+from .images import srcset_cache_key
+from .media_library import collect_owners
+from .models import ImageDerivative, MediaAsset, StoredBlob
+
+logger = logging.getLogger(__name__)
+
+QUARANTINE_DIR = ".quarantine"
+# Never collected: in-flight CAS spools and earlier quarantine runs.
+GC_SKIP_DIRS = (".cas_tmp", QUARANTINE_DIR)
+TEXT_FIELDS = (models.CharField, models.TextField)
+
+
+def media_url_pattern():
+    # Matches "/media/<path>" inside absolute URLs, src="..." attributes and
+    # CSS url(...) alike; the path stops at quotes, whitespace, ? and #.
+    return re.compile(re.escape(settings.MEDIA_URL) + r"""([^"'\s()<>?#]+)""")
+
+
+def collect_references():
+    """
+    Every storage name still in use: FileField/ImageField values, /media/
+    URLs stored in any text field (URL fields, Project/BlogPost HTML
+    content, settings), and the derivatives of referenced images.
+    """
+    referenced = set(collect_owners())
+    pattern = media_url_pattern()
+    for model in apps.get_app_config("api").get_models():
+        text_fields = [f.attname for f in model._meta.fields if isinstance(f, TEXT_FIELDS) and not f.choices]
+        for attname in text_fields:
+            rows = model.objects.filter(**{f"{attname}__contains": settings.MEDIA_URL})
+            for value in rows.values_list(attname, flat=True):
+                referenced.update(unquote(path) for path in pattern.findall(value or ""))
+    for source, file in ImageDerivative.objects.values_list("source", "file"):
+        if source in referenced:
+            referenced.add(file)
+    return referenced
+
+
+def scan_dir(media_root, top):
+    found = []
+    stack = [os.path.join(media_root, top)]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                stat = entry.stat(follow_symlinks=False)
+                path = os.path.relpath(entry.path, media_root).replace("\\", "/")
+                found.append((path, stat.st_size, stat.st_mtime))
+    return found
+
+
+def scan_media(media_root, workers=4):
+    """(path, size, mtime) for every file, one top-level directory per worker."""
+    if not os.path.isdir(media_root):
+        return []
+    files = []
+    tops = []
+    for entry in os.scandir(media_root):
+        if entry.name in GC_SKIP_DIRS:
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            tops.append(entry.name)
+        elif entry.is_file(follow_symlinks=False):
+            stat = entry.stat(follow_symlinks=False)
+            files.append((entry.name, stat.st_size, stat.st_mtime))
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for found in pool.map(lambda top: scan_dir(media_root, top), tops):
+            files.extend(found)
+    return files
+
+
+def forget_files(paths):
+    """Drops the bookkeeping rows for removed files."""
+    paths = list(paths)
+    for i in range(0, len(paths), 500):
+        batch = paths[i:i + 500]
+        MediaAsset.objects.filter(path__in=batch).delete()
+        StoredBlob.objects.filter(name__in=batch).delete()
+        ImageDerivative.objects.filter(models.Q(source__in=batch) | models.Q(file__in=batch)).delete()
+        cache.delete_many([srcset_cache_key(path) for path in batch])
+
+
+def collect_garbage(mode="dry-run", min_age_hours=None, workers=4):
+    """
+    Finds files under MEDIA_ROOT that nothing references and, unless mode is
+    "dry-run", moves them to .quarantine/<timestamp>/ ("quarantine") or
+    removes them ("delete"). Files younger than min_age_hours are skipped so
+    an upload that is not attached yet is never collected.
+    """
+    if mode not in ("dry-run", "quarantine", "delete"):
+        raise ValueError(f"Unknown media GC mode: {mode}")
+    if min_age_hours is None:
+        min_age_hours = getattr(settings, "MEDIA_GC_MIN_AGE_HOURS", 24)
+    media_root = str(settings.MEDIA_ROOT)
+    referenced = collect_references()
+    cutoff = time.time() - min_age_hours * 3600
+    garbage = [
+        (path, size) for path, size, mtime in scan_media(media_root, workers)
+        if path not in referenced and mtime < cutoff
+    ]
+    report = {
+        "mode": mode,
+        "files": [path for path, _ in sorted(garbage)],
+        "bytes": sum(size for _, size in garbage),
+        "quarantine": None,
+    }
+    if mode == "dry-run" or not garbage:
+        return report
+
+    if mode == "quarantine":
+        report["quarantine"] = os.path.join(media_root, QUARANTINE_DIR, timezone.now().strftime("%Y%m%d-%H%M%S"))
+    removed = []
+    for path, _ in garbage:
+        full_path = os.path.join(media_root, path)
+        try:
+            if mode == "quarantine":
+                target = os.path.join(report["quarantine"], path)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(full_path, target)
+            else:
+                os.remove(full_path)
+            removed.append(path)
+        except OSError as e:
+            logger.error(f"Media GC could not {mode} {path}: {e}")
+    forget_files(removed)
+    logger.info(f"Media GC ({mode}): {len(removed)} files, {report['bytes']} bytes")
+    return report
+
+
+def scheduled_media_gc():
+    collect_garbage(mode=getattr(settings, "MEDIA_GC_MODE", "quarantine"))
@@ -0,0 +1,189 @@
+import logging
+import mimetypes
+import os
+from datetime import datetime, timezone as dt_timezone
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models, transaction
+from PIL import Image
+
+from .imaging import DERIVATIVE_PREFIX
+from .models import MediaAsset
+
+logger = logging.getLogger(__name__)
+
+# Directories under MEDIA_ROOT that never show up in the library.
+SKIP_PREFIXES = (DERIVATIVE_PREFIX, ".cas_tmp/", ".quarantine/")
+DOCUMENT_TYPES = (
+    "application/pdf",
+    "application/msword",
+    "application/vnd.openxmlformats-officedocument",
+    "application/vnd.ms-",
+    "text/",
+)
+
+
+def media_kind(mime_type):
+    if not mime_type:
+        return "file"
+    major = mime_type.split("/", 1)[0]
+    if major in ("image", "video", "audio"):
+        return major
+    if mime_type.startswith(DOCUMENT_TYPES):
+        return "document"
+    return "file"
+
+
+def probe(path):
+    """Size, mtime, MIME type and (for images) dimensions of a stored file."""
+    full_path = os.path.join(settings.MEDIA_ROOT, path)
+    stats = os.stat(full_path)
+    mime_type = mimetypes.guess_type(path)[0] or ""
+    info = {
+        "size": stats.st_size,
+        "modified_at": datetime.fromtimestamp(stats.st_mtime, tz=dt_timezone.utc),
+        "mime_type": mime_type,
+        "kind": media_kind(mime_type),
+        "width": None,
+        "height": None,
+    }
+    if info["kind"] == "image" and not path.lower().endswith(".svg"):
+        try:
+            with Image.open(full_path) as img:
+                info["width"], info["height"] = img.size
+        except Exception:
+            pass
+    return info
+
+
+def record_asset(path, original_name=None):
+    """
+    Creates or refreshes the MediaAsset for a stored file. original_name is
+    the name the upload asked for (e.g. "uploads/hero.jpg"); its basename and
+    folder are what the picker shows, since cas/ names are just hashes. A
+    file saved again under another name keeps its first name and folder.
+    """
+    original_name = original_name or path
+    try:
+        info = probe(path)
+    except OSError as e:
+        logger.error(f"Could not index media file {path}: {e}")
+        return None
+    asset, created = MediaAsset.objects.get_or_create(
+        path=path,
+        defaults={"name": os.path.basename(original_name), "folder": os.path.dirname(original_name), **info},
+    )
+    if not created:
+        MediaAsset.objects.filter(pk=asset.pk).update(**info)
+    return asset
+
+
+def record_assets(items, owners=None):
+    """
+    Bulk record_asset for [(path, original name), ...]: one query for the
+    existing rows and one bulk_create. owners maps path -> [owner label].
+    """
+    owners = owners or {}
+    first_names = {}
+    for path, original_name in items:
+        first_names.setdefault(path, original_name or path)
+    existing = set(MediaAsset.objects.filter(path__in=first_names).values_list("path", flat=True))
+    new_assets = []
+    for path, original_name in first_names.items():
+        if path in existing:
+            update_owners(path, add=owners.get(path, ()))
+            continue
+        try:
+            info = probe(path)
+        except OSError as e:
+            logger.error(f"Could not index media file {path}: {e}")
+            continue
+        new_assets.append(MediaAsset(
+            path=path, name=os.path.basename(original_name), folder=os.path.dirname(original_name),
+            owners=list(owners.get(path, ())), **info,
+        ))
+    MediaAsset.objects.bulk_create(new_assets, ignore_conflicts=True)
+
+
+def owner_label(instance, field_name):
+    return f"{instance._meta.label_lower}:{instance.pk}:{field_name}"
+
+
+def file_fields(model):
+    return [field for field in model._meta.fields if isinstance(field, models.FileField)]
+
+
+def update_owners(path, add=(), remove=()):
+    with transaction.atomic():
+        asset = MediaAsset.objects.select_for_update().filter(path=path).first()
+        if asset is None:
+            return
+        owners = [owner for owner in asset.owners if owner not in remove]
+        owners += [owner for owner in add if owner not in owners]
+        if owners != asset.owners:
+            MediaAsset.objects.filter(pk=asset.pk).update(owners=owners)
+
+
+def collect_owners():
+    """{storage name: [owner label, ...]} from every FileField in the api app."""
+    owners = {}
+    for model in apps.get_app_config("api").get_models():
+        for field in file_fields(model):
+            rows = model.objects.exclude(**{field.attname: ""}).exclude(**{f"{field.attname}__isnull": True})
+            for pk, name in rows.values_list("pk", field.attname):
+                owners.setdefault(name, []).append(f"{model._meta.label_lower}:{pk}:{field.name}")
+    return owners
+
+
+def walk_media(media_root):
+    for root, dirs, files in os.walk(media_root):
+        for file in files:
+            path = os.path.relpath(os.path.join(root, file), media_root).replace("\\", "/")
+            if not path.startswith(SKIP_PREFIXES):
+                yield path
+
+
+def reconcile(dry_run=False):
+    """
+    Brings MediaAsset in line with MEDIA_ROOT: indexes files added out of
+    band, refreshes rows whose size or mtime changed, drops rows for files
+    that are gone and recomputes owner references. Returns counts.
+    """
+    media_root = str(settings.MEDIA_ROOT)
+    existing = {
+        path: (size, modified_at)
+        for path, size, modified_at in MediaAsset.objects.values_list("path", "size", "modified_at")
+    }
+    on_disk = set(walk_media(media_root)) if os.path.isdir(media_root) else set()
+    stats = {"added": 0, "updated": 0, "removed": 0, "owners": 0}
+
+    for path in sorted(on_disk):
+        if path not in existing:
+            stats["added"] += 1
+            if not dry_run:
+                record_asset(path)
+            continue
+        try:
+            st = os.stat(os.path.join(media_root, path))
+        except OSError:
+            continue
+        size, modified_at = existing[path]
+        if st.st_size != size or int(st.st_mtime) != int(modified_at.timestamp()):
+            stats["updated"] += 1
+            if not dry_run:
+                record_asset(path)
+
+    gone = set(existing) - on_disk
+    stats["removed"] = len(gone)
+    if gone and not dry_run:
+        MediaAsset.objects.filter(path__in=gone).delete()
+
+    owners = collect_owners()
+    for path, current in MediaAsset.objects.values_list("path", "owners"):
+        wanted = sorted(owners.get(path, []))
+        if sorted(current) != wanted:
+            stats["owners"] += 1
+            if not dry_run:
+                MediaAsset.objects.filter(path=path).update(owners=wanted)
+    return stats
@@ -0,0 +1,165 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+from .storage import CAS_PREFIX
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+CAS_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class RangeFile:
+    """
+    Read-only view of [start, start+length) of an open file. It has no
+    fileno(), so servers stream it with read() instead of sendfile-ing the
+    whole file.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b""
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def media_etag(path, stat):
+    """
+    Strong ETag. cas/ names are the SHA-256 of their content, so that is the
+    tag; other files use size and nanosecond mtime, which change on rewrite.
+    """
+    digest = os.path.splitext(os.path.basename(path))[0]
+    if path.startswith(CAS_PREFIX) and CAS_DIGEST_RE.match(digest):
+        return f'"{digest}"'
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single "bytes=" range, None to serve the
+    whole file (no header, malformed or multiple ranges), or "unsatisfiable".
+    """
+    match = RANGE_RE.match((header or "").strip())
+    if not match or size == 0:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        suffix = int(last)
+        if suffix == 0:
+            return "unsatisfiable"
+        return max(size - suffix, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        return "unsatisfiable"
+    if end < start:
+        return None
+    return start, end
+
+
+def if_range_matches(request, etag, mtime):
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    if_range_date = parse_http_date_safe(if_range)
+    return if_range_date is not None and int(mtime) <= if_range_date
+
+
+def offload_header(path, full_path):
+    backend = getattr(settings, "MEDIA_SENDFILE_BACKEND", None)
+    if backend == "x-sendfile":
+        return "X-Sendfile", full_path
+    if backend == "x-accel-redirect":
+        prefix = getattr(settings, "MEDIA_ACCEL_REDIRECT_PREFIX", "/protected-media/")
+        return "X-Accel-Redirect", prefix.rstrip("/") + "/" + path
+    return None
+
+
+def serve_media(request, path, cache_control=None):
+    """
+    Serves a file under MEDIA_ROOT with strong ETags, Last-Modified,
+    conditional GETs and single byte ranges; nothing under a dot-prefixed
+    directory is served. With MEDIA_SENDFILE_BACKEND set the body is left
+    to the front server (which handles ranges itself); otherwise
+    FileResponse streams it, zero-copy via wsgi.file_wrapper for full
+    responses.
+    """
+    path = path.replace("\\", "/").lstrip("/")
+    # Dot-prefixed directories are internal (.cas_tmp/, .quarantine/).
+    if any(part.startswith(".") for part in path.split("/")[:-1]):
+        raise Http404("File not found")
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except Exception:
+        raise Http404("Invalid path")
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404("File not found")
+    if not os.path.isfile(full_path):
+        raise Http404("File not found")
+
+    etag = media_etag(path, stat)
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or "application/octet-stream"
+
+    def finish(response):
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(stat.st_mtime)
+        response["Accept-Ranges"] = "bytes"
+        if cache_control:
+            response["Cache-Control"] = cache_control
+        return response
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        return finish(not_modified)
+
+    offload = offload_header(path, full_path)
+    if offload is not None:
+        response = HttpResponse(content_type=content_type)
+        response[offload[0]] = offload[1]
+        if encoding:
+            response["Content-Encoding"] = encoding
+        return finish(response)
+
+    byte_range = None
+    if "HTTP_RANGE" in request.META and if_range_matches(request, etag, stat.st_mtime):
+        byte_range = parse_range(request.META["HTTP_RANGE"], stat.st_size)
+    if byte_range == "unsatisfiable":
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{stat.st_size}"
+        return finish(response)
+
+    f = open(full_path, "rb")
+    if byte_range is None:
+        response = FileResponse(f, content_type=content_type)
+        response["Content-Length"] = str(stat.st_size)
+    else:
+        start, end = byte_range
+        response = FileResponse(RangeFile(f, start, end - start + 1), status=206, content_type=content_type)
+        response["Content-Length"] = str(end - start + 1)
+        response["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+    if encoding:
+        response["Content-Encoding"] = encoding
+    return finish(response)
@@ -0,0 +1,317 @@
+import json
+import logging
+import math
+import os
+import tempfile
+import time
+from pathlib import Path
+from threading import Lock
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "portfolio_"
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Counters and histograms of exited processes, folded together.
+ARCHIVE_NAME = "metrics-archive.json"
+
+# name -> (type, help). Everything recorded must be declared here.
+METRICS = {
+    "http_requests": ("counter", "API requests by route template, method and status class."),
+    "http_request_duration_seconds": ("histogram", "API request latency by route template and method."),
+    "db_queries": ("counter", "Database queries executed while serving API requests."),
+    "access_control_rejections": ("counter", "Requests rejected by AccessControlMiddleware (blocklist or rate limit)."),
+    "abuse_auto_blocks": ("counter", "IPs promoted into a time-limited BlockEntry by the abuse detector."),
+    "log_queue_depth": ("gauge", "Log records waiting for the background writer."),
+    "log_queue_dropped": ("counter", "Log records dropped because the writer queue was full."),
+    "log_records_written": ("counter", "Log records appended to the daily log files."),
+    "ai_calls": ("counter", "AI provider calls by provider, key and outcome."),
+    "ai_call_duration_seconds": ("histogram", "AI provider call latency by provider and key."),
+    "ai_key_breaker_opens": ("counter", "Times an AI key's circuit breaker opened, by provider and key."),
+    "ai_time_to_first_token_seconds": ("histogram", "Time until a streamed AI answer produced its first chunk, by provider."),
+    "translate_calls": ("counter", "translate_text calls by outcome."),
+    "translate_duration_seconds": ("histogram", "translate_text latency."),
+    "cache_requests": ("counter", "Cache lookups by cache and result (hit or miss)."),
+    "cache_hit_ratio": ("gauge", "Hits over lookups per cache since the counters were created."),
+    "image_proxy_fetches": ("counter", "Remote image fetches by outcome (stored or failed)."),
+    "image_proxy_fetch_duration_seconds": ("histogram", "Time to download and store a remote image."),
+}
+
+
+def get_metrics_dir():
+    return Path(getattr(settings, "METRICS_DIR", None) or Path(tempfile.gettempdir()) / "portfolio-metrics")
+
+
+def label_key(labels):
+    return tuple(sorted((str(k), str(v)) for k, v in (labels or {}).items()))
+
+
+def pid_is_alive(pid):
+    if pid == os.getpid() or os.name == "nt":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MetricsRegistry:
+    """
+    Per-process counters, gauges and fixed-bucket histograms. Each process
+    periodically dumps its values to metrics_<pid>_<start>.json in
+    METRICS_DIR, the start token keeping a reused PID from taking over an
+    earlier process's file; the exposition endpoint merges every file, so
+    whichever worker serves the scrape reports totals for all of them.
+    Counters and histograms of exited workers are moved into the archive
+    file and keep counting towards the totals; their gauges are dropped.
+    """
+
+    def __init__(self, write_interval=None):
+        self.write_interval = write_interval if write_interval is not None else getattr(settings, "METRICS_WRITE_SECONDS", 5)
+        self.lock = Lock()
+        self.write_lock = Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.gauge_callbacks = {}
+        self.last_write = 0
+        self.pid = None
+        self.started = 0
+
+    def inc(self, name, labels=None, value=1):
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        self._maybe_write()
+
+    def observe(self, name, seconds, labels=None):
+        key = (name, label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * len(DEFAULT_BUCKETS) + [0.0, 0]
+            for i, bound in enumerate(DEFAULT_BUCKETS):
+                if seconds <= bound:
+                    histogram[i] += 1
+                    break
+            histogram[-2] += seconds
+            histogram[-1] += 1
+        self._maybe_write()
+
+    def register_gauge(self, name, callback, labels=None):
+        """callback() is evaluated whenever this process writes its snapshot."""
+        self.gauge_callbacks[(name, label_key(labels))] = callback
+
+    def snapshot(self):
+        with self.lock:
+            counters = [[name, list(labels), value] for (name, labels), value in self.counters.items()]
+            histograms = [[name, list(labels), list(values)] for (name, labels), values in self.histograms.items()]
+        gauges = []
+        for (name, labels), callback in list(self.gauge_callbacks.items()):
+            try:
+                gauges.append([name, list(labels), float(callback())])
+            except Exception:
+                continue
+        return {"pid": self.pid, "started": self.started, "counters": counters, "histograms": histograms, "gauges": gauges}
+
+    def _maybe_write(self):
+        if time.monotonic() - self.last_write >= self.write_interval:
+            self.write()
+
+    def write(self):
+        if not self.write_lock.acquire(blocking=False):
+            return
+        try:
+            self.last_write = time.monotonic()
+            directory = get_metrics_dir()
+            directory.mkdir(parents=True, exist_ok=True)
+            if self.pid != os.getpid():
+                # First write in this process (or since a fork).
+                self.pid, self.started = os.getpid(), time.time_ns()
+            path = directory / f"metrics_{self.pid}_{self.started}.json"
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.snapshot()), encoding="utf-8")
+            os.replace(tmp, path)
+        except Exception as e:
+            logger.error(f"Metrics snapshot write failed: {e}")
+        finally:
+            self.write_lock.release()
+
+
+registry = MetricsRegistry()
+
+
+def inc(name, labels=None, value=1):
+    registry.inc(name, labels, value)
+
+
+def observe(name, seconds, labels=None):
+    registry.observe(name, seconds, labels)
+
+
+def merge_snapshot(counters, histograms, data):
+    for name, labels, value in data.get("counters", []):
+        key = (name, tuple(map(tuple, labels)))
+        counters[key] = counters.get(key, 0) + value
+    for name, labels, values in data.get("histograms", []):
+        key = (name, tuple(map(tuple, labels)))
+        merged = histograms.get(key)
+        histograms[key] = values if merged is None else [a + b for a, b in zip(merged, values)]
+
+
+def archive_snapshots(directory, paths):
+    """
+    Folds the given snapshots into the archive file and removes them, under
+    an exclusive lock so concurrent scrapes archive each file once. Returns
+    the archived (counters, histograms).
+    """
+    counters, histograms = {}, {}
+    archive_path = directory / ARCHIVE_NAME
+    with open(archive_path, "a+", encoding="utf-8") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            f.seek(0)
+            try:
+                merge_snapshot(counters, histograms, json.loads(f.read() or "{}"))
+            except ValueError as e:
+                logger.error(f"Metrics archive unreadable, starting a new one: {e}")
+            archived = []
+            for path in paths:
+                try:
+                    merge_snapshot(counters, histograms, json.loads(path.read_text(encoding="utf-8")))
+                except OSError:
+                    continue  # Archived by another scrape meanwhile.
+                except ValueError:
+                    pass  # Torn file; nothing to keep.
+                archived.append(path)
+            if archived:
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps({
+                    "counters": [[name, list(labels), value] for (name, labels), value in counters.items()],
+                    "histograms": [[name, list(labels), values] for (name, labels), values in histograms.items()],
+                }))
+                f.flush()
+                for path in archived:
+                    path.unlink(missing_ok=True)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    return counters, histograms
+
+
+def collect():
+    """Merges the snapshots of every process into {kind: {(name, labels): value}}."""
+    registry.write()
+    directory = get_metrics_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    snapshots = []
+    for path in directory.glob("metrics_*.json"):
+        try:
+            snapshots.append((path, json.loads(path.read_text(encoding="utf-8"))))
+        except (OSError, ValueError):
+            continue
+    latest = {}
+    for _, data in snapshots:
+        pid = data.get("pid", 0)
+        latest[pid] = max(latest.get(pid, 0), data.get("started", 0))
+    live, dead = [], []
+    for path, data in snapshots:
+        pid = data.get("pid", 0)
+        # Only the newest file of a PID can belong to a running process.
+        if pid_is_alive(pid) and data.get("started", 0) == latest[pid]:
+            live.append(data)
+        else:
+            dead.append(path)
+    counters, histograms = archive_snapshots(directory, dead)
+    gauges = {}
+    for data in live:
+        merge_snapshot(counters, histograms, data)
+        for name, labels, value in data.get("gauges", []):
+            key = (name, tuple(map(tuple, labels)))
+            gauges[key] = gauges.get(key, 0) + value
+    cache_totals = {}
+    for (name, labels), value in counters.items():
+        if name == "cache_requests":
+            labels = dict(labels)
+            totals = cache_totals.setdefault(labels.get("cache", ""), [0, 0])
+            totals[0] += value if labels.get("result") == "hit" else 0
+            totals[1] += value
+    for cache_name, (hits, lookups) in cache_totals.items():
+        gauges[("cache_hit_ratio", (("cache", cache_name),))] = hits / lookups if lookups else 0
+    return {"counter": counters, "histogram": histograms, "gauge": gauges}
+
+
+def escape_label(value):
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{escape_label(v)}"' for k, v in pairs) + "}"
+
+
+def format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+
+def render_openmetrics():
+    collected = collect()
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        samples = sorted((labels, value) for (metric, labels), value in collected[kind].items() if metric == name)
+        if not samples:
+            continue
+        full_name = PREFIX + name
+        lines.append(f"# TYPE {full_name} {kind}")
+        lines.append(f"# HELP {full_name} {help_text}")
+        for labels, value in samples:
+            if kind == "counter":
+                lines.append(f"{full_name}_total{format_labels(labels)} {format_value(value)}")
+            elif kind == "gauge":
+                lines.append(f"{full_name}{format_labels(labels)} {format_value(value)}")
+            else:
+                cumulative = 0
+                for bound, count in zip(DEFAULT_BUCKETS, value):
+                    cumulative += count
+                    lines.append(f"{full_name}_bucket{format_labels(labels, [('le', repr(bound))])} {cumulative}")
+                lines.append(f"{full_name}_bucket{format_labels(labels, [('le', '+Inf')])} {value[-1]}")
+                lines.append(f"{full_name}_count{format_labels(labels)} {value[-1]}")
+                lines.append(f"{full_name}_sum{format_labels(labels)} {format_value(float(value[-2]))}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class QueryCounter:
+    """connection.execute_wrapper() hook counting the queries of one request."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def record_request(route, method, status_code, duration, queries=0):
+    status_class = f"{int(status_code or 0) // 100}xx"
+    inc("http_requests", {"route": route, "method": method, "status": status_class})
+    observe("http_request_duration_seconds", duration, {"route": route, "method": method})
+    if queries:
+        inc("db_queries", {"route": route}, queries)
@@ -1,14 +1,22 @@
-import json
 import time
 from datetime import datetime
 from threading import Lock
 from urllib.parse import urlparse
 
-from django.conf import settings
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connection
+from django.db.models import Q
 from django.http import JsonResponse
 from django.utils import timezone
 
+from . import metrics
+from .abuse import expire_block_entries, record_violation
+from .analytics import record_visit
+from .heavy_hitters import record_talker
+from .latency import normalize_route, record_latency
+from .log_store import log_writer
 from .models import BlockEntry
+from .rollups import record_traffic
 
 
 def get_client_ip(request):
@@ -36,10 +44,31 @@ def get_origin_domain(request):
     return host.lower()
 
 
+_blocklist_generation = 0
+
+
+def invalidate_blocklist_cache():
+    """Makes AccessControlMiddleware in this process reload BlockEntry on the next request."""
+    global _blocklist_generation
+    _blocklist_generation += 1
+
+
+def sweep_expired_blocks():
+    if expire_block_entries():
+        invalidate_blocklist_cache()
+
+
 class AccessControlMiddleware:
+    # Async-capable so async views (api.ai_views) keep the request off the
+    # worker threads under ASGI; the checks themselves run in a thread.
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
-        self.blocklist_cache = {"ips": set(), "domains": set(), "loaded_at": None}
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.blocklist_cache = {"ips": {}, "domains": {}, "loaded_at": None}
         self.cache_ttl_seconds = 60
         self.cache_lock = Lock()
         self.rate_limits = {}
@@ -47,6 +76,21 @@ class AccessControlMiddleware:
         self.rate_limit_window_seconds = 60
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        rejection = self.check(request)
+        if rejection is not None:
+            return rejection
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        rejection = await sync_to_async(self.check)(request)
+        if rejection is not None:
+            return rejection
+        return await self.get_response(request)
+
+    def check(self, request):
+        """The rejection response for a blocked or rate-limited API request, else None."""
         path = request.path or ""
         if path.startswith("/api/"):
             ip = get_client_ip(request)
@@ -56,44 +100,65 @@ class AccessControlMiddleware:
                 request.blocked = True
                 request.block_reason = "blocklist"
                 data = {"detail": "Access blocked"}
-                return JsonResponse(data, status=403)
+                return self.reject(request, ip, domain, JsonResponse(data, status=403))
 
             if self.is_rate_limited(ip):
+                if record_violation(ip) is not None:
+                    invalidate_blocklist_cache()
                 request.blocked = True
                 request.block_reason = "rate_limit"
                 request.rate_limited = True
                 data = {"detail": "Too many requests"}
-                return JsonResponse(data, status=429)
+                return self.reject(request, ip, domain, JsonResponse(data, status=429))
+        return None
 
-        response = self.get_response(request)
+    def reject(self, request, ip, domain, response):
+        # Rejected requests never reach ApiLoggingMiddleware, so count them here.
+        try:
+            record_traffic(request, response, ip)
+            record_talker(request, ip, domain)
+            metrics.inc("access_control_rejections", {"reason": request.block_reason})
+        except Exception:
+            pass
         return response
 
+    def blocklist_cache_is_fresh(self, now):
+        loaded_at = self.blocklist_cache["loaded_at"]
+        if self.blocklist_cache.get("generation") != _blocklist_generation:
+            return False
+        return bool(loaded_at) and (now - loaded_at).total_seconds() < self.cache_ttl_seconds
+
     def refresh_blocklist_cache_if_needed(self):
         now = timezone.now()
-        loaded_at = self.blocklist_cache["loaded_at"]
-        if loaded_at and (now - loaded_at).total_seconds() < self.cache_ttl_seconds:
+        if self.blocklist_cache_is_fresh(now):
+            metrics.inc("cache_requests", {"cache": "blocklist", "result": "hit"})
             return
         with self.cache_lock:
-            loaded_at = self.blocklist_cache["loaded_at"]
-            if loaded_at and (now - loaded_at).total_seconds() < self.cache_ttl_seconds:
+            if self.blocklist_cache_is_fresh(now):
+                metrics.inc("cache_requests", {"cache": "blocklist", "result": "hit"})
                 return
-            ips = set()
-            domains = set()
-            for entry in BlockEntry.objects.filter(is_active=True):
+            metrics.inc("cache_requests", {"cache": "blocklist", "result": "miss"})
+            generation = _blocklist_generation
+            ips = {}
+            domains = {}
+            entries = BlockEntry.objects.filter(is_active=True).filter(Q(expires_at__isnull=True) | Q(expires_at__gt=now))
+            for entry in entries.only("type", "value", "expires_at"):
                 if entry.type == "ip":
-                    ips.add(entry.value)
+                    ips[entry.value] = entry.expires_at
                 elif entry.type == "domain":
-                    domains.add(entry.value.lower())
-            self.blocklist_cache = {"ips": ips, "domains": domains, "loaded_at": now}
+                    domains[entry.value.lower()] = entry.expires_at
+            self.blocklist_cache = {"ips": ips, "domains": domains, "loaded_at": now, "generation": generation}
 
     def is_blocked(self, ip, domain):
         self.refresh_blocklist_cache_if_needed()
         ips = self.blocklist_cache["ips"]
         domains = self.blocklist_cache["domains"]
-        if ip and ip in ips:
-            return True
-        if domain and domain in domains:
-            return True
+        # Values are expiry times (None = permanent); entries that expire
+        # between reloads stop matching without waiting for the sweeper.
+        now = timezone.now()
+        for key, entries in ((ip, ips), (domain, domains)):
+            if key and key in entries and (entries[key] is None or entries[key] > now):
+                return True
         return False
 
     def is_rate_limited(self, ip):
@@ -124,21 +189,45 @@ class AccessControlMiddleware:
 
 
 class ApiLoggingMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
         self.ip_request_counts = {}
         self.last_reset_date = timezone.now().date()
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not (request.path or "").startswith("/api/"):
+            return self.get_response(request)
         start_time = time.time()
-        response = self.get_response(request)
+        queries = metrics.QueryCounter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
         try:
-            self.log_request(request, response, start_time)
+            self.log_request(request, response, start_time, queries.count)
         except Exception:
             pass
         return response
 
-    def log_request(self, request, response, start_time):
+    async def __acall__(self, request):
+        if not (request.path or "").startswith("/api/"):
+            return await self.get_response(request)
+        start_time = time.time()
+        # Queries of an async request run on other threads' connections, so
+        # they are not counted here.
+        response = await self.get_response(request)
+        try:
+            await sync_to_async(self.log_request)(request, response, start_time)
+        except Exception:
+            pass
+        return response
+
+    def log_request(self, request, response, start_time, query_count=0):
         path = request.path or ""
         if not path.startswith("/api/"):
             return
@@ -149,8 +238,16 @@ class ApiLoggingMiddleware:
             self.ip_request_counts = {}
             self.last_reset_date = current_date
 
+        duration = time.time() - start_time
+        route = normalize_route(request)
+        record_latency(request, response, duration, route)
+        metrics.record_request(route, request.method, getattr(response, "status_code", 0), duration, query_count)
+
         ip = get_client_ip(request)
-        
+        record_traffic(request, response, ip)
+        record_visit(request, response, ip)
+        record_talker(request, ip, get_origin_domain(request))
+
         # Count requests per IP
         if ip in self.ip_request_counts:
             self.ip_request_counts[ip] += 1
@@ -160,7 +257,6 @@ class ApiLoggingMiddleware:
         # First request from this IP today
         self.ip_request_counts[ip] = 1
         
-        duration = time.time() - start_time
         from django.contrib.auth.models import AnonymousUser
 
         ip = get_client_ip(request)
@@ -198,11 +294,6 @@ class ApiLoggingMiddleware:
             "rate_limited": rate_limited,
             "duration_ms": int(duration * 1000),
         }
-        base_dir = settings.BASE_DIR
         date_str = timezone.now().date().isoformat()
-        file_name = f"logs_{date_str}.json"
-        file_path = base_dir / file_name
-        with open(file_path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(log_entry, ensure_ascii=False))
-            f.write("\n")
+        log_writer.submit(log_entry, date_str)
 
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-19 04:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0033_remove_project_thumbnail_project_cover_image_url_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrafficRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour'), ('day', 'Day')], max_length=10)),
+                ('bucket', models.DateTimeField(help_text='UTC start of the minute/hour/day')),
+                ('requests', models.PositiveIntegerField(default=0)),
+                ('unique_visitors', models.PositiveIntegerField(default=0)),
+                ('status_2xx', models.PositiveIntegerField(default=0)),
+                ('status_3xx', models.PositiveIntegerField(default=0)),
+                ('status_4xx', models.PositiveIntegerField(default=0)),
+                ('status_5xx', models.PositiveIntegerField(default=0)),
+                ('blocked', models.PositiveIntegerField(default=0)),
+                ('rate_limited', models.PositiveIntegerField(default=0)),
+                ('bytes_sent', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['bucket'],
+                'unique_together': {('granularity', 'bucket')},
+            },
+        ),
+    ]
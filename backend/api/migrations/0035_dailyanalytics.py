@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-19 04:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0034_trafficrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAnalytics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('visitors_sketch', models.BinaryField(default=b'')),
+                ('unique_visitors', models.PositiveIntegerField(default=0, help_text='Sketch estimate at last flush')),
+                ('page_views', models.PositiveIntegerField(default=0)),
+                ('device_counts', models.JSONField(blank=True, default=dict)),
+                ('browser_counts', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['day'],
+            },
+        ),
+    ]
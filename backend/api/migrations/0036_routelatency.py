@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-19 04:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0035_dailyanalytics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouteLatency',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(help_text='UTC start of the hour')),
+                ('route', models.CharField(help_text='Route template, e.g. /api/projects/{id}/', max_length=255)),
+                ('method', models.CharField(max_length=10)),
+                ('status_class', models.CharField(help_text='2xx, 4xx, ...', max_length=3)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total_us', models.BigIntegerField(default=0)),
+                ('max_us', models.BigIntegerField(default=0)),
+                ('buckets', models.JSONField(blank=True, default=dict)),
+            ],
+            options={
+                'ordering': ['hour', 'route'],
+                'unique_together': {('hour', 'route', 'method', 'status_class')},
+            },
+        ),
+    ]
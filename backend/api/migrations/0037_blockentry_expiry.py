@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 04:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0036_routelatency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blockentry',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Empty = permanent', null=True),
+        ),
+        migrations.AddField(
+            model_name='blockentry',
+            name='strikes',
+            field=models.PositiveIntegerField(default=0, help_text='Automatic blocks so far (api.abuse)'),
+        ),
+    ]
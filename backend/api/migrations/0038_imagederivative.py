@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-19 04:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0037_blockentry_expiry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageDerivative',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(db_index=True, help_text='Storage name of the original upload', max_length=255)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('format', models.CharField(choices=[('webp', 'WebP'), ('jpeg', 'JPEG'), ('avif', 'AVIF')], max_length=10)),
+                ('file', models.CharField(help_text='Storage name of the derivative', max_length=255)),
+                ('bytes', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['source', 'width'],
+                'unique_together': {('source', 'width', 'format')},
+            },
+        ),
+    ]
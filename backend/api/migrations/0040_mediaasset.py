@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-19 04:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0039_storedblob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaAsset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(help_text='Storage name', max_length=255, unique=True)),
+                ('name', models.CharField(db_index=True, help_text='Original file name', max_length=255)),
+                ('folder', models.CharField(blank=True, default='', max_length=255)),
+                ('kind', models.CharField(choices=[('image', 'Image'), ('video', 'Video'), ('audio', 'Audio'), ('document', 'Document'), ('file', 'File')], default='file', max_length=10)),
+                ('mime_type', models.CharField(blank=True, default='', max_length=100)),
+                ('size', models.BigIntegerField(default=0)),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, null=True)),
+                ('modified_at', models.DateTimeField()),
+                ('owners', models.JSONField(blank=True, default=list, help_text='["api.project:3:cover_image", ...]')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-modified_at', '-id'],
+                'indexes': [models.Index(fields=['-modified_at'], name='api_mediaas_modifie_8eb518_idx'), models.Index(fields=['kind', '-modified_at'], name='api_mediaas_kind_22aa5b_idx'), models.Index(fields=['folder', '-modified_at'], name='api_mediaas_folder_603be1_idx')],
+            },
+        ),
+    ]
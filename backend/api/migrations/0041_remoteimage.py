@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-19 04:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0040_mediaasset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RemoteImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.CharField(max_length=1000)),
+                ('url_hash', models.CharField(help_text='SHA-256 of the URL', max_length=64, unique=True)),
+                ('file', models.FileField(blank=True, null=True, upload_to='remote/')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, default='pending', max_length=10)),
+                ('content_type', models.CharField(blank=True, default='', max_length=100)),
+                ('bytes', models.PositiveIntegerField(default=0)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.CharField(blank=True, default='', max_length=500)),
+                ('fetched_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 04:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0041_remoteimage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediaasset',
+            name='blurhash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='mediaasset',
+            name='dominant_color',
+            field=models.CharField(blank=True, default='', help_text='#rrggbb', max_length=7),
+        ),
+    ]
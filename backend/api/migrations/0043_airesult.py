@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0042_mediaasset_placeholder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='SHA-256 of task, provider, model, prompt and instruction', max_length=64, unique=True)),
+                ('task', models.CharField(db_index=True, max_length=50)),
+                ('provider', models.CharField(max_length=20)),
+                ('model', models.CharField(max_length=100)),
+                ('response', models.TextField()),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('last_used_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
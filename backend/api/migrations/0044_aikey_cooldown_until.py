@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0043_airesult'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aikey',
+            name='cooldown_until',
+            field=models.DateTimeField(blank=True, help_text='Circuit breaker open until (api.ai_keys)', null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0044_aikey_cooldown_until'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aikey',
+            name='success_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='aikey',
+            name='token_count',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='aikey',
+            name='total_latency',
+            field=models.FloatField(default=0, help_text='Seconds spent in calls with this key'),
+        ),
+    ]
@@ -326,6 +326,8 @@ class BlockEntry(models.Model):
     value = models.CharField(max_length=255)
     reason = models.CharField(max_length=255, blank=True)
     is_active = models.BooleanField(default=True)
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True, help_text="Empty = permanent")
+    strikes = models.PositiveIntegerField(default=0, help_text="Automatic blocks so far (api.abuse)")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -379,6 +381,188 @@ class AIKey(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     last_used = models.DateTimeField(null=True, blank=True)
     error_count = models.IntegerField(default=0)
+    success_count = models.IntegerField(default=0)
+    token_count = models.BigIntegerField(default=0)
+    total_latency = models.FloatField(default=0, help_text="Seconds spent in calls with this key")
+    cooldown_until = models.DateTimeField(null=True, blank=True, help_text="Circuit breaker open until (api.ai_keys)")
 
     def __str__(self):
         return f"{self.provider} - {self.key[:10]}..."
+
+    @property
+    def average_latency(self):
+        calls = self.success_count + self.error_count
+        return round(self.total_latency / calls, 3) if calls else None
+
+
+class TrafficRollup(models.Model):
+    GRANULARITY_CHOICES = [
+        ("minute", "Minute"),
+        ("hour", "Hour"),
+        ("day", "Day"),
+    ]
+    granularity = models.CharField(max_length=10, choices=GRANULARITY_CHOICES)
+    bucket = models.DateTimeField(help_text="UTC start of the minute/hour/day")
+    requests = models.PositiveIntegerField(default=0)
+    unique_visitors = models.PositiveIntegerField(default=0)
+    status_2xx = models.PositiveIntegerField(default=0)
+    status_3xx = models.PositiveIntegerField(default=0)
+    status_4xx = models.PositiveIntegerField(default=0)
+    status_5xx = models.PositiveIntegerField(default=0)
+    blocked = models.PositiveIntegerField(default=0)
+    rate_limited = models.PositiveIntegerField(default=0)
+    bytes_sent = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("granularity", "bucket")
+        ordering = ["bucket"]
+
+    def __str__(self):
+        return f"{self.granularity} {self.bucket:%Y-%m-%d %H:%M}"
+
+
+class DailyAnalytics(models.Model):
+    day = models.DateField(unique=True)
+    # HyperLogLog registers (api.analytics.HyperLogLog); merge days with max()
+    visitors_sketch = models.BinaryField(default=b"")
+    unique_visitors = models.PositiveIntegerField(default=0, help_text="Sketch estimate at last flush")
+    page_views = models.PositiveIntegerField(default=0)
+    device_counts = models.JSONField(default=dict, blank=True)
+    browser_counts = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["day"]
+
+    def __str__(self):
+        return f"Analytics {self.day}"
+
+
+class RouteLatency(models.Model):
+    hour = models.DateTimeField(help_text="UTC start of the hour")
+    route = models.CharField(max_length=255, help_text="Route template, e.g. /api/projects/{id}/")
+    method = models.CharField(max_length=10)
+    status_class = models.CharField(max_length=3, help_text="2xx, 4xx, ...")
+    count = models.PositiveIntegerField(default=0)
+    total_us = models.BigIntegerField(default=0)
+    max_us = models.BigIntegerField(default=0)
+    # Sparse log-linear bucket counts (api.latency.LatencyHistogram)
+    buckets = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        unique_together = ("hour", "route", "method", "status_class")
+        ordering = ["hour", "route"]
+
+    def __str__(self):
+        return f"{self.method} {self.route} {self.status_class} @ {self.hour:%Y-%m-%d %H:00}"
+
+
+class ImageDerivative(models.Model):
+    FORMAT_CHOICES = [
+        ("webp", "WebP"),
+        ("jpeg", "JPEG"),
+        ("avif", "AVIF"),
+    ]
+    source = models.CharField(max_length=255, db_index=True, help_text="Storage name of the original upload")
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    file = models.CharField(max_length=255, help_text="Storage name of the derivative")
+    bytes = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("source", "width", "format")
+        ordering = ["source", "width"]
+
+    def __str__(self):
+        return f"{self.source} {self.width}w {self.format}"
+
+
+class StoredBlob(models.Model):
+    # One row per file under MEDIA_ROOT/cas/ (api.storage.ContentAddressedStorage)
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField(default=0)
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["name"]
+
+    def __str__(self):
+        return f"{self.name} x{self.refcount}"
+
+
+class MediaAsset(models.Model):
+    # Index of files under MEDIA_ROOT, filled on upload (api.media_library)
+    # and by the reconcile_media command; backs the admin media picker.
+    KIND_CHOICES = [
+        ("image", "Image"),
+        ("video", "Video"),
+        ("audio", "Audio"),
+        ("document", "Document"),
+        ("file", "File"),
+    ]
+    path = models.CharField(max_length=255, unique=True, help_text="Storage name")
+    name = models.CharField(max_length=255, db_index=True, help_text="Original file name")
+    folder = models.CharField(max_length=255, blank=True, default="")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default="file")
+    mime_type = models.CharField(max_length=100, blank=True, default="")
+    size = models.BigIntegerField(default=0)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    dominant_color = models.CharField(max_length=7, blank=True, default="", help_text="#rrggbb")
+    blurhash = models.CharField(max_length=64, blank=True, default="")
+    modified_at = models.DateTimeField()
+    owners = models.JSONField(default=list, blank=True, help_text='["api.project:3:cover_image", ...]')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-modified_at", "-id"]
+        indexes = [
+            models.Index(fields=["-modified_at"]),
+            models.Index(fields=["kind", "-modified_at"]),
+            models.Index(fields=["folder", "-modified_at"]),
+        ]
+
+    def __str__(self):
+        return self.path
+
+
+class RemoteImage(models.Model):
+    # Local copy of a third-party image URL (api.image_proxy)
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("ready", "Ready"),
+        ("failed", "Failed"),
+    ]
+    url = models.CharField(max_length=1000)
+    url_hash = models.CharField(max_length=64, unique=True, help_text="SHA-256 of the URL")
+    file = models.FileField(upload_to="remote/", blank=True, null=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending", db_index=True)
+    content_type = models.CharField(max_length=100, blank=True, default="")
+    bytes = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.CharField(max_length=500, blank=True, default="")
+    fetched_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.url} ({self.status})"
+
+
+class AIResult(models.Model):
+    # Cached answer of a deterministic AI task (api.ai_cache)
+    key = models.CharField(max_length=64, unique=True, help_text="SHA-256 of task, provider, model, prompt and instruction")
+    task = models.CharField(max_length=50, db_index=True)
+    provider = models.CharField(max_length=20)
+    model = models.CharField(max_length=100)
+    response = models.TextField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    last_used_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.task} ({self.provider}/{self.model})"
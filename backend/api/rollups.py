@@ -0,0 +1,165 @@
+import hashlib
+import logging
+import time
+from datetime import timedelta, timezone as dt_timezone
+from threading import Lock
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import TrafficRollup
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = (
+    "requests", "unique_visitors", "status_2xx", "status_3xx", "status_4xx",
+    "status_5xx", "blocked", "rate_limited", "bytes_sent",
+)
+
+
+def bucket_starts(now):
+    minute = now.replace(second=0, microsecond=0)
+    return {
+        "minute": minute,
+        "hour": minute.replace(minute=0),
+        "day": minute.replace(minute=0, hour=0),
+    }
+
+
+def response_size(response):
+    if getattr(response, "streaming", False):
+        try:
+            return int(response.get("Content-Length") or 0)
+        except (TypeError, ValueError):
+            return 0
+    try:
+        return len(response.content)
+    except Exception:
+        return 0
+
+
+class RollupBuffer:
+    """
+    Per-process accumulator for TrafficRollup rows. Requests only touch
+    in-memory counters; every flush_interval seconds the pending deltas are
+    applied with F() increments, one UPDATE per bucket.
+
+    unique_visitors counts the first request this process sees from an IP
+    within a bucket, so with several workers it is an upper bound.
+    """
+
+    def __init__(self, flush_interval=None):
+        self.flush_interval = flush_interval if flush_interval is not None else getattr(settings, "ROLLUP_FLUSH_SECONDS", 10)
+        self.lock = Lock()
+        self.pending = {}
+        self.seen = {}
+        self.last_flush = time.monotonic()
+        self.last_prune = 0
+
+    def record(self, ip, status_code, blocked=False, rate_limited=False, bytes_sent=0, now=None):
+        now = now or timezone.now()
+        status_class = f"status_{int(status_code or 0) // 100}xx"
+        visitor = hashlib.blake2b((ip or "").encode(), digest_size=8).digest()
+        with self.lock:
+            for granularity, bucket in bucket_starts(now).items():
+                key = (granularity, bucket)
+                counters = self.pending.get(key)
+                if counters is None:
+                    counters = self.pending[key] = dict.fromkeys(COUNTER_FIELDS, 0)
+                counters["requests"] += 1
+                if status_class in counters:
+                    counters[status_class] += 1
+                if blocked:
+                    counters["blocked"] += 1
+                if rate_limited:
+                    counters["rate_limited"] += 1
+                counters["bytes_sent"] += bytes_sent
+                seen = self.seen.setdefault(key, set())
+                if visitor not in seen:
+                    seen.add(visitor)
+                    counters["unique_visitors"] += 1
+            due = time.monotonic() - self.last_flush >= self.flush_interval
+        if due:
+            self.flush(now)
+
+    def flush(self, now=None):
+        now = now or timezone.now()
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.last_flush = time.monotonic()
+            # Visitor sets are only needed for buckets that can still receive hits.
+            current = set(bucket_starts(now).items())
+            self.seen = {key: value for key, value in self.seen.items() if key in current}
+        for (granularity, bucket), counters in pending.items():
+            try:
+                apply_rollup_delta(granularity, bucket, counters)
+            except Exception as e:
+                logger.error(f"Rollup flush failed for {granularity} {bucket}: {e}")
+        self.prune_minutes(now)
+
+    def prune_minutes(self, now):
+        if time.monotonic() - self.last_prune < 3600:
+            return
+        self.last_prune = time.monotonic()
+        retention = getattr(settings, "ROLLUP_MINUTE_RETENTION_HOURS", 48)
+        TrafficRollup.objects.filter(granularity="minute", bucket__lt=now - timedelta(hours=retention)).delete()
+
+
+def apply_rollup_delta(granularity, bucket, counters):
+    increments = {field: F(field) + value for field, value in counters.items() if value}
+    if not increments:
+        return
+    lookup = {"granularity": granularity, "bucket": bucket}
+    if TrafficRollup.objects.filter(**lookup).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            TrafficRollup.objects.create(**lookup, **counters)
+    except IntegrityError:
+        # Another worker created the row between our UPDATE and INSERT.
+        TrafficRollup.objects.filter(**lookup).update(**increments)
+
+
+rollup_buffer = RollupBuffer()
+
+
+def record_traffic(request, response, ip):
+    rollup_buffer.record(
+        ip,
+        getattr(response, "status_code", 0),
+        blocked=getattr(request, "blocked", False),
+        rate_limited=getattr(request, "rate_limited", False),
+        bytes_sent=response_size(response),
+    )
+
+
+def day_start(value):
+    return timezone.datetime(value.year, value.month, value.day, tzinfo=dt_timezone.utc)
+
+
+def get_day_rollup(date_str):
+    try:
+        day = timezone.datetime.fromisoformat(date_str).date()
+    except ValueError:
+        return None
+    return TrafficRollup.objects.filter(granularity="day", bucket=day_start(day)).first()
+
+
+def get_day_rollups(dates):
+    starts = [day_start(timezone.datetime.fromisoformat(d).date()) for d in dates]
+    rows = TrafficRollup.objects.filter(granularity="day", bucket__in=starts)
+    return {row.bucket.astimezone(dt_timezone.utc).date().isoformat(): row for row in rows}
+
+
+def get_hourly_counts(date_str, last_date_str=None):
+    """Requests per hour of day ("HH:00"), summed over date_str..last_date_str."""
+    start = day_start(timezone.datetime.fromisoformat(date_str).date())
+    end = day_start(timezone.datetime.fromisoformat(last_date_str or date_str).date()) + timedelta(days=1)
+    rows = TrafficRollup.objects.filter(granularity="hour", bucket__gte=start, bucket__lt=end).values_list("bucket", "requests")
+    counts = {}
+    for bucket, requests in rows:
+        key = bucket.astimezone(dt_timezone.utc).strftime("%H:00")
+        counts[key] = counts.get(key, 0) + requests
+    return counts
@@ -0,0 +1,103 @@
+import logging
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Event, Lock, Thread
+
+from django.conf import settings
+from django.db import close_old_connections
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def get_lock_dir():
+    return Path(getattr(settings, "SCHEDULER_LOCK_DIR", None) or Path(tempfile.gettempdir()) / "portfolio-jobs")
+
+
+@contextmanager
+def job_lock(name):
+    """
+    Holds SCHEDULER_LOCK_DIR/<name>.lock without waiting; yields False when
+    another process on this host is running the job.
+    """
+    directory = get_lock_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / f"{name}.lock", "a") as f:
+        if fcntl is not None:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+        try:
+            yield True
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class Scheduler:
+    """
+    Runs registered jobs every `interval` seconds on one daemon thread per
+    process. The jobs are registered by api.jobs; the thread is only started
+    in web processes with SCHEDULER_ENABLED (ApiConfig.ready), never in
+    tests or management commands other than run_jobs. Every worker runs
+    every job, so exclusive jobs (shared state, not per-process buffers)
+    take a file lock and are skipped while another process runs them.
+    """
+
+    def __init__(self):
+        self.jobs = {}
+        self.lock = Lock()
+        self.stopped = Event()
+        self.thread = None
+
+    def add_job(self, name, interval, func, exclusive=False):
+        with self.lock:
+            self.jobs[name] = {
+                "interval": interval, "func": func, "exclusive": exclusive, "next_run": time.monotonic() + interval,
+            }
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.stopped.clear()
+                self.thread = Thread(target=self.run, name="api-scheduler", daemon=True)
+                self.thread.start()
+
+    def run_pending(self, now=None):
+        now = now if now is not None else time.monotonic()
+        with self.lock:
+            due = [(name, job) for name, job in self.jobs.items() if job["next_run"] <= now]
+            for _, job in due:
+                job["next_run"] = now + job["interval"]
+        for name, job in due:
+            try:
+                if job["exclusive"]:
+                    with job_lock(name) as acquired:
+                        if acquired:
+                            job["func"]()
+                        else:
+                            logger.info(f"Scheduled job {name} skipped: running in another process")
+                else:
+                    job["func"]()
+            except Exception as e:
+                logger.error(f"Scheduled job {name} failed: {e}")
+            finally:
+                close_old_connections()
+
+    def run(self):
+        while not self.stopped.wait(1):
+            self.run_pending()
+
+    def stop(self):
+        self.stopped.set()
+
+
+scheduler = Scheduler()
@@ -1,8 +1,89 @@
 from rest_framework import serializers
 from .models import Profile, HomeContent, AboutContent, SocialLink, Skill, Experience, Education, Project, Certificate, Message, SiteSettings, ProjectImage, ProjectCategory, Subscriber, SkillCategory, CertificateCategory, WATemplate, BlockEntry, BlogCategory, BlogPost, ProjectSummary, AIKey
+from .ai_usage import usage_buffer
+from .cdn import request_hosts, rewrite_content, rewrite_url
+from .images import image_meta_for, srcset_for
+from .image_proxy import cached_name, proxied_url
 import ipaddress
 import re
 
+
+class SrcsetMixin(serializers.Serializer):
+    """
+    Adds `srcset`: {field: {format: {width: url}}} and `image_meta`: {field:
+    {width, height, dominant_color, blurhash}} for the image fields in
+    Meta.srcset_fields, so clients can reserve space and paint a placeholder.
+    Both are empty until the image has been processed.
+    """
+    srcset = serializers.SerializerMethodField()
+    image_meta = serializers.SerializerMethodField()
+
+    def get_srcset(self, obj):
+        request = self.context.get('request')
+        result = {}
+        for field_name in getattr(self.Meta, 'srcset_fields', ()):
+            file = getattr(obj, field_name, None)
+            if file:
+                result[field_name] = srcset_for(file.name, request)
+        return result
+
+    def get_image_meta(self, obj):
+        result = {}
+        for field_name in getattr(self.Meta, 'srcset_fields', ()):
+            file = getattr(obj, field_name, None)
+            if file:
+                result[field_name] = image_meta_for(file.name)
+        return result
+
+def is_staff_request(request):
+    return getattr(getattr(request, 'user', None), 'is_staff', False)
+
+class CdnMixin(serializers.Serializer):
+    """
+    Moves media/static URLs stored as text onto SiteSettings.cdn_url: the
+    single URLs in Meta.cdn_url_fields and every URL inside the HTML in
+    Meta.cdn_content_fields (api.cdn). File fields already get CDN URLs
+    from the storage. Staff see the stored values so edits keep them.
+    """
+
+    def to_representation(self, obj):
+        data = super().to_representation(obj)
+        request = self.context.get('request')
+        if is_staff_request(request):
+            return data
+        hosts = request_hosts(request)
+        for field_name in getattr(self.Meta, 'cdn_url_fields', ()):
+            if data.get(field_name):
+                data[field_name] = rewrite_url(data[field_name], hosts)
+        for field_name in getattr(self.Meta, 'cdn_content_fields', ()):
+            if data.get(field_name):
+                data[field_name] = rewrite_content(data[field_name], hosts)
+        return data
+
+class RemoteImageMixin(serializers.Serializer):
+    """
+    Points the third-party image URLs in Meta.remote_image_fields at their
+    local copies (api.image_proxy) once fetched, and adds the copies'
+    derivatives and placeholder data to `srcset` / `image_meta`. Staff see
+    the stored URLs so edits keep them.
+    """
+
+    def to_representation(self, obj):
+        data = super().to_representation(obj)
+        request = self.context.get('request')
+        if is_staff_request(request):
+            return data
+        for field_name in getattr(self.Meta, 'remote_image_fields', ()):
+            name = cached_name(data.get(field_name))
+            if not name:
+                continue
+            data[field_name] = proxied_url(data[field_name], request)
+            if isinstance(data.get('srcset'), dict):
+                data['srcset'][field_name] = srcset_for(name, request)
+            if isinstance(data.get('image_meta'), dict):
+                data['image_meta'][field_name] = image_meta_for(name)
+        return data
+
 class SiteSettingsSerializer(serializers.ModelSerializer):
     class Meta:
         model = SiteSettings
@@ -23,20 +104,26 @@ class SkillCategorySerializer(serializers.ModelSerializer):
         model = SkillCategory
         fields = '__all__'
 
-class HomeContentSerializer(serializers.ModelSerializer):
+class HomeContentSerializer(CdnMixin, SrcsetMixin, serializers.ModelSerializer):
     class Meta:
         model = HomeContent
         fields = '__all__'
+        srcset_fields = ('heroImageFile',)
+        cdn_url_fields = ('heroImage',)
 
-class AboutContentSerializer(serializers.ModelSerializer):
+class AboutContentSerializer(CdnMixin, SrcsetMixin, serializers.ModelSerializer):
     class Meta:
         model = AboutContent
         fields = '__all__'
+        srcset_fields = ('aboutImageFile',)
+        cdn_url_fields = ('aboutImage',)
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(CdnMixin, SrcsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Profile
         fields = '__all__'
+        srcset_fields = ('heroImageFile', 'aboutImageFile')
+        cdn_url_fields = ('heroImage', 'aboutImage', 'resumeUrl')
 
 class SocialLinkSerializer(serializers.ModelSerializer):
     class Meta:
@@ -60,17 +147,20 @@ class EducationSerializer(serializers.ModelSerializer):
         model = Education
         fields = '__all__'
 
-class ProjectImageSerializer(serializers.ModelSerializer):
+class ProjectImageSerializer(CdnMixin, RemoteImageMixin, SrcsetMixin, serializers.ModelSerializer):
     class Meta:
         model = ProjectImage
-        fields = ['id', 'image', 'image_url', 'caption', 'order']
+        fields = ['id', 'image', 'image_url', 'caption', 'order', 'srcset', 'image_meta']
+        srcset_fields = ('image',)
+        remote_image_fields = ('image_url',)
+        cdn_url_fields = ('image_url',)
 
 class ProjectSummarySerializer(serializers.ModelSerializer):
     class Meta:
         model = ProjectSummary
         fields = ['id', 'content', 'version']
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(CdnMixin, RemoteImageMixin, SrcsetMixin, serializers.ModelSerializer):
     images = ProjectImageSerializer(many=True, read_only=True)
     category_details = ProjectCategorySerializer(source='category', read_only=True)
     summaries = ProjectSummarySerializer(many=True, read_only=True)
@@ -80,6 +170,10 @@ class ProjectSerializer(serializers.ModelSerializer):
     class Meta:
         model = Project
         fields = '__all__'
+        srcset_fields = ('cover_image',)
+        remote_image_fields = ('cover_image_url',)
+        cdn_url_fields = ('cover_image_url', 'thumbnail', 'image')
+        cdn_content_fields = ('content',)
         extra_kwargs = {
             'slug': {'required': False},
             'order': {'required': False}
@@ -92,7 +186,7 @@ class ProjectSerializer(serializers.ModelSerializer):
             except:
                 return None
         if obj.cover_image_url:
-            return obj.cover_image_url
+            return self.public_image_url(obj.cover_image_url)
         
         # Fallback to first gallery image
         # Note: 'images' is the related_name for ProjectImage
@@ -110,18 +204,26 @@ class ProjectSerializer(serializers.ModelSerializer):
                 except:
                     return None
             if first_image.image_url:
-                return first_image.image_url
+                return self.public_image_url(first_image.image_url)
         return None
 
     def get_image(self, obj):
         return self.get_thumbnail(obj)
 
-class CertificateSerializer(serializers.ModelSerializer):
+    def public_image_url(self, url):
+        request = self.context.get('request')
+        if is_staff_request(request):
+            return url
+        return proxied_url(url)
+
+class CertificateSerializer(CdnMixin, RemoteImageMixin, serializers.ModelSerializer):
     category_details = CertificateCategorySerializer(source='category', read_only=True)
     
     class Meta:
         model = Certificate
         fields = '__all__'
+        remote_image_fields = ('image',)
+        cdn_url_fields = ('image',)
 
 class MessageSerializer(serializers.ModelSerializer):
     class Meta:
@@ -168,15 +270,27 @@ class BlogCategorySerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class BlogPostSerializer(serializers.ModelSerializer):
+class BlogPostSerializer(CdnMixin, RemoteImageMixin, SrcsetMixin, serializers.ModelSerializer):
     category_details = BlogCategorySerializer(source='category', read_only=True)
 
     class Meta:
         model = BlogPost
         fields = '__all__'
+        srcset_fields = ('coverImageFile',)
+        remote_image_fields = ('coverImage',)
+        cdn_url_fields = ('coverImage',)
+        cdn_content_fields = ('content',)
 
 class AIKeySerializer(serializers.ModelSerializer):
+    average_latency = serializers.FloatField(read_only=True)
+
     class Meta:
         model = AIKey
         fields = '__all__'
-        read_only_fields = ['last_used', 'error_count', 'created_at']
+        read_only_fields = [
+            'last_used', 'error_count', 'success_count', 'token_count', 'total_latency', 'cooldown_until', 'created_at',
+        ]
+
+    def to_representation(self, instance):
+        # Include usage not yet flushed to the row (api.ai_usage).
+        return super().to_representation(usage_buffer.apply(instance))
@@ -0,0 +1,109 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .ai_keys import key_pool
+from .cdn import invalidate_cdn_base
+from .image_proxy import REMOTE_IMAGE_FIELDS, track_for_instance
+from .images import IMAGE_FIELDS, image_processed, schedule_for_instance
+from .media_library import file_fields, owner_label, update_owners
+from .snapshots import ALL, TRACKED_MODELS, change_tags, mark_changed, owner_tags, snapshot_dir
+from .storage import CAS_PREFIX
+
+
+def queue_image_derivatives(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    schedule_for_instance(instance)
+
+
+def queue_remote_images(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    track_for_instance(instance)
+
+
+def release_file(instance, field, name):
+    # Content-addressed storage keeps a file until its last reference is released.
+    update_owners(name, remove=[owner_label(instance, field.name)])
+    if name.startswith(CAS_PREFIX):
+        transaction.on_commit(lambda storage=field.storage: storage.delete(name))
+
+
+def release_files(sender, instance, **kwargs):
+    for field in file_fields(sender):
+        file = getattr(instance, field.attname)
+        if file:
+            release_file(instance, field, file.name)
+
+
+def release_replaced_files(sender, instance, raw=False, update_fields=None, **kwargs):
+    fields = [
+        field for field in file_fields(sender)
+        if update_fields is None or field.name in update_fields or field.attname in update_fields
+    ]
+    if raw or instance.pk is None or not fields:
+        return
+    stored = sender.objects.filter(pk=instance.pk).values_list(*[field.attname for field in fields]).first()
+    for field, old_name in zip(fields, stored or ()):
+        file = getattr(instance, field.attname)
+        if old_name and old_name != (file.name if file else ""):
+            release_file(instance, field, old_name)
+
+
+def track_media_owners(sender, instance, raw=False, **kwargs):
+    # Replaced files keep a stale owner until reconcile_media runs.
+    if raw:
+        return
+    for field in file_fields(sender):
+        file = getattr(instance, field.attname)
+        if file:
+            update_owners(file.name, add=[owner_label(instance, field.name)])
+
+
+def settings_changed(sender, **kwargs):
+    invalidate_cdn_base()
+
+
+def ai_keys_changed(sender, **kwargs):
+    key_pool.invalidate()
+
+
+def content_changed(sender, instance, raw=False, **kwargs):
+    # Snapshot files are rebuilt by the scheduler, batching the saves of one edit.
+    if raw or not snapshot_dir():
+        return
+    tags = change_tags(instance)
+    transaction.on_commit(lambda: mark_changed(tags))
+
+
+def remote_image_changed(sender, instance, raw=False, **kwargs):
+    if raw or not snapshot_dir() or instance.status != "ready":
+        return
+    transaction.on_commit(lambda: mark_changed({ALL}))
+
+
+def image_ready(sender, source, **kwargs):
+    if snapshot_dir():
+        mark_changed(owner_tags(source))
+
+
+def connect_signals():
+    from django.apps import apps
+
+    post_save.connect(settings_changed, sender=apps.get_model("api.SiteSettings"), dispatch_uid="cdn_base")
+    post_save.connect(ai_keys_changed, sender=apps.get_model("api.AIKey"), dispatch_uid="ai_key_pool")
+    post_delete.connect(ai_keys_changed, sender=apps.get_model("api.AIKey"), dispatch_uid="ai_key_pool")
+    for label in TRACKED_MODELS:
+        post_save.connect(content_changed, sender=apps.get_model(label), dispatch_uid=f"snapshots:{label}")
+        post_delete.connect(content_changed, sender=apps.get_model(label), dispatch_uid=f"snapshots:{label}")
+    post_save.connect(remote_image_changed, sender=apps.get_model("api.RemoteImage"), dispatch_uid="snapshots:remote_image")
+    image_processed.connect(image_ready, dispatch_uid="snapshots:image_processed")
+    for label in IMAGE_FIELDS:
+        post_save.connect(queue_image_derivatives, sender=apps.get_model(label), dispatch_uid=f"image_derivatives:{label}")
+    for label in REMOTE_IMAGE_FIELDS:
+        post_save.connect(queue_remote_images, sender=apps.get_model(label), dispatch_uid=f"image_proxy:{label}")
+    for model in apps.get_app_config("api").get_models():
+        if file_fields(model):
+            post_save.connect(track_media_owners, sender=model, dispatch_uid=f"media_owners:{model._meta.label}")
+            post_delete.connect(release_files, sender=model, dispatch_uid=f"release_files:{model._meta.label}")
+            pre_save.connect(release_replaced_files, sender=model, dispatch_uid=f"release_replaced:{model._meta.label}")
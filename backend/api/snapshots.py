@@ -0,0 +1,338 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import HttpRequest, QueryDict
+from django.urls import resolve
+from django.utils import timezone
+
+from .models import BlogPost, MediaAsset, Project
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+INDEX_NAME = "index.json"
+# Tags saved since the last rebuild, one per line, appended by any process.
+PENDING_NAME = ".pending"
+LOCK_NAME = ".build.lock"
+ALL = "*"
+
+# Singleton and list endpoints: output directory -> (API path, tags). A save
+# of any model whose label is in the tags rebuilds the file.
+STATIC_OUTPUTS = {
+    "settings": ("settings/", {"api.sitesettings"}),
+    "profile": ("profile/", {"api.profile", "api.certificate", "api.skill"}),
+    "home-content": ("home-content/", {"api.homecontent"}),
+    "about-content": ("about-content/", {"api.aboutcontent"}),
+    "social-links": ("social-links/", {"api.sociallink"}),
+    "skills": ("skills/", {"api.skill", "api.skillcategory"}),
+    "skill-categories": ("skill-categories/", {"api.skillcategory"}),
+    "experience": ("experience/", {"api.experience"}),
+    "education": ("education/", {"api.education"}),
+    "certificates": ("certificates/", {"api.certificate", "api.certificatecategory"}),
+    "certificate-categories": ("certificate-categories/", {"api.certificatecategory"}),
+    "projects": ("projects/", {"api.project", "api.projectcategory"}),
+    "project-categories": ("project-categories/", {"api.projectcategory"}),
+    "blog-posts": ("blog-posts/", {"api.blogpost", "api.blogcategory"}),
+    "blog-categories": ("blog-categories/", {"api.blogcategory"}),
+}
+# Children whose changes show up in their parent's detail file.
+PARENT_FIELDS = {
+    "api.projectimage": ("api.project", "project_id"),
+    "api.projectsummary": ("api.project", "project_id"),
+}
+TRACKED_MODELS = sorted({tag for _, tags in STATIC_OUTPUTS.values() for tag in tags} | set(PARENT_FIELDS))
+
+_last_publish_check = None
+
+
+def snapshot_dir():
+    return getattr(settings, "SNAPSHOT_DIR", "") or ""
+
+
+@contextmanager
+def locked(path, mode):
+    """Opens path holding an exclusive flock, so other workers and commands wait."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, mode, encoding="utf-8") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield f
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def published(queryset, now=None):
+    now = now or timezone.now()
+    return queryset.filter(is_published=True).filter(Q(publish_at__isnull=True) | Q(publish_at__lte=now))
+
+
+def change_tags(instance):
+    """Tags a saved or deleted instance invalidates: its model label, plus the object for projects and posts."""
+    label = instance._meta.label_lower
+    if label in PARENT_FIELDS:
+        parent, field = PARENT_FIELDS[label]
+        return {parent, f"{parent}:{getattr(instance, field)}"}
+    if label in ("api.project", "api.blogpost"):
+        return {label, f"{label}:{instance.pk}"}
+    if label == "api.sitesettings":
+        # cdn_url changes every media URL.
+        return {ALL}
+    return {label}
+
+
+def owner_tags(source):
+    """change_tags for every object that references a stored image (MediaAsset.owners)."""
+    from django.apps import apps
+
+    tags = set()
+    owners = MediaAsset.objects.filter(path=source).values_list("owners", flat=True).first() or []
+    for owner in owners:
+        label, pk, _ = owner.split(":", 2)
+        try:
+            instance = apps.get_model(label).objects.filter(pk=pk).first()
+        except LookupError:
+            continue
+        if instance is not None:
+            tags |= change_tags(instance)
+    return tags
+
+
+def outputs():
+    """
+    {output directory: (API path, query, tags)} for everything public right
+    now. Directories mirror the API paths (projects/12/index.json answers
+    /api/projects/12/), plus projects/by-slug/<slug>/ and
+    blog-posts/by-slug/<slug>/ since a static host cannot route on ?slug=.
+    """
+    result = {key: (path, {}, tags) for key, (path, tags) in STATIC_OUTPUTS.items()}
+    now = timezone.now()
+    projects = published(Project.objects.order_by("order", "-createdAt"), now).values_list("pk", "slug")
+    for pk, slug in projects:
+        tags = {f"api.project:{pk}", "api.projectcategory"}
+        result[f"projects/{pk}"] = (f"projects/{pk}/", {}, tags)
+        # Slugs are not unique on Project; the first in list order wins.
+        if slug and f"projects/by-slug/{slug}" not in result:
+            result[f"projects/by-slug/{slug}"] = (f"projects/{pk}/", {}, tags)
+    for pk, slug in published(BlogPost.objects.all(), now).values_list("pk", "slug"):
+        result[f"blog-posts/by-slug/{slug}"] = ("blog-posts/by_slug/", {"slug": slug}, {f"api.blogpost:{pk}", "api.blogcategory"})
+    return result
+
+
+def source_url(path, query):
+    url = f"/api/{path}"
+    return f"{url}?{urlencode(query)}" if query else url
+
+
+def make_request(path, query):
+    base = urlsplit(getattr(settings, "SNAPSHOT_BASE_URL", "") or "http://localhost")
+    request = HttpRequest()
+    request.method = "GET"
+    request.path = request.path_info = f"/api/{path}"
+    request.GET = QueryDict(urlencode(query))
+    request.META = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": request.path,
+        "QUERY_STRING": urlencode(query),
+        "HTTP_HOST": base.netloc or "localhost",
+        "HTTP_ACCEPT": "application/json",
+        "SERVER_NAME": base.hostname or "localhost",
+        "SERVER_PORT": str(base.port or (443 if base.scheme == "https" else 80)),
+        "wsgi.url_scheme": base.scheme or "http",
+    }
+    return request
+
+
+def render(path, query=None):
+    """
+    The body an anonymous GET of /api/<path> returns, or None when it is not
+    a 200. Views run without the middleware, so snapshots are not logged or
+    rate limited.
+    """
+    query = query or {}
+    request = make_request(path, query)
+    match = resolve(request.path_info)
+    response = match.func(request, *match.args, **match.kwargs)
+    if hasattr(response, "render"):
+        response.render()
+    if response.status_code != 200:
+        logger.warning(f"Snapshot of {source_url(path, query)} returned HTTP {response.status_code}")
+        return None
+    return response.content
+
+
+def write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".snapshot-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def remove_output(root, key):
+    directory = os.path.join(root, key)
+    for name in (INDEX_NAME, INDEX_NAME + ".gz"):
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+    # Prune directories left empty, up to the snapshot root.
+    while directory != root and os.path.isdir(directory) and not os.listdir(directory):
+        os.rmdir(directory)
+        directory = os.path.dirname(directory)
+
+
+def load_manifest(root):
+    try:
+        with open(os.path.join(root, MANIFEST_NAME), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {"files": {}}
+    manifest.setdefault("files", {})
+    return manifest
+
+
+def build_snapshot(root=None, changes=None, dry_run=False):
+    """
+    Renders the public API into root (SNAPSHOT_DIR): <key>/index.json with a
+    gzip copy next to it, and manifest.json listing every file's source URL,
+    SHA-256 and sizes. changes is a set of change_tags(); None (or "*" in it)
+    renders everything. Either way a file is only rewritten when its content
+    changed, and files for objects that are gone or unpublished are removed.
+    Returns {"written": [...], "unchanged": n, "removed": [...]}.
+    """
+    root = root or snapshot_dir()
+    if not root:
+        raise ValueError("SNAPSHOT_DIR is not set")
+    root = os.path.abspath(root)
+    full = changes is None or ALL in changes
+    with locked(os.path.join(root, LOCK_NAME), "a"):
+        manifest = load_manifest(root)
+        files = manifest["files"]
+        wanted = outputs()
+        report = {"written": [], "unchanged": 0, "removed": []}
+        for key in sorted(set(files) - set(wanted)):
+            report["removed"].append(key)
+            if not dry_run:
+                remove_output(root, key)
+                del files[key]
+
+        now = timezone.now().isoformat()
+        for key, (path, query, tags) in sorted(wanted.items()):
+            entry = files.get(key)
+            source = source_url(path, query)
+            stale = entry is None or entry.get("source") != source
+            if not (full or stale or tags & changes):
+                continue
+            body = render(path, query)
+            if body is None:
+                if entry is not None:
+                    report["removed"].append(key)
+                    if not dry_run:
+                        remove_output(root, key)
+                        del files[key]
+                continue
+            digest = hashlib.sha256(body).hexdigest()
+            index_path = os.path.join(root, key, INDEX_NAME)
+            if not stale and entry["sha256"] == digest and os.path.exists(index_path):
+                report["unchanged"] += 1
+                continue
+            report["written"].append(key)
+            if dry_run:
+                continue
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            write_atomic(index_path, body)
+            write_atomic(index_path + ".gz", compressed)
+            files[key] = {
+                "source": source,
+                "sha256": digest,
+                "bytes": len(body),
+                "gzip_bytes": len(compressed),
+                "updated_at": now,
+            }
+
+        if not dry_run and (report["written"] or report["removed"] or not os.path.exists(os.path.join(root, MANIFEST_NAME))):
+            manifest["generated_at"] = now
+            manifest["base_url"] = getattr(settings, "SNAPSHOT_BASE_URL", "")
+            write_atomic(os.path.join(root, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return report
+
+
+def mark_changed(tags):
+    """
+    Queues tags for the next rebuild in SNAPSHOT_DIR/.pending, so saves made
+    by management commands or other workers are picked up by whichever
+    process runs flush_pending; a no-op while SNAPSHOT_DIR is unset.
+    """
+    root = snapshot_dir()
+    if not root or not tags:
+        return
+    with locked(os.path.join(os.path.abspath(root), PENDING_NAME), "a") as f:
+        f.write("".join(f"{tag}\n" for tag in sorted(tags)))
+
+
+def pending_tags(clear=False):
+    """The queued tags; clear=True takes them off the queue."""
+    path = os.path.join(os.path.abspath(snapshot_dir()), PENDING_NAME)
+    if not os.path.exists(path):
+        return set()
+    with locked(path, "r+") as f:
+        tags = {line.strip() for line in f if line.strip()}
+        if clear:
+            f.seek(0)
+            f.truncate()
+    return tags
+
+
+def due_publications(since, now):
+    """Tags for projects and posts whose publish_at passed in (since, now]."""
+    tags = set()
+    for model, label in ((Project, "api.project"), (BlogPost, "api.blogpost")):
+        for pk in model.objects.filter(is_published=True, publish_at__gt=since, publish_at__lte=now).values_list("pk", flat=True):
+            tags |= {label, f"{label}:{pk}"}
+    return tags
+
+
+def flush_pending():
+    """
+    Scheduler job (or run_jobs --once): rebuilds what changed since the last
+    run, batching saves made in between by any process.
+    """
+    global _last_publish_check
+    now = timezone.now()
+    if _last_publish_check is not None:
+        mark_changed(due_publications(_last_publish_check, now))
+    _last_publish_check = now
+    if not snapshot_dir():
+        return None
+    changes = pending_tags(clear=True)
+    if not changes:
+        return None
+    try:
+        report = build_snapshot(changes=changes)
+    except Exception:
+        mark_changed(changes)
+        raise
+    if report["written"] or report["removed"]:
+        logger.info(f"Snapshot updated: {len(report['written'])} written, {len(report['removed'])} removed")
+    return report
@@ -0,0 +1,169 @@
+import hashlib
+import os
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .cdn import rewrite_url
+from .media_library import record_asset, record_assets
+from .models import StoredBlob
+
+CAS_PREFIX = "cas/"
+HASH_BUFFER = 1024 * 1024
+
+_deferred = ContextVar("deferred_references", default=None)
+
+
+def cas_name(digest, name):
+    ext = os.path.splitext(name)[1].lower()
+    return f"{CAS_PREFIX}{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(HASH_BUFFER)
+            if not block:
+                break
+            digest.update(block)
+            size += len(block)
+    return digest.hexdigest(), size
+
+
+def add_reference(name, digest, size, count=1):
+    if StoredBlob.objects.filter(name=name).update(refcount=F("refcount") + count):
+        return
+    try:
+        with transaction.atomic():
+            StoredBlob.objects.create(name=name, sha256=digest, size=size, refcount=count)
+    except IntegrityError:
+        StoredBlob.objects.filter(name=name).update(refcount=F("refcount") + count)
+
+
+@contextmanager
+def deferred_references():
+    """
+    Saves made inside this block skip the per-file StoredBlob and MediaAsset
+    writes and append (name, digest, size, requested name) to the yielded
+    list instead; pass it to commit_references() to write them in bulk.
+    Worker threads see the block when run via contextvars.copy_context().
+    """
+    pending = []
+    token = _deferred.set(pending)
+    try:
+        yield pending
+    finally:
+        _deferred.reset(token)
+
+
+def commit_references(pending, owners=None):
+    """Bulk version of add_reference + record_asset for deferred saves."""
+    if not pending:
+        return
+    counts = Counter(item[0] for item in pending)
+    info = {name: (digest, size) for name, digest, size, _ in pending}
+    existing = set(StoredBlob.objects.filter(name__in=counts).values_list("name", flat=True))
+    for name in existing:
+        StoredBlob.objects.filter(name=name).update(refcount=F("refcount") + counts[name])
+    StoredBlob.objects.bulk_create([
+        StoredBlob(name=name, sha256=info[name][0], size=info[name][1], refcount=count)
+        for name, count in counts.items() if name not in existing
+    ], ignore_conflicts=True)
+    record_assets([(name, requested) for name, _, _, requested in pending], owners)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores every file at cas/<aa>/<bb>/<sha256><ext>. The upload is hashed
+    while it is streamed to a temp file; identical content is kept once and
+    StoredBlob counts how many saves point at it. Names never change once
+    written, so cas/ URLs can be cached forever. delete() only removes the
+    file when the last reference is released: FileFields release theirs when
+    the row is deleted or the file replaced (api.signals); files only linked
+    from content (upload_media_view) are released by the media GC.
+    """
+
+    def url(self, name):
+        # Served from SiteSettings.cdn_url when one is set (api.cdn).
+        return rewrite_url(super().url(name))
+
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content hash in _save; Django's
+        # "_abc123" suffixing for taken names is never needed.
+        return name
+
+    def _save(self, name, content):
+        if name.startswith(CAS_PREFIX) and self.exists(name):
+            # Saving a stored file again only adds a reference. FileSystemStorage
+            # would retry get_available_name() on the existing file forever.
+            if not StoredBlob.objects.filter(name=name).update(refcount=F("refcount") + 1):
+                add_reference(name, *hash_file(self.path(name)))
+            return name
+        if name.startswith(CAS_PREFIX) or not hasattr(content, "chunks"):
+            return super()._save(name, content)
+        if hasattr(content, "temporary_file_path"):
+            source = content.temporary_file_path()
+            digest, size = hash_file(source)
+            spooled = False
+        else:
+            source, digest, size = self._spool(content)
+            spooled = True
+        target = cas_name(digest, name)
+        full_path = self.path(target)
+        if os.path.exists(full_path):
+            if spooled:
+                os.remove(source)
+        else:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            file_move_safe(source, full_path, allow_overwrite=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(full_path, self.file_permissions_mode)
+        pending = _deferred.get()
+        if pending is not None:
+            pending.append((target, digest, size, name))
+        else:
+            add_reference(target, digest, size)
+            record_asset(target, name)
+        return target
+
+    def _spool(self, content):
+        tmp_dir = self.path(".cas_tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            if hasattr(content, "seek"):
+                content.seek(0)
+            with open(tmp_path, "wb") as f:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return tmp_path, digest.hexdigest(), size
+
+    def delete(self, name):
+        if not name or not name.startswith(CAS_PREFIX):
+            return super().delete(name)
+        with transaction.atomic():
+            blob = StoredBlob.objects.select_for_update().filter(name=name).first()
+            if blob is not None and blob.refcount > 1:
+                StoredBlob.objects.filter(pk=blob.pk).update(refcount=F("refcount") - 1)
+                return
+            if blob is not None:
+                blob.delete()
+        super().delete(name)
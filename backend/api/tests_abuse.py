@@ -0,0 +1,98 @@
+import math
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import abuse
+from .abuse import AbuseDetector, expire_block_entries, promote_offender
+from .log_store import log_writer
+from .models import BlockEntry
+from .scheduler import Scheduler, job_lock, scheduler
+
+
+class AbuseDetectorTests(TestCase):
+    def test_scores_decay_and_cross_threshold(self):
+        detector = AbuseDetector(threshold=10, half_life=60, max_tracked=100)
+        for _ in range(8):
+            self.assertIsNone(detector.record("198.51.100.1", now=0))
+        self.assertAlmostEqual(detector.score("198.51.100.1", now=60), 4.0)
+        self.assertIsNone(detector.record("198.51.100.1", weight=5, now=60))
+        self.assertIsNotNone(detector.record("198.51.100.1", weight=2, now=60))
+        self.assertEqual(detector.score("198.51.100.1", now=60), 0)
+
+    def test_memory_is_bounded(self):
+        detector = AbuseDetector(threshold=10, half_life=60, max_tracked=3)
+        for i in range(10):
+            detector.record(f"198.51.100.{i}", now=i)
+        self.assertEqual(list(detector.scores), ["198.51.100.7", "198.51.100.8", "198.51.100.9"])
+
+    def test_promotion_escalates_and_expires(self):
+        now = timezone.now()
+        with override_settings(ABUSE_BLOCK_SECONDS=600):
+            first = promote_offender("198.51.100.9", 55, now=now)
+            self.assertEqual(first.expires_at, now + timedelta(seconds=600))
+            self.assertIsNone(promote_offender("198.51.100.9", 60, now=now))
+
+            self.assertEqual(expire_block_entries(now + timedelta(seconds=601)), 1)
+            second = promote_offender("198.51.100.9", 55, now=now + timedelta(seconds=700))
+        self.assertEqual(second.pk, first.pk)
+        self.assertEqual(second.expires_at - (now + timedelta(seconds=700)), timedelta(seconds=1200))
+
+    def test_manual_entries_are_never_expired(self):
+        BlockEntry.objects.create(type="ip", value="198.51.100.2", reason="manual")
+        self.assertIsNone(promote_offender("198.51.100.2", 99))
+        self.assertEqual(expire_block_entries(timezone.now() + timedelta(days=365)), 0)
+
+    def test_cron_runs_the_expiry_job_once(self):
+        entry = BlockEntry.objects.create(type="ip", value="198.51.100.5", expires_at=timezone.now() - timedelta(seconds=1))
+
+        out = StringIO()
+        call_command("run_jobs", "--once", "--only", "expire_block_entries", stdout=out)
+
+        entry.refresh_from_db()
+        self.assertFalse(entry.is_active)
+        self.assertIn("Ran expire_block_entries", out.getvalue())
+        # Tests never start the background thread.
+        self.assertIsNone(scheduler.thread)
+
+    def test_exclusive_jobs_skip_while_another_process_runs_them(self):
+        lock_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, lock_dir, True)
+        runs = []
+        jobs = Scheduler()
+        jobs.add_job("media_gc", 60, lambda: runs.append("gc"), exclusive=True)
+        jobs.add_job("ai_usage_flush", 60, lambda: runs.append("flush"))
+        with override_settings(SCHEDULER_LOCK_DIR=lock_dir):
+            with job_lock("media_gc") as acquired:
+                self.assertTrue(acquired)
+                jobs.run_pending(now=math.inf)
+            self.assertEqual(runs, ["flush"])
+            jobs.run_pending(now=math.inf)
+        self.assertEqual(runs, ["flush", "gc", "flush"])
+
+    def test_expired_entry_stops_blocking(self):
+        log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, log_dir, True)
+        BlockEntry.objects.create(type="ip", value="198.51.100.3", expires_at=timezone.now() - timedelta(seconds=1))
+        with override_settings(API_LOG_DIR=log_dir):
+            self.assertEqual(APIClient(REMOTE_ADDR="198.51.100.3").get("/api/skills/").status_code, 200)
+            log_writer.flush()
+
+    def test_repeat_rate_limit_offender_is_blocked(self):
+        log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, log_dir, True)
+        client = APIClient(REMOTE_ADDR="198.51.100.4")
+        with override_settings(API_LOG_DIR=log_dir), mock.patch.object(abuse, "detector", AbuseDetector(threshold=2.5)):
+            statuses = [client.get("/api/skill-categories/").status_code for _ in range(104)]
+            log_writer.flush()
+        self.assertEqual(statuses[99:], [200, 429, 429, 429, 403])
+        entry = BlockEntry.objects.get(value="198.51.100.4")
+        self.assertTrue(entry.reason.startswith("Auto:"))
+        self.assertIsNotNone(entry.expires_at)
@@ -1,6 +1,7 @@
 from django.test import TestCase
 from unittest.mock import patch, MagicMock
 from .models import AIKey
+from .ai_usage import usage_buffer
 from .ai_service import AIService
 from .crypto_utils import encrypt_value
 
@@ -41,6 +42,7 @@ class AIServiceTests(TestCase):
         response = AIService.call_gemini("test")
         
         self.assertEqual(response, "Success")
+        usage_buffer.flush()
         self.key1.refresh_from_db()
         self.key2.refresh_from_db()
         
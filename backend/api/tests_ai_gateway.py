@@ -0,0 +1,490 @@
+import asyncio
+import json
+import tempfile
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import ai_cache, ai_gateway, metrics
+from .ai_gateway import ProviderError, new_client
+from .ai_keys import KeyPool, key_pool
+from .ai_usage import usage_buffer
+from .ai_mock import mock_base_urls, mock_token_count, start_mock_provider
+from .ai_service import AIService
+from .crypto_utils import encrypt_value
+from .log_store import log_writer
+from .models import AIKey, AIResult, SiteSettings
+
+
+class MockProviderTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = start_mock_provider()
+        cls.gemini_url, cls.groq_url = mock_base_urls(cls.server)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.override = override_settings(
+            AI_GEMINI_BASE_URL=self.gemini_url, AI_GROQ_BASE_URL=self.groq_url, API_LOG_DIR=tempfile.mkdtemp(),
+        )
+        self.override.enable()
+        self.server.delay = 0
+        self.server.token_delay = 0
+        self.server.requests.clear()
+        self.server.disconnects.clear()
+        key_pool.reset()
+        usage_buffer.clear()
+        self.bad = AIKey.objects.create(provider="gemini", key=encrypt_value("ratelimited-1"), is_active=True)
+        self.good = AIKey.objects.create(provider="gemini", key=encrypt_value("good-1"), is_active=True)
+
+    def tearDown(self):
+        log_writer.flush()
+        self.override.disable()
+
+
+class AsyncGatewayTests(MockProviderTestCase):
+    def test_failover_to_next_key(self):
+        text = async_to_sync(AIService.acall_gemini)("Hello there")
+
+        self.assertIn("Hello there", text)
+        self.assertEqual([key for _, key in self.server.requests], ["ratelimited-1", "good-1"])
+        usage_buffer.flush()
+        self.bad.refresh_from_db()
+        self.good.refresh_from_db()
+        self.assertEqual(self.bad.error_count, 1)
+        self.assertEqual(self.good.error_count, 0)
+        self.assertIsNotNone(self.good.last_used)
+
+    def test_groq_json_task(self):
+        SiteSettings.objects.create(ai_provider="groq")
+        AIKey.objects.create(provider="groq", key=encrypt_value("groq-1"), is_active=True)
+
+        result = async_to_sync(AIService.aseo_optimizer)("<p>Some post</p>", "django")
+
+        self.assertEqual(result["title"], "Mock title")
+        self.assertEqual(self.server.requests[0], ("/openai/v1/chat/completions", "groq-1"))
+
+    def test_calls_wait_concurrently(self):
+        self.bad.delete()
+        self.server.delay = 0.5
+
+        async def many():
+            return await asyncio.gather(*(AIService.acall_gemini(f"prompt {i}") for i in range(10)))
+
+        started = time.monotonic()
+        results = async_to_sync(many)()
+
+        self.assertEqual(len(results), 10)
+        # Ten sequential calls would take 5 seconds.
+        self.assertLess(time.monotonic() - started, 3)
+
+    def test_each_call_closes_its_own_client_without_pooling(self):
+        clients = []
+
+        def tracked_client():
+            clients.append(new_client())
+            return clients[-1]
+
+        with mock.patch.object(ai_gateway, "new_client", tracked_client):
+            for _ in range(3):
+                async_to_sync(AIService.acall_gemini)("Hello")
+
+        self.assertGreaterEqual(len(clients), 3)
+        self.assertTrue(all(client.is_closed for client in clients))
+        self.assertEqual(len(ai_gateway._clients), 0)
+
+    def test_pooled_client_is_shared_until_shutdown(self):
+        async def calls():
+            await AIService.acall_gemini("one")
+            await AIService.acall_gemini("two")
+            client = ai_gateway._clients[asyncio.get_running_loop()]
+            await ai_gateway.close_clients()
+            return client
+
+        with mock.patch.object(ai_gateway, "pool_clients", True), \
+                mock.patch.object(ai_gateway, "new_client", wraps=new_client) as created:
+            client = async_to_sync(calls)()
+
+        self.assertEqual(created.call_count, 1)
+        self.assertTrue(client.is_closed)
+
+    async def test_async_view_requires_staff(self):
+        response = await self.async_client.post("/api/ai/write/", {"topic": "x"}, content_type="application/json")
+        self.assertEqual(response.status_code, 401)
+
+        user = await User.objects.acreate_user("editor", password="pw")
+        await self.async_client.aforce_login(user)
+        response = await self.async_client.post("/api/ai/write/", {"topic": "x"}, content_type="application/json")
+        self.assertEqual(response.status_code, 403)
+
+    async def test_async_view_returns_content(self):
+        admin = await User.objects.acreate_user("admin", password="pw", is_staff=True)
+        await self.async_client.aforce_login(admin)
+
+        response = await self.async_client.post(
+            "/api/ai/write/", {"topic": "async views", "type": "excerpt"}, content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(json.loads(response.content)["content"].startswith("<p>Mock response to:"))
+
+        response = await self.async_client.post("/api/ai/chat/", {}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+
+class StreamingTests(MockProviderTestCase):
+    def test_stream_fails_over_before_the_first_token(self):
+        async def collect():
+            return [text async for text in AIService.aglobal_copilot_stream("Stream this")]
+
+        chunks = async_to_sync(collect)()
+
+        self.assertGreater(len(chunks), 1)
+        self.assertIn("Stream this", "".join(chunks))
+        usage_buffer.flush()
+        self.bad.refresh_from_db()
+        self.assertEqual(self.bad.error_count, 1)
+
+    def test_closing_the_stream_stops_the_provider_call(self):
+        self.server.token_delay = 0.2
+
+        async def first_chunk():
+            stream = AIService.aglobal_copilot_stream("A long answer")
+            first = await anext(stream)
+            await stream.aclose()
+            return first
+
+        started = time.monotonic()
+        first = async_to_sync(first_chunk)()
+
+        self.assertTrue(first)
+        # The full answer would take several seconds at 0.2s per chunk.
+        self.assertLess(time.monotonic() - started, 1.5)
+        for _ in range(20):
+            if self.server.disconnects:
+                break
+            time.sleep(0.1)
+        self.assertEqual(len(self.server.disconnects), 1)
+        usage_buffer.flush()
+        self.good.refresh_from_db()
+        self.assertEqual(self.good.error_count, 0)
+        self.assertIsNotNone(self.good.last_used)
+
+    async def test_sse_endpoint(self):
+        admin = await User.objects.acreate_user("admin", password="pw", is_staff=True)
+        await self.async_client.aforce_login(admin)
+
+        response = await self.async_client.post("/api/ai/chat/stream/", {"query": "hi"}, content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        events = [block.split("\n", 1) for block in body.strip().split("\n\n")]
+        self.assertEqual(events[-1][0], "event: done")
+        text = "".join(json.loads(data[len("data: "):])["text"] for name, data in events if name == "event: token")
+        self.assertTrue(text.startswith("<p>Mock response to:"))
+
+    async def test_sse_endpoint_reports_failure_before_streaming(self):
+        await AIKey.objects.filter(pk=self.good.pk).adelete()
+        admin = await User.objects.acreate_user("admin", password="pw", is_staff=True)
+        await self.async_client.aforce_login(admin)
+
+        response = await self.async_client.post("/api/ai/write/stream/", {"topic": "x"}, content_type="application/json")
+
+        self.assertEqual(response.status_code, 500)
+        self.assertIn("429", json.loads(response.content)["error"])
+
+
+class KeyPoolTests(MockProviderTestCase):
+    def test_rate_limited_key_is_skipped_for_its_retry_after(self):
+        for _ in range(3):
+            async_to_sync(AIService.acall_gemini)("Hello")
+
+        self.assertEqual([key for _, key in self.server.requests], ["ratelimited-1", "good-1", "good-1", "good-1"])
+        self.assertAlmostEqual(key_pool.retry_in("gemini"), 30, delta=2)
+        key_pool.sync()
+        usage_buffer.flush()
+        self.bad.refresh_from_db()
+        self.assertEqual(self.bad.error_count, 1)
+        self.assertAlmostEqual((self.bad.cooldown_until - timezone.now()).total_seconds(), 30, delta=2)
+
+    def test_no_round_trip_while_every_key_cools_down(self):
+        self.good.delete()
+        with self.assertRaisesMessage(ProviderError, "429"):
+            async_to_sync(AIService.acall_gemini)("Hello")
+        with self.assertRaisesMessage(Exception, "All Gemini keys are cooling down"):
+            async_to_sync(AIService.acall_gemini)("Hello")
+
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_breakers_opened_by_other_workers_are_respected(self):
+        key_pool.sync()
+        AIKey.objects.filter(pk=self.bad.pk).update(cooldown_until=timezone.now() + timezone.timedelta(minutes=5))
+        key_pool.sync()
+
+        self.assertEqual([key.id for key in key_pool.select("gemini")], [self.good.id])
+
+    def test_calls_hand_the_breaker_write_back_to_a_thread(self):
+        key_pool.sync()
+        key_pool.record_failure(key_pool.keys[self.bad.pk], ProviderError("slow down", status=429, retry_after=30))
+        key_pool.synced_at -= key_pool.sync_interval
+
+        with mock.patch("api.ai_keys.Thread") as thread, self.assertNumQueries(1):
+            key_pool.prepare()
+        thread.assert_called_once_with(target=key_pool.write_in_thread, daemon=True, name="ai-key-cooldowns")
+        thread.return_value.start.assert_called_once_with()
+        self.assertFalse(key_pool.needs_sync())
+        self.bad.refresh_from_db()
+        self.assertIsNone(self.bad.cooldown_until)
+
+        key_pool.write_cooldowns()
+        self.bad.refresh_from_db()
+        self.assertIsNotNone(self.bad.cooldown_until)
+
+    def test_writes_never_shorten_another_workers_cooldown(self):
+        key_pool.sync()
+        key = key_pool.keys[self.bad.pk]
+        later = timezone.now() + timezone.timedelta(minutes=5)
+        AIKey.objects.filter(pk=self.bad.pk).update(cooldown_until=later)
+
+        key_pool.record_failure(key, ProviderError("slow down", status=429, retry_after=30))
+        key_pool.write_cooldowns()
+        self.bad.refresh_from_db()
+        self.assertEqual(self.bad.cooldown_until, later)
+
+        key_pool.record_success(key, 0.1)
+        key_pool.write_cooldowns()
+        self.bad.refresh_from_db()
+        self.assertEqual(self.bad.cooldown_until, later)
+
+        AIKey.objects.filter(pk=self.bad.pk).update(cooldown_until=timezone.now() - timezone.timedelta(seconds=1))
+        key_pool.record_failure(key, ProviderError("slow down", status=429, retry_after=30))
+        key_pool.record_success(key, 0.1)
+        key_pool.write_cooldowns()
+        self.bad.refresh_from_db()
+        self.assertIsNone(self.bad.cooldown_until)
+
+    def test_repeated_errors_open_the_breaker(self):
+        pool = KeyPool(failure_threshold=3, cooldown=30)
+        pool.sync()
+        key = pool.select("gemini")[0]
+        for _ in range(2):
+            pool.record_failure(key, Exception("timeout"))
+        self.assertIn(key, pool.select("gemini"))
+
+        pool.record_failure(key, Exception("timeout"))
+        self.assertNotIn(key, pool.select("gemini"))
+        pool.record_failure(key, ProviderError("bad key", status=401))
+        self.assertAlmostEqual(pool.retry_in("gemini"), pool.max_cooldown, delta=2)
+
+    def test_faster_keys_get_more_calls(self):
+        pool = KeyPool()
+        pool.sync()
+        fast, slow = sorted(pool.select("gemini"), key=lambda key: key.id != self.good.id)
+        pool.record_success(fast, 0.2)
+        pool.record_success(slow, 0.8)
+
+        firsts = [pool.select("gemini")[0] for _ in range(100)]
+
+        self.assertEqual(firsts.count(fast), 80)
+        self.assertEqual(firsts.count(slow), 20)
+
+    def test_saving_a_key_reloads_the_pool(self):
+        key_pool.sync()
+        AIKey.objects.create(provider="groq", key=encrypt_value("groq-1"), is_active=True)
+        self.good.is_active = False
+        self.good.save()
+
+        self.assertEqual([key.api_key for key in AIService.get_active_keys("groq")], ["groq-1"])
+        self.assertEqual([key.api_key for key in AIService.get_active_keys("gemini")], ["ratelimited-1"])
+
+
+class UsageTests(MockProviderTestCase):
+    def test_calls_are_counted_in_memory_until_the_flush(self):
+        async_to_sync(AIService.acall_gemini)("Count these words")
+        async_to_sync(AIService.acall_gemini)("And these")
+
+        self.good.refresh_from_db()
+        self.assertEqual((self.good.success_count, self.good.last_used), (0, None))
+        with self.assertNumQueries(1):
+            self.assertEqual(usage_buffer.flush(), 2)
+
+        self.bad.refresh_from_db()
+        self.good.refresh_from_db()
+        self.assertEqual((self.bad.error_count, self.bad.success_count, self.bad.last_used), (1, 0, None))
+        self.assertEqual((self.good.error_count, self.good.success_count), (0, 2))
+        self.assertEqual(self.good.token_count, mock_token_count("Count these words") + mock_token_count("And these"))
+        self.assertGreater(self.good.total_latency, 0)
+        self.assertIsNotNone(self.good.last_used)
+        self.assertEqual(usage_buffer.flush(), 0)
+
+    def test_usage_is_flushed_by_calls_without_a_scheduler(self):
+        self.assertFalse(settings.SCHEDULER_ENABLED)
+        with mock.patch.object(usage_buffer, "flush_interval", 0):
+            usage_buffer.record(self.good.id, "success", 0.5, tokens=7)
+            usage_buffer.record(self.bad.id, "failure", 0.25)
+
+        self.good.refresh_from_db()
+        self.bad.refresh_from_db()
+        self.assertEqual((self.good.success_count, self.good.token_count, self.good.total_latency), (1, 7, 0.5))
+        self.assertIsNotNone(self.good.last_used)
+        self.assertEqual(self.bad.error_count, 1)
+        self.assertEqual(usage_buffer.pending, {})
+
+    def test_streamed_tokens_are_counted(self):
+        SiteSettings.objects.create(ai_provider="groq")
+        groq = AIKey.objects.create(provider="groq", key=encrypt_value("groq-1"), is_active=True)
+
+        async def collect():
+            return [text async for text in AIService.aglobal_copilot_stream("Stream this")]
+
+        async_to_sync(collect)()
+        usage_buffer.flush()
+
+        groq.refresh_from_db()
+        self.assertEqual(groq.success_count, 1)
+        self.assertGreater(groq.token_count, 0)
+
+    def test_flush_adds_to_counts_written_by_other_workers(self):
+        usage_buffer.record(self.good.id, "failure", 0.5)
+        AIKey.objects.filter(pk=self.good.pk).update(error_count=3, success_count=7)
+
+        usage_buffer.flush()
+
+        self.good.refresh_from_db()
+        self.assertEqual((self.good.error_count, self.good.success_count), (4, 7))
+
+    def test_failed_flush_keeps_the_counts(self):
+        usage_buffer.record(self.good.id, "success", 0.5, tokens=10)
+        with mock.patch.object(AIKey.objects, "bulk_update", side_effect=RuntimeError("database is locked")):
+            with self.assertRaises(RuntimeError):
+                usage_buffer.flush()
+        usage_buffer.record(self.good.id, "success", 0.5, tokens=5)
+
+        usage_buffer.flush()
+
+        self.good.refresh_from_db()
+        self.assertEqual((self.good.success_count, self.good.token_count), (2, 15))
+
+    def test_key_views_include_unflushed_usage(self):
+        admin = User.objects.create_user("admin", password="pw", is_staff=True)
+        self.client.force_login(admin)
+        usage_buffer.record(self.good.id, "success", 0.4, tokens=12)
+        usage_buffer.record(self.good.id, "failure", 0.2)
+
+        listed = {key["id"]: key for key in self.client.get("/api/ai/keys/").json()}
+        viewset = {key["id"]: key for key in self.client.get("/api/ai-keys/").json()}
+
+        for data in (listed[self.good.id], viewset[self.good.id]):
+            self.assertEqual((data["success_count"], data["error_count"], data["token_count"]), (1, 1, 12))
+            self.assertAlmostEqual(data["average_latency"], 0.3)
+            self.assertIsNotNone(data["last_used"])
+        self.assertEqual(listed[self.bad.id]["success_count"], 0)
+
+    def test_admin_edit_keeps_counters(self):
+        admin = User.objects.create_user("admin", password="pw", is_staff=True)
+        self.client.force_login(admin)
+        usage_buffer.record(self.good.id, "success", 0.4, tokens=12)
+        loaded = AIKey.objects.get(pk=self.good.pk)
+        usage_buffer.apply(loaded)
+        self.assertEqual(loaded.success_count, 0)
+
+        with mock.patch("api.views.AIKeyViewSet.get_object", return_value=loaded):
+            # Another worker flushes while the admin's request is in flight.
+            AIKey.objects.filter(pk=self.good.pk).update(success_count=5, error_count=2)
+            response = self.client.patch(f"/api/ai-keys/{self.good.pk}/", {"is_active": False}, content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        self.good.refresh_from_db()
+        self.assertEqual((self.good.is_active, self.good.success_count, self.good.error_count), (False, 5, 2))
+
+
+class ResultCacheTests(MockProviderTestCase):
+    def setUp(self):
+        super().setUp()
+        self.bad.delete()
+        self.registry = metrics.registry
+        metrics.registry = metrics.MetricsRegistry(write_interval=3600)
+
+    def tearDown(self):
+        metrics.registry = self.registry
+        super().tearDown()
+
+    def cache_counts(self, task):
+        counts = {}
+        for name, labels, value in metrics.registry.snapshot()["counters"]:
+            labels = dict(labels)
+            if name == "cache_requests" and labels["cache"] == f"ai:{task}":
+                counts[labels["result"]] = value
+        return counts
+
+    def test_repeated_task_is_served_from_the_cache(self):
+        first = async_to_sync(AIService.aseo_optimizer)("<p>Some post</p>", "django")
+        # Only whitespace differs, so the normalized prompt is the same.
+        second = async_to_sync(AIService.aseo_optimizer)("<p>Some   post</p>", "django")
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(self.cache_counts("seo"), {"miss": 1, "hit": 1})
+        row = AIResult.objects.get()
+        self.assertEqual((row.task, row.provider, row.model, row.hits), ("seo", "gemini", "gemini-2.5-flash", 1))
+
+    def test_refresh_bypasses_the_lookup_and_stores_the_new_answer(self):
+        async_to_sync(AIService.aseo_optimizer)("<p>Some post</p>")
+        async_to_sync(AIService.aseo_optimizer)("<p>Some post</p>", use_cache=False)
+
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.cache_counts("seo"), {"miss": 1})
+        self.assertEqual(AIResult.objects.count(), 1)
+
+    def test_expired_answers_are_not_served(self):
+        async_to_sync(AIService.aseo_optimizer)("<p>Some post</p>")
+        AIResult.objects.update(expires_at=timezone.now() - timezone.timedelta(seconds=1))
+        async_to_sync(AIService.aseo_optimizer)("<p>Some post</p>")
+
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.cache_counts("seo"), {"miss": 2})
+
+    def test_open_ended_tasks_are_not_cached(self):
+        async_to_sync(AIService.aglobal_copilot)("What is new?")
+        async_to_sync(AIService.aglobal_copilot)("What is new?")
+        async_to_sync(AIService.awriting_assistant)("Django", "blog")
+
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertFalse(AIResult.objects.exists())
+
+    def test_streamed_answer_is_cached_whole(self):
+        async def collect():
+            return [text async for text in AIService.awriting_assistant_stream("Django", type="excerpt")]
+
+        streamed = async_to_sync(collect)()
+        cached = async_to_sync(collect)()
+
+        self.assertGreater(len(streamed), 1)
+        self.assertEqual(cached, ["".join(streamed)])
+        self.assertEqual(len(self.server.requests), 1)
+
+    @override_settings(AI_CACHE_MAX_ENTRIES=2)
+    def test_least_recently_used_answers_are_evicted(self):
+        keys = [ai_cache.cache_key("seo", "gemini", "m", f"prompt {i}") for i in range(3)]
+        ai_cache.store(keys[0], "seo", "gemini", "m", "a", 60)
+        ai_cache.store(keys[1], "seo", "gemini", "m", "b", 60)
+        self.assertEqual(ai_cache.lookup(keys[0], "seo"), "a")
+        ai_cache.store(keys[2], "seo", "gemini", "m", "c", 60)
+
+        self.assertEqual(sorted(AIResult.objects.values_list("response", flat=True)), ["a", "c"])
+
+    def test_key_depends_on_task_and_instruction(self):
+        key = ai_cache.cache_key("seo", "gemini", "m", "prompt", "instruction")
+        self.assertNotEqual(key, ai_cache.cache_key("inbox", "gemini", "m", "prompt", "instruction"))
+        self.assertNotEqual(key, ai_cache.cache_key("seo", "gemini", "m", "prompt", "other instruction"))
+        self.assertNotEqual(key, ai_cache.cache_key("seo", "groq", "m", "prompt", "instruction"))
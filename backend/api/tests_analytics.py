@@ -0,0 +1,67 @@
+from datetime import date
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from .analytics import (
+    AnalyticsBuffer, HyperLogLog, classify_user_agent, device_stats,
+    monthly_visitors, range_summary, weekly_visitors,
+)
+from .models import DailyAnalytics
+
+CHROME_DESKTOP = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36"
+SAFARI_IPHONE = "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Mobile/15E148 Safari/604.1"
+
+
+class HyperLogLogTests(TestCase):
+    def test_estimate_and_merge(self):
+        a, b = HyperLogLog(), HyperLogLog()
+        for i in range(6000):
+            a.add(f"visitor-{i}")
+        for i in range(3000, 9000):
+            b.add(f"visitor-{i}")
+        self.assertAlmostEqual(a.count(), 6000, delta=6000 * 0.05)
+        merged = HyperLogLog.from_bytes(a.to_bytes()).merge(b)
+        self.assertAlmostEqual(merged.count(), 9000, delta=9000 * 0.05)
+        self.assertEqual(HyperLogLog().count(), 0)
+
+    def test_classify_user_agent(self):
+        self.assertEqual(classify_user_agent(CHROME_DESKTOP), ("desktop", "chrome"))
+        self.assertEqual(classify_user_agent(SAFARI_IPHONE), ("mobile", "safari"))
+        self.assertEqual(classify_user_agent("Googlebot/2.1"), ("bot", "other"))
+
+
+class AnalyticsBufferTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_flush_merges_into_day_row(self):
+        day = date(2026, 1, 28)
+        first, second = AnalyticsBuffer(flush_interval=3600), AnalyticsBuffer(flush_interval=3600)
+        first.record("1.1.1.1", CHROME_DESKTOP, day)
+        first.record("2.2.2.2", SAFARI_IPHONE, day)
+        second.record("1.1.1.1", CHROME_DESKTOP, day)
+        second.record("bot", "curl/8.0", day)
+        first.flush()
+        second.flush()
+
+        row = DailyAnalytics.objects.get(day=day)
+        self.assertEqual(row.unique_visitors, 2)
+        self.assertEqual(row.page_views, 3)
+        self.assertEqual(row.device_counts["bot"], 1)
+
+        self.assertEqual(weekly_visitors(today=day)[-1], {"day": "Wed", "visitors": 2, "pageViews": 3})
+        self.assertEqual(monthly_visitors(today=day)[-1], {"month": "Jan", "visitors": 2, "pageViews": 3})
+        self.assertEqual([d["value"] for d in device_stats(today=day)], [67, 33, 0])
+
+    def test_late_visits_reach_cached_closed_ranges(self):
+        day = date(2026, 1, 28)
+        buffer = AnalyticsBuffer(flush_interval=3600)
+        buffer.record("1.1.1.1", CHROME_DESKTOP, day)
+        buffer.flush()
+        self.assertEqual(range_summary(day, day, today=date(2026, 1, 29)), {"visitors": 1, "pageViews": 1})
+
+        # Visits buffered before midnight, flushed after the range was cached.
+        buffer.record("2.2.2.2", SAFARI_IPHONE, day)
+        buffer.flush()
+        self.assertEqual(range_summary(day, day, today=date(2026, 1, 29)), {"visitors": 2, "pageViews": 2})
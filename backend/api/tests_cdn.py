@@ -0,0 +1,88 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from . import cdn
+from .models import Project, SiteSettings
+from .serializers import ProjectSerializer
+
+
+class CdnRewriteTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root, STATIC_ROOT=f"{self.media_root}/static-root")
+        self.override.enable()
+        cache.clear()
+        Path(self.media_root, "uploads").mkdir()
+        Path(self.media_root, "uploads", "a.png").write_bytes(b"legacy image")
+        self.token = hashlib.sha256(b"legacy image").hexdigest()[:12]
+        self.settings_row = SiteSettings.objects.create(cdn_url="https://cdn.example.com/")
+
+    def tearDown(self):
+        cache.clear()
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def request(self, user=None):
+        request = APIRequestFactory().get("/api/projects/")
+        request.user = user or AnonymousUser()
+        return request
+
+    def test_storage_urls_point_at_the_cdn(self):
+        name = default_storage.save("uploads/b.png", ContentFile(b"new image"))
+        self.assertEqual(default_storage.url(name), f"https://cdn.example.com/media/{name}")
+        self.assertEqual(default_storage.url("uploads/a.png"), f"https://cdn.example.com/media/uploads/a.png?v={self.token}")
+
+        self.settings_row.cdn_url = ""
+        self.settings_row.save()
+        self.assertEqual(default_storage.url(name), f"/media/{name}")
+
+    def test_content_and_url_fields_are_rewritten_once_per_version(self):
+        project = Project.objects.create(title="P", slug="p", cover_image_url="http://testserver/media/uploads/a.png", content=(
+            '<img src="/media/uploads/a.png"><img src="http://testserver/media/uploads/a.png">'
+            '<img src="https://other.com/media/uploads/a.png"><link href="/static/app.css">'
+        ))
+        with mock.patch("api.cdn.rewrite_url", wraps=cdn.rewrite_url) as rewrite:
+            data = ProjectSerializer(project, context={"request": self.request()}).data
+            calls = rewrite.call_count
+            ProjectSerializer(project, context={"request": self.request()}).data
+        # The second response reused the cached content.
+        self.assertGreater(calls, 0)
+        self.assertEqual(rewrite.call_count, calls)
+        cdn_url = f"https://cdn.example.com/media/uploads/a.png?v={self.token}"
+        self.assertEqual(data["content"], (
+            f'<img src="{cdn_url}"><img src="{cdn_url}">'
+            '<img src="https://other.com/media/uploads/a.png"><link href="https://cdn.example.com/static/app.css">'
+        ))
+        self.assertEqual(data["cover_image_url"], cdn_url)
+
+        staff = ProjectSerializer(project, context={"request": self.request(User(is_staff=True))}).data
+        self.assertEqual(staff["content"], project.content)
+
+    def test_token_follows_file_changes(self):
+        path = Path(self.media_root, "uploads", "a.png")
+        self.assertEqual(cdn.content_token(self.media_root, "uploads/a.png"), self.token)
+        with mock.patch("api.cdn.hashlib.sha256", wraps=hashlib.sha256) as sha256:
+            self.assertEqual(cdn.content_token(self.media_root, "uploads/a.png"), self.token)
+        sha256.assert_not_called()
+        path.write_bytes(b"edited image")
+        os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 1))
+        self.assertEqual(cdn.content_token(self.media_root, "uploads/a.png"), hashlib.sha256(b"edited image").hexdigest()[:12])
+        self.assertEqual(cdn.content_token(self.media_root, "uploads/missing.png"), "")
+
+    def test_no_token_for_paths_outside_the_root(self):
+        Path(self.media_root, "static-root").mkdir()
+        self.assertEqual(cdn.content_token(f"{self.media_root}/static-root", "../uploads/a.png"), "")
+        self.assertEqual(cdn.content_token(self.media_root, "/etc/hostname"), "")
+        self.assertEqual(cdn.rewrite_url("/static/../media/uploads/a.png"), "https://cdn.example.com/static/../media/uploads/a.png")
+        self.assertEqual(cdn.rewrite_url("/static/%2e%2e/uploads/a.png"), "https://cdn.example.com/static/%2e%2e/uploads/a.png")
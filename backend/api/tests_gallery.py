@@ -0,0 +1,85 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+
+from .gallery import ingest_gallery
+from .log_store import log_writer
+from .models import MediaAsset, Project, ProjectImage, RemoteImage, StoredBlob
+
+
+def png_upload(name, color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (24, 16), color).save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class GalleryIngestTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=f"{self.root}/media", API_LOG_DIR=self.root)
+        self.override.enable()
+        self.project = Project.objects.create(title="P", slug="p")
+        ProjectImage.objects.create(project=self.project, image_url="https://example.com/a.jpg", order=4)
+        patcher = mock.patch("api.gallery.schedule_derivatives")
+        self.schedule_derivatives = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        log_writer.flush()
+        self.override.disable()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_batch_is_contiguous_and_uses_a_handful_of_queries(self):
+        files = [png_upload(f"shot{i}.png", (i * 5, 0, 0)) for i in range(48)]
+        files += [png_upload("dup-a.png", "green"), png_upload("dup-b.png", "green")]
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            created = ingest_gallery(self.project, files, ["https://example.com/b.jpg"])
+        self.assertLessEqual(len(queries), 10)
+
+        self.assertEqual([image.order for image in created], list(range(5, 56)))
+        self.assertEqual(created[-1].image_url, "https://example.com/b.jpg")
+        self.assertEqual(created[48].image.name, created[49].image.name)
+        self.assertEqual(StoredBlob.objects.get(name=created[48].image.name).refcount, 2)
+        asset = MediaAsset.objects.get(path=created[0].image.name)
+        self.assertEqual((asset.name, asset.folder, asset.width), ("shot0.png", "projects/gallery", 24))
+        self.assertEqual(asset.owners, [f"api.projectimage:{created[0].pk}:image"])
+        self.assertEqual(len(MediaAsset.objects.get(path=created[48].image.name).owners), 2)
+        self.assertEqual(self.schedule_derivatives.call_count, 49)
+
+    @override_settings(IMAGE_PROXY_ENABLED=True, IMAGE_PROXY_ALLOWED_HOSTS=["picsum.photos"])
+    def test_gallery_urls_are_tracked_by_the_image_proxy(self):
+        urls = ["https://picsum.photos/id/1/800/600", "https://picsum.photos/id/2/800/600", "https://elsewhere.example/c.jpg"]
+        with mock.patch("api.image_proxy.schedule_fetch") as schedule_fetch, self.captureOnCommitCallbacks(execute=True):
+            ingest_gallery(self.project, urls=urls)
+
+        self.assertEqual(sorted(RemoteImage.objects.values_list("url", flat=True)), urls[:2])
+        self.assertEqual(sorted(call.args[0] for call in schedule_fetch.call_args_list), urls[:2])
+
+    def test_invalid_upload_rejects_the_whole_request(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("admin", password="pw", is_staff=True))
+        response = client.patch(f"/api/projects/{self.project.pk}/", {
+            "title": "Renamed",
+            "uploaded_images": [png_upload("ok.png", "red"), SimpleUploadedFile("bad.png", b"not an image")],
+        }, format="multipart")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("bad.png", str(response.data))
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.title, "P")
+        self.assertEqual(ProjectImage.objects.count(), 1)
+        self.assertFalse(StoredBlob.objects.exists())
+
+        response = client.patch(f"/api/projects/{self.project.pk}/", {
+            "uploaded_images": [png_upload("ok.png", "red"), png_upload("ok2.png", "blue")],
+        }, format="multipart")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(self.project.images.values_list("order", flat=True)), [4, 5, 6])
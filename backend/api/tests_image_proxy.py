@@ -0,0 +1,158 @@
+import io
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIRequestFactory
+
+from .image_proxy import cache_remote_image, cached_name, host_allowed, retry_remote_images
+from .models import MediaAsset, Project, RemoteImage
+from .serializers import ProjectSerializer
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 24), "blue").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Plays the third-party image host."""
+
+    def do_GET(self):
+        port = self.server.server_address[1]
+        routes = {
+            "/photo": (200, "image/png", png_bytes()),
+            "/page": (200, "text/html", b"<html></html>"),
+            "/missing": (404, "text/plain", b"nope"),
+        }
+        if self.path == "/redirect":
+            self.send_response(302)
+            self.send_header("Location", "/photo")
+            self.end_headers()
+            return
+        if self.path == "/escape":
+            self.send_response(302)
+            self.send_header("Location", f"http://localhost:{port}/photo")
+            self.end_headers()
+            return
+        status, content_type, body = routes.get(self.path, routes["/missing"])
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ImageProxyTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(
+            MEDIA_ROOT=self.media_root, IMAGE_PROXY_ENABLED=True, IMAGE_PROXY_ALLOWED_HOSTS=["127.0.0.1"],
+        )
+        self.override.enable()
+        cache.clear()
+        patcher = mock.patch("api.image_proxy.schedule_derivatives")
+        self.schedule_derivatives = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_allowlist_matches_host_and_subdomains(self):
+        with override_settings(IMAGE_PROXY_ALLOWED_HOSTS=["picsum.photos"]):
+            self.assertTrue(host_allowed("https://picsum.photos/800/600"))
+            self.assertTrue(host_allowed("https://fastly.picsum.photos/id/1.jpg"))
+            self.assertFalse(host_allowed("https://evilpicsum.photos/x.jpg"))
+            self.assertFalse(host_allowed("ftp://picsum.photos/x.jpg"))
+
+    def test_fetch_stores_a_local_copy(self):
+        remote = cache_remote_image(f"{self.base}/redirect")
+        self.assertEqual(remote.status, "ready")
+        self.assertEqual(remote.content_type, "image/png")
+        self.assertTrue(remote.file.name.startswith("cas/"))
+        self.assertTrue(remote.file.name.endswith(".png"))
+        self.schedule_derivatives.assert_called_once_with(remote.file.name)
+        asset = MediaAsset.objects.get(path=remote.file.name)
+        self.assertEqual((asset.width, asset.height), (32, 24))
+        self.assertEqual(asset.owners, [f"api.remoteimage:{remote.pk}:file"])
+
+    def test_rejected_fetches_are_recorded(self):
+        self.assertIn("not allowed", cache_remote_image(f"{self.base}/escape").error)
+        self.assertIn("Not a raster image", cache_remote_image(f"{self.base}/page").error)
+        self.assertIn("HTTP 404", cache_remote_image(f"{self.base}/missing").error)
+        with override_settings(IMAGE_PROXY_MAX_BYTES=10):
+            self.assertEqual(cache_remote_image(f"{self.base}/photo").error, "Image too large")
+        self.assertEqual(set(RemoteImage.objects.values_list("status", flat=True)), {"failed"})
+        self.assertFalse(MediaAsset.objects.exists())
+
+    def test_serializer_rewrites_once_cached(self):
+        url = f"{self.base}/photo"
+        project = Project.objects.create(title="P", slug="p", cover_image_url=url)
+        request = APIRequestFactory().get("/api/projects/")
+        request.user = mock.Mock(is_staff=False)
+
+        with mock.patch("api.image_proxy.schedule_fetch") as schedule_fetch:
+            data = ProjectSerializer(project, context={"request": request}).data
+            self.assertIsNone(cached_name(url))
+        schedule_fetch.assert_not_called()
+        self.assertFalse(RemoteImage.objects.exists())
+        self.assertEqual(data["cover_image_url"], url)
+
+        remote = cache_remote_image(url)
+        data = ProjectSerializer(project, context={"request": request}).data
+        self.assertEqual(data["cover_image_url"], f"http://testserver/media/{remote.file.name}")
+        self.assertEqual(data["thumbnail"], f"/media/{remote.file.name}")
+        self.assertIn("cover_image_url", data["srcset"])
+
+        request.user = User(is_staff=True)
+        self.assertEqual(ProjectSerializer(project, context={"request": request}).data["cover_image_url"], url)
+
+    def test_saving_a_url_queues_its_fetch(self):
+        url = f"{self.base}/photo"
+        with mock.patch("api.image_proxy.schedule_fetch") as schedule_fetch:
+            with self.captureOnCommitCallbacks(execute=True):
+                Project.objects.create(title="P", slug="p", cover_image_url=url)
+            with self.captureOnCommitCallbacks(execute=True):
+                Project.objects.create(title="Q", slug="q", cover_image_url="https://elsewhere.example/x.jpg")
+        schedule_fetch.assert_called_once_with(url)
+        self.assertEqual(RemoteImage.objects.get().status, "pending")
+
+        RemoteImage.objects.update(status="failed", fetched_at=timezone.now() - timedelta(hours=2))
+        with mock.patch("api.image_proxy.schedule_fetch") as schedule_fetch:
+            self.assertEqual(retry_remote_images(), 1)
+        schedule_fetch.assert_called_once_with(url)
+
+    def test_proxy_is_off_by_default(self):
+        url = f"{self.base}/photo"
+        with override_settings(IMAGE_PROXY_ENABLED=False), mock.patch("api.image_proxy.schedule_fetch") as schedule_fetch:
+            with self.captureOnCommitCallbacks(execute=True):
+                Project.objects.create(title="P", slug="p", cover_image_url=url)
+            self.assertIsNone(cached_name(url))
+        schedule_fetch.assert_not_called()
+        self.assertFalse(RemoteImage.objects.exists())
@@ -0,0 +1,78 @@
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from .images import derivative_formats, generate_derivatives
+from .imaging import blurhash_encode, placeholder
+from .models import BlogPost, ImageDerivative, MediaAsset
+from .serializers import BlogPostSerializer
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root, IMAGE_DERIVATIVE_WIDTHS=(320, 640, 1920))
+        self.override.enable()
+        cache.clear()
+        path = Path(self.media_root) / "blog" / "covers"
+        path.mkdir(parents=True)
+        Image.new("RGBA", (800, 400), (200, 30, 30, 128)).save(path / "cover.png")
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_generates_widths_without_upscaling(self):
+        results = generate_derivatives("blog/covers/cover.png")
+        self.assertEqual(sorted({r["width"] for r in results}), [320, 640, 800])
+        self.assertEqual(len(results), 3 * len(derivative_formats()))
+        with Image.open(Path(self.media_root) / "derivatives/blog/covers/cover/320w.jpeg") as image:
+            self.assertEqual((image.size, image.mode), ((320, 160), "RGB"))
+        self.assertEqual(ImageDerivative.objects.filter(source="blog/covers/cover.png").count(), len(results))
+
+    def test_serializer_exposes_srcset(self):
+        post = BlogPost.objects.create(title="Post", slug="post", content="x", coverImageFile="blog/covers/cover.png")
+        self.assertEqual(BlogPostSerializer(post).data["srcset"], {"coverImageFile": {}})
+        # Pending images are cached too, until their derivatives are recorded.
+        with self.assertNumQueries(0):
+            self.assertEqual(BlogPostSerializer(post).data["image_meta"], {"coverImageFile": {}})
+        generate_derivatives("blog/covers/cover.png")
+        srcset = BlogPostSerializer(post).data["srcset"]["coverImageFile"]
+        self.assertEqual(list(srcset["webp"]), ["320", "640", "800"])
+        self.assertTrue(srcset["jpeg"]["640"].endswith("derivatives/blog/covers/cover/640w.jpeg"))
+
+    def test_placeholder_is_stored_and_served_inline(self):
+        post = BlogPost.objects.create(title="Post", slug="post", content="x", coverImageFile="blog/covers/cover.png")
+        self.assertEqual(BlogPostSerializer(post).data["image_meta"], {"coverImageFile": {}})
+        generate_derivatives("blog/covers/cover.png")
+        asset = MediaAsset.objects.get(path="blog/covers/cover.png")
+        self.assertEqual((asset.width, asset.height), (800, 400))
+        meta = BlogPostSerializer(post).data["image_meta"]["coverImageFile"]
+        self.assertEqual(meta, {
+            "width": 800, "height": 400, "dominant_color": asset.dominant_color, "blurhash": asset.blurhash,
+        })
+        # Half-transparent red over white.
+        self.assertEqual(asset.dominant_color, "#e38e8e")
+        self.assertEqual(len(asset.blurhash), 28)
+
+    def test_blurhash_matches_reference_encoder(self):
+        # Expected values from the reference `blurhash` package (4x3 components).
+        self.assertEqual(blurhash_encode(Image.new("RGB", (16, 16), (255, 0, 0))), "LKTI:j|cfQ|c|co1fQo1fQfQfQfQ")
+        gradient = Image.linear_gradient("L").convert("RGB").resize((32, 32))
+        self.assertEqual(blurhash_encode(gradient), "L#HetWoffQof00WBfQWBxuj[fQj[")
+        data = placeholder(gradient.resize((320, 320)))
+        self.assertEqual((data["width"], data["height"]), (320, 320))
+
+    def test_backfill_command(self):
+        BlogPost.objects.create(title="Post", slug="post", content="x", coverImageFile="blog/covers/cover.png")
+        out = StringIO()
+        call_command("generate_image_derivatives", workers=1, stdout=out)
+        self.assertIn("Processed 1 images (0 failed)", out.getvalue())
+        call_command("generate_image_derivatives", stdout=out)
+        self.assertIn("already have derivatives", out.getvalue())
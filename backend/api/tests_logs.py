@@ -0,0 +1,162 @@
+import gzip
+import json
+import shutil
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+
+from django.test import TestCase, override_settings
+
+from .log_store import (
+    LogFileReader, LogWriter, append_log_entry, date_range, ensure_log_index, export_log_stream,
+    index_file_path, iter_log_range, log_file_path, parse_log_filters, read_log_page,
+)
+from .models import TrafficRollup
+from .rollups import RollupBuffer, get_hourly_counts
+
+
+def make_entry(i, **extra):
+    entry = {
+        "timestamp": f"2026-01-28T{i % 24:02d}:00:00.000000Z",
+        "ip": f"10.0.0.{i % 5}",
+        "origin": "",
+        "host": "localhost:8000",
+        "path": f"/api/projects/{i}/",
+        "method": "GET",
+        "status_code": 200 if i % 3 else 404,
+        "blocked": False,
+    }
+    entry.update(extra)
+    return entry
+
+
+class LogStoreTests(TestCase):
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+        self.override = override_settings(API_LOG_DIR=self.log_dir)
+        self.override.enable()
+        self.date = "2026-01-28"
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.log_dir, ignore_errors=True)
+
+    def test_append_writes_offset_index(self):
+        for i in range(5):
+            append_log_entry(make_entry(i), self.date)
+        with LogFileReader(self.date) as reader:
+            self.assertEqual(len(reader), 5)
+            self.assertEqual(reader.read_record(3)["path"], "/api/projects/3/")
+
+    def test_writer_queue_drains_and_drops_when_full(self):
+        writer = LogWriter(maxsize=100)
+        for i in range(3):
+            self.assertTrue(writer.submit(make_entry(i), self.date))
+        writer.flush()
+        self.assertEqual(read_log_page(self.date, 1, 20)["total"], 3)
+
+        stalled = LogWriter(maxsize=2)
+        stalled.ensure_started = lambda: None
+        results = [stalled.submit(make_entry(i), self.date) for i in range(3)]
+        self.assertEqual(results, [True, True, False])
+        self.assertEqual((stalled.depth(), stalled.dropped), (2, 1))
+
+    def test_index_catches_up_on_legacy_file(self):
+        with open(log_file_path(self.date), "w", encoding="utf-8") as f:
+            for i in range(4):
+                f.write(json.dumps(make_entry(i)) + "\n")
+            f.write("\n")
+        ensure_log_index(self.date)
+        append_log_entry(make_entry(4), self.date)
+        with open(log_file_path(self.date), "a", encoding="utf-8") as f:
+            f.write(json.dumps(make_entry(5)) + "\n")
+        with LogFileReader(self.date) as reader:
+            self.assertEqual(len(reader), 6)
+            self.assertEqual(reader.read_record(5)["path"], "/api/projects/5/")
+        self.assertTrue(index_file_path(self.date).exists())
+
+    def test_read_page_unfiltered(self):
+        for i in range(45):
+            append_log_entry(make_entry(i), self.date)
+        result = read_log_page(self.date, 3, 20)
+        self.assertEqual(result["total"], 45)
+        self.assertEqual(result["total_pages"], 3)
+        self.assertEqual([e["path"] for e in result["items"]], [f"/api/projects/{i}/" for i in range(40, 45)])
+        self.assertEqual(result["scan"].error_count, 15)
+
+    def test_read_page_filtered_and_clamped(self):
+        for i in range(45):
+            append_log_entry(make_entry(i), self.date)
+        filters = parse_log_filters({"ip": "10.0.0.1"})
+        result = read_log_page(self.date, 99, 4, filters)
+        self.assertEqual(result["total"], 9)
+        self.assertEqual(result["page"], 3)
+        self.assertEqual([e["path"] for e in result["items"]], ["/api/projects/41/"])
+
+    def test_missing_day_is_empty(self):
+        result = read_log_page("2020-01-01", 1, 20, parse_log_filters({"status": "404"}))
+        self.assertEqual(result["items"], [])
+        self.assertEqual(result["total"], 0)
+
+    def test_range_query_merges_days_in_order(self):
+        days = date_range("2026-01-26", "2026-01-28")
+        for day in days:
+            for i in range(7):
+                append_log_entry(make_entry(i, timestamp=f"{day}T0{i}:00:00Z"), day)
+        filters = parse_log_filters({"status": "200"})
+        events = list(iter_log_range(days, 2, 5, filters))
+        self.assertEqual([e["event"] for e in events], ["page", "summary"])
+        page, summary = events
+        self.assertEqual(summary["total"], 12)
+        self.assertEqual(summary["per_day"], {day: 4 for day in days})
+        self.assertEqual(
+            [e["timestamp"][:13] for e in page["items"]],
+            ["2026-01-27T02", "2026-01-27T04", "2026-01-27T05", "2026-01-28T01", "2026-01-28T02"],
+        )
+
+        events = list(iter_log_range(days, 9, 5, filters))
+        self.assertEqual(events[-1]["page"], 3)
+        self.assertEqual(len(events[0]["items"]), 2)
+
+    def test_export_stream_formats(self):
+        days = date_range("2026-01-27", "2026-01-28")
+        for day in days:
+            for i in range(3):
+                append_log_entry(make_entry(i), day)
+        ndjson = b"".join(export_log_stream(days)).decode("utf-8").splitlines()
+        self.assertEqual(len(ndjson), 6)
+        self.assertEqual(json.loads(ndjson[4])["path"], "/api/projects/1/")
+
+        filters = parse_log_filters({"status": "404"})
+        compressed = b"".join(export_log_stream(days, filters, fmt="csv", compress=True))
+        rows = gzip.decompress(compressed).decode("utf-8").splitlines()
+        self.assertTrue(rows[0].startswith("timestamp,ip,"))
+        self.assertEqual(len(rows), 3)
+
+
+class TrafficRollupTests(TestCase):
+    def test_buffer_flushes_increments(self):
+        now = datetime(2026, 1, 28, 10, 15, 30, tzinfo=dt_timezone.utc)
+        buffer = RollupBuffer(flush_interval=3600)
+        buffer.record("1.1.1.1", 200, bytes_sent=100, now=now)
+        buffer.record("1.1.1.1", 404, now=now)
+        buffer.record("2.2.2.2", 429, blocked=True, rate_limited=True, now=now)
+        buffer.flush(now)
+        buffer.record("3.3.3.3", 500, now=now)
+        buffer.flush(now)
+
+        day = TrafficRollup.objects.get(granularity="day")
+        self.assertEqual(day.requests, 4)
+        self.assertEqual(day.unique_visitors, 3)
+        self.assertEqual((day.status_2xx, day.status_4xx, day.status_5xx), (1, 2, 1))
+        self.assertEqual((day.blocked, day.rate_limited, day.bytes_sent), (1, 1, 100))
+        self.assertEqual(TrafficRollup.objects.filter(granularity="minute").count(), 1)
+
+    def test_hourly_counts_sum_hours_of_day_over_a_range(self):
+        buffer = RollupBuffer(flush_interval=3600)
+        for day, hour, ip in ((27, 9, "1.1.1.1"), (28, 9, "1.1.1.1"), (28, 9, "2.2.2.2"), (28, 17, "1.1.1.1")):
+            now = datetime(2026, 1, day, hour, 5, tzinfo=dt_timezone.utc)
+            buffer.record(ip, 200, now=now)
+            buffer.flush(now)
+
+        self.assertEqual(get_hourly_counts("2026-01-28"), {"09:00": 2, "17:00": 1})
+        self.assertEqual(get_hourly_counts("2026-01-27", "2026-01-28"), {"09:00": 3, "17:00": 1})
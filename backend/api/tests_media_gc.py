@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .media_gc import collect_garbage, collect_references
+from .models import BlogPost, Certificate, ImageDerivative, MediaAsset, Project
+
+
+class MediaGarbageCollectionTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root, MEDIA_GC_MIN_AGE_HOURS=1)
+        self.override.enable()
+        old = time.time() - 7200
+        for name in (
+            "projects/covers/cover.jpg", "uploads/inline image.png", "uploads/cert.png",
+            "derivatives/cover-320.webp", "uploads/orphan.jpg", "derivatives/orphan-320.webp",
+        ):
+            self.write(name, mtime=old)
+        self.write("uploads/just-uploaded.jpg")
+        Project.objects.create(title="P", slug="p", cover_image="projects/covers/cover.jpg")
+        BlogPost.objects.create(
+            title="B", slug="b", content='<p><img src="http://testserver/media/uploads/inline%20image.png"></p>',
+        )
+        Certificate.objects.create(name="C", issuer="I", issueDate="2026-01-01", image="/media/uploads/cert.png")
+        for source, file in (("projects/covers/cover.jpg", "derivatives/cover-320.webp"),
+                             ("uploads/gone.jpg", "derivatives/orphan-320.webp")):
+            ImageDerivative.objects.create(source=source, width=320, height=200, format="webp", file=file)
+        MediaAsset.objects.create(path="uploads/orphan.jpg", name="orphan.jpg", modified_at="2026-01-01T00:00:00Z")
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def write(self, name, mtime=None):
+        path = Path(self.media_root, name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * 100)
+        if mtime:
+            os.utime(path, (mtime, mtime))
+
+    def test_references_cover_fields_urls_and_derivatives(self):
+        referenced = collect_references()
+        for name in ("projects/covers/cover.jpg", "uploads/inline image.png", "uploads/cert.png",
+                     "derivatives/cover-320.webp"):
+            self.assertIn(name, referenced)
+        self.assertNotIn("derivatives/orphan-320.webp", referenced)
+
+    def test_dry_run_reports_without_touching_files(self):
+        out = StringIO()
+        call_command("gc_media", "--dry-run", stdout=out)
+        self.assertIn("uploads/orphan.jpg", out.getvalue())
+        self.assertIn("from 2 unreferenced files", out.getvalue())
+        self.assertTrue(Path(self.media_root, "uploads/orphan.jpg").exists())
+
+    def test_quarantine_and_delete(self):
+        report = collect_garbage(mode="quarantine", workers=2)
+        self.assertEqual(report["files"], ["derivatives/orphan-320.webp", "uploads/orphan.jpg"])
+        self.assertEqual(report["bytes"], 200)
+        self.assertTrue(Path(report["quarantine"], "uploads/orphan.jpg").exists())
+        self.assertFalse(Path(self.media_root, "uploads/orphan.jpg").exists())
+        self.assertTrue(Path(self.media_root, "uploads/just-uploaded.jpg").exists())
+        self.assertFalse(MediaAsset.objects.exists())
+        self.assertEqual(list(ImageDerivative.objects.values_list("file", flat=True)), ["derivatives/cover-320.webp"])
+
+        # Quarantined files are not collected again.
+        self.assertEqual(collect_garbage(mode="delete")["files"], [])
+        report = collect_garbage(mode="delete", min_age_hours=0)
+        self.assertEqual(report["files"], ["uploads/just-uploaded.jpg"])
+        self.assertFalse(Path(self.media_root, "uploads/just-uploaded.jpg").exists())
@@ -0,0 +1,100 @@
+import io
+import os
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from .log_store import log_writer
+from .models import MediaAsset, Project
+
+
+def png_bytes(size=(40, 30), color="red"):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class MediaLibraryTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.media_root = f"{self.root}/media"
+        self.override = override_settings(MEDIA_ROOT=self.media_root, API_LOG_DIR=self.root)
+        self.override.enable()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("admin", password="pw", is_staff=True))
+        patcher = mock.patch("api.views.schedule_derivatives")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        log_writer.flush()
+        self.override.disable()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def upload(self, name, data):
+        return self.client.post("/api/upload/", {"file": SimpleUploadedFile(name, data)}, format="multipart")
+
+    def test_upload_is_indexed_and_listed_with_filters(self):
+        self.assertEqual(self.upload("hero.png", png_bytes()).status_code, 200)
+        self.assertEqual(self.upload("cv.pdf", b"%PDF-1.4 demo").status_code, 200)
+
+        asset = MediaAsset.objects.get(name="hero.png")
+        self.assertEqual((asset.folder, asset.kind, asset.mime_type), ("uploads", "image", "image/png"))
+        self.assertEqual((asset.width, asset.height), (40, 30))
+        self.assertTrue(asset.path.startswith("cas/"))
+
+        listing = self.client.get("/api/media/list/").data
+        self.assertEqual(listing["count"], 2)
+        self.assertEqual({item["type"] for item in listing["results"]}, {"image", "document"})
+
+        images = self.client.get("/api/media/list/", {"type": "image"}).data
+        self.assertEqual([item["name"] for item in images["results"]], ["hero.png"])
+        self.assertTrue(images["results"][0]["url"].startswith("http://testserver/media/cas/"))
+        self.assertEqual(self.client.get("/api/media/list/", {"prefix": "cv"}).data["count"], 1)
+        self.assertEqual(self.client.get("/api/media/list/", {"folder": "projects"}).data["count"], 0)
+        self.assertEqual(self.client.get("/api/media/list/", {"date_to": "2000-01-01"}).data["count"], 0)
+        self.assertEqual(self.client.get("/api/media/list/", {"date_from": "bad"}).status_code, 400)
+
+        paged = self.client.get("/api/media/list/", {"page_size": 1, "page": 2}).data
+        self.assertEqual((len(paged["results"]), paged["total_pages"]), (1, 2))
+
+    def test_owner_references_follow_model_rows(self):
+        self.upload("cover.png", png_bytes())
+        asset = MediaAsset.objects.get()
+        project = Project.objects.create(title="P", slug="p", cover_image=asset.path)
+        asset.refresh_from_db()
+        self.assertEqual(asset.owners, [f"api.project:{project.pk}:cover_image"])
+        project.delete()
+        asset.refresh_from_db()
+        self.assertEqual(asset.owners, [])
+
+    def test_reconcile_indexes_out_of_band_files(self):
+        Path(self.media_root, "manual").mkdir(parents=True)
+        Path(self.media_root, "manual", "notes.txt").write_text("hello")
+        Path(self.media_root, "derivatives").mkdir()
+        Path(self.media_root, "derivatives", "x.webp").write_bytes(b"skip")
+        MediaAsset.objects.create(path="gone.jpg", name="gone.jpg", modified_at="2026-01-01T00:00:00Z")
+        Project.objects.create(title="P", slug="p", cover_image="manual/notes.txt")
+
+        out = StringIO()
+        call_command("reconcile_media", "--dry-run", stdout=out)
+        self.assertIn("Would index 1 new files", out.getvalue())
+        self.assertFalse(MediaAsset.objects.filter(path="manual/notes.txt").exists())
+
+        call_command("reconcile_media", stdout=StringIO())
+        asset = MediaAsset.objects.get()
+        self.assertEqual((asset.path, asset.folder, asset.kind, asset.size), ("manual/notes.txt", "manual", "document", 5))
+        self.assertEqual(len(asset.owners), 1)
+
+        os.remove(Path(self.media_root, "manual", "notes.txt"))
+        call_command("reconcile_media", stdout=StringIO())
+        self.assertFalse(MediaAsset.objects.exists())
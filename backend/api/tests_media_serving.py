@@ -0,0 +1,88 @@
+import hashlib
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.payload = bytes(range(256)) * 4
+        Path(self.media_root, "projects", "videos").mkdir(parents=True)
+        Path(self.media_root, "projects", "videos", "clip.mp4").write_bytes(self.payload)
+        self.url = "/media/projects/videos/clip.mp4"
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def body(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_full_response_and_conditional_get(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.payload)
+        self.assertEqual(response["Content-Type"], "video/mp4")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Content-Length"], str(len(self.payload)))
+        etag = response["ETag"]
+        self.assertFalse(etag.startswith("W/"))
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MATCH='"other"').status_code, 412)
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 10-19/{len(self.payload)}")
+        self.assertEqual(self.body(response), self.payload[10:20])
+
+        tail = self.client.get(self.url, HTTP_RANGE="bytes=-4")
+        self.assertEqual(self.body(tail), self.payload[-4:])
+        open_ended = self.client.get(self.url, HTTP_RANGE="bytes=1000-")
+        self.assertEqual(self.body(open_ended), self.payload[1000:])
+
+        unsatisfiable = self.client.get(self.url, HTTP_RANGE="bytes=5000-")
+        self.assertEqual(unsatisfiable.status_code, 416)
+        self.assertEqual(unsatisfiable["Content-Range"], f"bytes */{len(self.payload)}")
+
+        stale = self.client.get(self.url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"stale"')
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE="bytes=0-1,5-6").status_code, 200)
+
+    def test_cas_files_use_content_hash_etag(self):
+        name = default_storage.save("uploads/a.txt", ContentFile(b"hello"))
+        response = self.client.get(f"/media/{name}")
+        self.assertEqual(response["ETag"], f'"{hashlib.sha256(b"hello").hexdigest()}"')
+        self.assertIn("immutable", response["Cache-Control"])
+
+    def test_missing_and_traversal_are_404(self):
+        self.assertEqual(self.client.get("/media/nope.jpg").status_code, 404)
+        self.assertEqual(self.client.get("/media/../manage.py").status_code, 404)
+        self.assertEqual(self.client.post(self.url).status_code, 405)
+
+    def test_internal_directories_are_404(self):
+        for directory in (".cas_tmp", ".quarantine/20260101-000000/projects"):
+            Path(self.media_root, directory).mkdir(parents=True)
+            Path(self.media_root, directory, "clip.mp4").write_bytes(self.payload)
+            self.assertEqual(self.client.get(f"/media/{directory}/clip.mp4").status_code, 404)
+
+    @override_settings(MEDIA_SENDFILE_BACKEND="x-accel-redirect", MEDIA_ACCEL_REDIRECT_PREFIX="/internal/")
+    def test_offload_to_front_server(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-9")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Accel-Redirect"], "/internal/projects/videos/clip.mp4")
+        self.assertEqual(response.content, b"")
+        self.assertIn("ETag", response)
+
+        with override_settings(MEDIA_SENDFILE_BACKEND="x-sendfile"):
+            response = self.client.get(self.url)
+        self.assertEqual(response["X-Sendfile"], str(Path(self.media_root, "projects", "videos", "clip.mp4")))
@@ -0,0 +1,183 @@
+import json
+import os
+import shutil
+import tempfile
+
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import resolve
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .heavy_hitters import HeavyHitterTracker, SpaceSaving
+from . import metrics
+from .latency import LatencyHistogram, LatencyRecorder, normalize_route, route_latency_summary
+from .log_store import log_writer
+from .models import BlockEntry
+
+
+class SpaceSavingTests(TestCase):
+    def test_keeps_heavy_hitters_within_capacity(self):
+        summary = SpaceSaving(4)
+        for i in range(200):
+            summary.add("scraper")
+            summary.add(f"visitor-{i}")
+        top = summary.top(1)[0]
+        self.assertEqual(top["key"], "scraper")
+        self.assertGreaterEqual(top["count"], 200)
+        self.assertEqual(len(summary.counters), 4)
+
+    def test_window_drops_old_minutes(self):
+        tracker = HeavyHitterTracker(capacity=8)
+        tracker.record({"ip": "9.9.9.9"}, now=0)
+        tracker.record({"ip": "1.1.1.1"}, now=600)
+        snapshot = tracker.snapshot(now=600)
+        self.assertEqual([t["key"] for t in snapshot["window"]["ip"]], ["1.1.1.1"])
+        self.assertEqual(len(snapshot["day"]["ip"]), 2)
+
+
+class LatencyHistogramTests(TestCase):
+    def test_percentiles_within_bucket_error(self):
+        histogram = LatencyHistogram()
+        for ms in range(1, 1001):
+            histogram.record(ms * 1000)
+        summary = histogram.summary()
+        self.assertEqual(summary["count"], 1000)
+        self.assertAlmostEqual(summary["p50_ms"], 500, delta=500 / 32)
+        self.assertAlmostEqual(summary["p99_ms"], 990, delta=990 / 32)
+        self.assertEqual(summary["max_ms"], 1000)
+        self.assertLess(len(histogram.counts), 200)
+
+    def test_normalize_route(self):
+        factory = RequestFactory()
+        for path, expected in [
+            ("/api/projects/", "/api/projects/"),
+            ("/api/projects/12/", "/api/projects/{id}/"),
+            ("/api/ai/write/", "/api/ai/write/"),
+        ]:
+            request = factory.get(path)
+            request.resolver_match = resolve(path)
+            self.assertEqual(normalize_route(request), expected)
+        self.assertEqual(normalize_route(factory.get("/api/nope/")), "<unmatched>")
+
+    def test_flush_merges_hourly_rows(self):
+        now = datetime(2026, 1, 28, 10, 15, tzinfo=dt_timezone.utc)
+        recorder = LatencyRecorder(flush_interval=3600)
+        for micros in (1000, 2000, 400000):
+            recorder.record("/api/projects/", "GET", 200, micros, now=now)
+        recorder.flush(now)
+        recorder.record("/api/projects/", "GET", 201, 5000, now=now)
+        recorder.record("/api/projects/", "GET", 200, 3000, now=now)
+        recorder.flush(now)
+        start = now.replace(hour=0, minute=0)
+        rows = route_latency_summary(start, start.replace(day=29))
+        self.assertEqual([(r["status_class"], r["count"]) for r in rows], [("2xx", 5)])
+        self.assertAlmostEqual(rows[0]["max_ms"], 400.0)
+
+
+class TopTalkerViewTests(TestCase):
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+        self.override = override_settings(API_LOG_DIR=self.log_dir)
+        self.override.enable()
+        self.client = APIClient()
+        self.admin = User.objects.create_user("admin", password="pw", is_staff=True)
+        self.client.force_authenticate(self.admin)
+
+    def tearDown(self):
+        log_writer.flush()
+        self.override.disable()
+        shutil.rmtree(self.log_dir, ignore_errors=True)
+
+    def test_promote_ip_to_blocklist(self):
+        response = self.client.get("/api/monitor/top-talkers/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("window", response.data)
+
+        response = self.client.post("/api/monitor/top-talkers/block/", {"type": "ip", "value": "203.0.113.7"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(BlockEntry.objects.filter(value="203.0.113.7", is_active=True).exists())
+
+        blocked = APIClient(REMOTE_ADDR="203.0.113.7")
+        self.assertEqual(blocked.get("/api/skills/").status_code, 403)
+
+    def test_route_latency_view(self):
+        response = self.client.get("/api/monitor/latency/", {"date_from": "2026-01-27", "date_to": "2026-01-28"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["routes"], [])
+        with mock.patch("api.views.latency_for_days") as latency_for_days:
+            response = self.client.get("/api/monitor/latency/", {"since": "2026-01-28T10:00:00Z"})
+        latency_for_days.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.metrics_dir = tempfile.mkdtemp()
+        self.override = override_settings(API_LOG_DIR=self.metrics_dir, METRICS_DIR=self.metrics_dir, METRICS_TOKEN="scrape-secret")
+        self.override.enable()
+        self.registry = metrics.registry
+        metrics.registry = metrics.MetricsRegistry(write_interval=3600)
+
+    def tearDown(self):
+        log_writer.flush()
+        metrics.registry = self.registry
+        self.override.disable()
+        shutil.rmtree(self.metrics_dir, ignore_errors=True)
+
+    def test_merges_process_snapshots(self):
+        metrics.inc("http_requests", {"route": "/api/projects/", "method": "GET", "status": "2xx"}, 3)
+        metrics.observe("http_request_duration_seconds", 0.02, {"route": "/api/projects/", "method": "GET"})
+        metrics.inc("cache_requests", {"cache": "blocklist", "result": "hit"}, 3)
+        metrics.inc("cache_requests", {"cache": "blocklist", "result": "miss"})
+        metrics.registry.register_gauge("log_queue_depth", lambda: 4)
+        # A worker that has since exited: its counters still count, its gauges do not.
+        dead = {
+            "pid": 2 ** 22 + 7,
+            "counters": [["http_requests", [["method", "GET"], ["route", "/api/projects/"], ["status", "2xx"]], 2]],
+            "histograms": [],
+            "gauges": [["log_queue_depth", [], 100]],
+        }
+        with open(os.path.join(self.metrics_dir, "metrics_4194311.json"), "w") as f:
+            json.dump(dead, f)
+
+        text = metrics.render_openmetrics()
+        self.assertIn('portfolio_http_requests_total{method="GET",route="/api/projects/",status="2xx"} 5', text)
+        self.assertIn('portfolio_http_request_duration_seconds_bucket{method="GET",route="/api/projects/",le="0.025"} 1', text)
+        self.assertIn('portfolio_cache_hit_ratio{cache="blocklist"} 0.75', text)
+        self.assertIn("portfolio_log_queue_depth 4.0", text)
+        self.assertTrue(text.endswith("# EOF\n"))
+        # The exited worker's file was folded into the archive.
+        self.assertEqual(os.listdir(self.metrics_dir).count("metrics_4194311.json"), 0)
+        self.assertIn("metrics-archive.json", os.listdir(self.metrics_dir))
+        self.assertIn('portfolio_http_requests_total{method="GET",route="/api/projects/",status="2xx"} 5', metrics.render_openmetrics())
+
+    def test_reused_pid_does_not_take_over_an_old_file(self):
+        metrics.inc("translate_calls", {"outcome": "ok"}, 2)
+        metrics.registry.write()
+        earlier = {
+            "pid": os.getpid(), "started": 1,
+            "counters": [["translate_calls", [["outcome", "ok"]], 5]], "histograms": [], "gauges": [],
+        }
+        with open(os.path.join(self.metrics_dir, f"metrics_{os.getpid()}_1.json"), "w") as f:
+            json.dump(earlier, f)
+
+        self.assertIn('portfolio_translate_calls_total{outcome="ok"} 7', metrics.render_openmetrics())
+        self.assertFalse(os.path.exists(os.path.join(self.metrics_dir, f"metrics_{os.getpid()}_1.json")))
+        metrics.inc("translate_calls", {"outcome": "ok"})
+        self.assertIn('portfolio_translate_calls_total{outcome="ok"} 8', metrics.render_openmetrics())
+
+    def test_endpoint_requires_staff_or_token(self):
+        client = APIClient()
+        self.assertEqual(client.get("/api/metrics/").status_code, 401)
+        response = client.get("/api/metrics/", HTTP_AUTHORIZATION="Bearer scrape-secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("application/openmetrics-text"))
+        self.assertEqual(client.get("/api/metrics/", HTTP_AUTHORIZATION="Bearer wrong").status_code, 401)
+
+        staff = User.objects.create_user("ops", password="pw", is_staff=True)
+        token = Token.objects.create(user=staff)
+        self.assertEqual(client.get("/api/metrics/", HTTP_AUTHORIZATION=f"Token {token.key}").status_code, 200)
@@ -0,0 +1,122 @@
+import gzip
+import json
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from . import snapshots
+from .models import BlogPost, Profile, Project, Skill
+
+
+class SnapshotExportTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.override = override_settings(
+            SNAPSHOT_DIR=self.root, SNAPSHOT_BASE_URL="https://api.example.com", IMAGE_PROXY_ENABLED=False,
+        )
+        self.override.enable()
+        cache.clear()
+        Profile.objects.create(fullName="Ada")
+        Skill.objects.create(name="Python")
+        self.project = Project.objects.create(title="Site", slug="site")
+        Project.objects.create(title="Draft", slug="draft", is_published=False)
+        self.post = BlogPost.objects.create(title="Hello", slug="hello", content="<p>hi</p>", is_published=True)
+        BlogPost.objects.create(title="Later", slug="later", content="x")
+
+    def tearDown(self):
+        self.override.disable()
+        cache.clear()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def read(self, key):
+        return json.loads(Path(self.root, key, "index.json").read_bytes())
+
+    def manifest(self):
+        return json.loads(Path(self.root, "manifest.json").read_text())
+
+    def test_full_build_writes_public_endpoints_with_gzip_and_manifest(self):
+        report = snapshots.build_snapshot()
+
+        self.assertEqual(self.read("profile")["total_skills"], 1)
+        self.assertEqual([p["slug"] for p in self.read("projects")], ["site"])
+        self.assertEqual(self.read(f"projects/{self.project.pk}")["title"], "Site")
+        self.assertEqual(self.read("projects/by-slug/site")["id"], self.project.pk)
+        self.assertEqual(self.read("blog-posts/by-slug/hello")["title"], "Hello")
+        self.assertFalse(Path(self.root, "projects/by-slug/draft").exists())
+        self.assertFalse(Path(self.root, "blog-posts/by-slug/later").exists())
+
+        body = Path(self.root, "skills", "index.json").read_bytes()
+        self.assertEqual(gzip.decompress(Path(self.root, "skills", "index.json.gz").read_bytes()), body)
+        files = self.manifest()["files"]
+        self.assertEqual(sorted(files), sorted(report["written"]))
+        self.assertEqual(files["blog-posts/by-slug/hello"]["source"], "/api/blog-posts/by_slug/?slug=hello")
+        self.assertEqual(files["skills"]["bytes"], len(body))
+
+    def test_rebuild_only_touches_affected_files(self):
+        snapshots.build_snapshot()
+        profile_mtime = Path(self.root, "profile", "index.json").stat().st_mtime_ns
+
+        self.assertEqual(snapshots.build_snapshot()["written"], [])
+        self.project.title = "Site v2"
+        self.project.save()
+        report = snapshots.build_snapshot(changes=snapshots.change_tags(self.project))
+
+        self.assertEqual(sorted(report["written"]), sorted([
+            "projects", f"projects/{self.project.pk}", "projects/by-slug/site",
+        ]))
+        self.assertEqual(report["unchanged"], 0)
+        self.assertEqual(self.read("projects/by-slug/site")["title"], "Site v2")
+        self.assertEqual(Path(self.root, "profile", "index.json").stat().st_mtime_ns, profile_mtime)
+
+    def test_unpublished_and_renamed_objects_are_removed(self):
+        snapshots.build_snapshot()
+        self.project.slug = "site-renamed"
+        self.project.save()
+        self.post.is_published = False
+        self.post.save()
+        changes = snapshots.change_tags(self.project) | snapshots.change_tags(self.post)
+        report = snapshots.build_snapshot(changes=changes)
+
+        self.assertEqual(sorted(report["removed"]), ["blog-posts/by-slug/hello", "projects/by-slug/site"])
+        self.assertIn("projects/by-slug/site-renamed", report["written"])
+        self.assertFalse(Path(self.root, "projects/by-slug/site").exists())
+        self.assertNotIn("blog-posts/by-slug/hello", self.manifest()["files"])
+
+    def test_saves_queue_a_rebuild_for_the_scheduler(self):
+        snapshots.build_snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            Skill.objects.create(name="Django")
+        self.assertEqual(snapshots.pending_tags(), {"api.skill"})
+
+        report = snapshots.flush_pending()
+
+        self.assertEqual(sorted(report["written"]), ["profile", "skills"])
+        self.assertEqual(self.read("profile")["total_skills"], 2)
+        self.assertEqual(snapshots.pending_tags(), set())
+        self.assertIsNone(snapshots.flush_pending())
+
+    def test_failed_rebuild_keeps_the_queue(self):
+        snapshots.build_snapshot()
+        Skill.objects.create(name="Django")
+        # As a management command would, without a scheduler in the process.
+        snapshots.mark_changed({"api.skill"})
+        with mock.patch("api.snapshots.build_snapshot", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                snapshots.flush_pending()
+        self.assertEqual(snapshots.pending_tags(), {"api.skill"})
+        self.assertEqual(snapshots.flush_pending()["written"], ["profile", "skills"])
+
+    def test_command_dry_run_writes_nothing(self):
+        out = StringIO()
+        call_command("export_snapshots", "--dry-run", stdout=out)
+        self.assertIn("would write profile", out.getvalue())
+        self.assertFalse(Path(self.root, "manifest.json").exists())
+
+        call_command("export_snapshots", stdout=StringIO())
+        self.assertTrue(Path(self.root, "manifest.json").exists())
@@ -0,0 +1,82 @@
+import hashlib
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .models import Profile, Project, StoredBlob
+from .storage import ContentAddressedStorage, cas_name
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.storage = ContentAddressedStorage(location=self.media_root)
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.storage.save("profile/hero.JPG", ContentFile(b"same bytes"))
+        second = self.storage.save("uploads/copy.jpg", ContentFile(b"same bytes"))
+        digest = hashlib.sha256(b"same bytes").hexdigest()
+        self.assertEqual(first, second)
+        self.assertEqual(first, f"cas/{digest[:2]}/{digest[2:4]}/{digest}.jpg")
+        self.assertEqual(StoredBlob.objects.get(name=first).refcount, 2)
+        self.assertFalse(any(Path(self.media_root, ".cas_tmp").iterdir()))
+
+        self.storage.delete(first)
+        self.assertTrue(self.storage.exists(first))
+        self.storage.delete(first)
+        self.assertFalse(self.storage.exists(first))
+        self.assertFalse(StoredBlob.objects.filter(name=first).exists())
+
+    def test_saving_a_stored_name_adds_a_reference(self):
+        name = self.storage.save("uploads/a.txt", ContentFile(b"stored once"))
+
+        self.assertEqual(self.storage.save(name, ContentFile(b"stored once")), name)
+        self.assertEqual(StoredBlob.objects.get(name=name).refcount, 2)
+
+    def test_replacing_a_file_field_releases_the_old_file(self):
+        project = Project.objects.create(title="P", slug="p")
+        with self.captureOnCommitCallbacks(execute=True):
+            project.cover_image.save("old.png", ContentFile(b"old cover"))
+        old = project.cover_image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            project.cover_image.save("new.png", ContentFile(b"new cover"))
+
+        self.assertFalse(StoredBlob.objects.filter(name=old).exists())
+        self.assertFalse(Path(self.media_root, old).exists())
+        self.assertEqual(StoredBlob.objects.get(name=project.cover_image.name).refcount, 1)
+
+    def test_dedupe_command_rewrites_references(self):
+        for name in ("profile/a.png", "projects/covers/b.png"):
+            path = Path(self.media_root, name)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b"hero image")
+        Profile.objects.create(fullName="Eka", heroImageFile="profile/a.png", aboutImageFile="profile/a.png")
+        project = Project.objects.create(title="P", slug="p", cover_image="projects/covers/b.png")
+
+        out = StringIO()
+        call_command("dedupe_media", stdout=out)
+        target = cas_name(hashlib.sha256(b"hero image").hexdigest(), "a.png")
+        self.assertIn("Moved 1 files, merged 1 duplicates", out.getvalue())
+        project.refresh_from_db()
+        self.assertEqual(project.cover_image.name, target)
+        self.assertEqual(Profile.objects.get().heroImageFile.name, target)
+        self.assertEqual(StoredBlob.objects.get(name=target).refcount, 3)
+        self.assertFalse(Path(self.media_root, "profile/a.png").exists())
+        self.assertEqual(Path(self.media_root, target).read_bytes(), b"hero image")
+
+    def test_cas_urls_are_cached_forever(self):
+        name = self.storage.save("uploads/x.txt", ContentFile(b"hello"))
+        response = self.client.get(f"/media/{name}")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("immutable", response["Cache-Control"])
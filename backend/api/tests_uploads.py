@@ -0,0 +1,113 @@
+import hashlib
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from .log_store import log_writer
+from .models import Project, ProjectImage
+from .storage import cas_name
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.override = override_settings(
+            MEDIA_ROOT=f"{self.root}/media", UPLOAD_TEMP_DIR=f"{self.root}/tmp", API_LOG_DIR=self.root,
+        )
+        self.override.enable()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("admin", password="pw", is_staff=True))
+        self.payload = bytes(range(256)) * 40  # 10240 bytes
+
+    def tearDown(self):
+        log_writer.flush()
+        self.override.disable()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def put_chunk(self, upload_id, index, data, **headers):
+        return self.client.generic(
+            "PUT", f"/api/uploads/{upload_id}/chunks/{index}/", data,
+            content_type="application/octet-stream", **headers,
+        )
+
+    def test_resumable_upload_attaches_project_video(self):
+        project = Project.objects.create(title="Demo", description="d", slug="demo")
+        response = self.client.post("/api/uploads/", {
+            "filename": "demo clip.mp4", "size": len(self.payload), "chunk_size": 4096,
+            "target": "project_video", "project_id": project.id,
+            "sha256": hashlib.sha256(self.payload).hexdigest(),
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        upload_id = response.data["id"]
+        self.assertEqual(response.data["total_chunks"], 3)
+
+        chunks = [self.payload[i:i + 4096] for i in range(0, len(self.payload), 4096)]
+        self.assertEqual(self.put_chunk(upload_id, 2, chunks[2]).status_code, 200)
+        bad = self.put_chunk(upload_id, 0, chunks[0], HTTP_X_CHUNK_SHA256="0" * 64)
+        self.assertEqual(bad.status_code, 422)
+        self.assertEqual(self.put_chunk(upload_id, 1, chunks[1][:100]).status_code, 400)
+        self.assertEqual(self.client.post(f"/api/uploads/{upload_id}/complete/").status_code, 409)
+
+        # Resume: ask what is missing, send only that.
+        missing = self.client.get(f"/api/uploads/{upload_id}/").data["missing"]
+        self.assertEqual(missing, [0, 1])
+        for index in missing:
+            digest = hashlib.sha256(chunks[index]).hexdigest()
+            self.assertEqual(self.put_chunk(upload_id, index, chunks[index], HTTP_X_CHUNK_SHA256=digest).status_code, 200)
+
+        response = self.client.post(f"/api/uploads/{upload_id}/complete/")
+        self.assertEqual(response.status_code, 200)
+        project.refresh_from_db()
+        self.assertEqual(project.video_file.name, cas_name(hashlib.sha256(self.payload).hexdigest(), "demo_clip.mp4"))
+        self.assertEqual(Path(self.root, "media", project.video_file.name).read_bytes(), self.payload)
+        self.assertFalse(any(Path(self.root, "tmp").iterdir()))
+
+    def test_rejects_wrong_type_for_target(self):
+        response = self.client.post("/api/uploads/", {"filename": "x.exe", "size": 10, "target": "project_video"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get("/api/uploads/00000000-0000-4000-8000-000000000000/").status_code, 404)
+
+    def test_malformed_numbers_are_rejected(self):
+        response = self.client.post("/api/uploads/", {"filename": "a.bin", "size": 10, "chunk_size": "abc"}, format="json")
+        self.assertEqual((response.status_code, response.data["error"]), (400, "chunk_size must be an integer"))
+        response = self.client.post("/api/uploads/", {
+            "filename": "a.png", "size": 10, "target": "project_image", "project_id": "abc",
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_gallery_upload_goes_after_the_last_image(self):
+        project = Project.objects.create(title="Demo", description="d", slug="demo")
+        ProjectImage.objects.create(project=project, image_url="https://example.com/a.jpg", order=0)
+        ProjectImage.objects.create(project=project, image_url="https://example.com/b.jpg", order=3)
+        response = self.client.post("/api/uploads/", {
+            "filename": "shot.png", "size": len(self.payload), "target": "project_image", "project_id": str(project.id),
+        }, format="json")
+        upload_id = response.data["id"]
+        self.assertEqual(self.put_chunk(upload_id, 0, self.payload).status_code, 200)
+        response = self.client.post(f"/api/uploads/{upload_id}/complete/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ProjectImage.objects.get(pk=response.data["image_id"]).order, 4)
+
+    def test_session_is_completed_once_by_its_owner(self):
+        response = self.client.post("/api/uploads/", {"filename": "a.bin", "size": len(self.payload)}, format="json")
+        upload_id = response.data["id"]
+        self.assertEqual(self.put_chunk(upload_id, 0, self.payload).status_code, 200)
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user("other", password="pw", is_staff=True))
+        self.assertEqual(other.get(f"/api/uploads/{upload_id}/").status_code, 403)
+        self.assertEqual(other.post(f"/api/uploads/{upload_id}/complete/").status_code, 403)
+        self.assertEqual(other.delete(f"/api/uploads/{upload_id}/").status_code, 403)
+
+        # Another request is completing it.
+        marker = Path(self.root, "tmp", upload_id, "completing")
+        marker.touch()
+        self.assertEqual(self.client.post(f"/api/uploads/{upload_id}/complete/").status_code, 409)
+        self.assertEqual(self.put_chunk(upload_id, 0, self.payload).status_code, 409)
+        marker.unlink()
+        self.assertEqual(self.client.post(f"/api/uploads/{upload_id}/complete/").status_code, 200)
+        self.assertEqual(self.client.post(f"/api/uploads/{upload_id}/complete/").status_code, 404)
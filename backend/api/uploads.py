@@ -0,0 +1,248 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils.text import get_valid_filename
+
+logger = logging.getLogger(__name__)
+
+COPY_BUFFER = 1024 * 1024
+# Created in the session directory by the request completing the upload.
+COMPLETING_NAME = "completing"
+TARGETS = ("uploads", "project_video", "project_image")
+TARGET_EXTENSIONS = {
+    "project_video": (".mp4", ".webm", ".mov", ".m4v", ".ogv"),
+    "project_image": (".jpg", ".jpeg", ".png", ".webp", ".gif", ".avif"),
+}
+TARGET_UPLOAD_TO = {
+    "uploads": "uploads/",
+    "project_video": "projects/videos/",
+    "project_image": "projects/gallery/",
+}
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class AssembledFile(File):
+    """A finished upload on local disk; FileSystemStorage moves it instead of copying."""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def get_upload_temp_dir():
+    return Path(getattr(settings, "UPLOAD_TEMP_DIR", None) or Path(settings.BASE_DIR) / "upload_tmp")
+
+
+def session_dir(upload_id):
+    try:
+        upload_id = str(uuid.UUID(str(upload_id)))
+    except ValueError:
+        raise UploadError("Upload not found", 404)
+    return get_upload_temp_dir() / upload_id
+
+
+def chunk_path(directory, index):
+    return directory / f"{index:06d}.part"
+
+
+def load_manifest(upload_id, user_id=None):
+    """(session directory, manifest); with user_id, only for the user who started the upload."""
+    directory = session_dir(upload_id)
+    try:
+        with open(directory / "manifest.json", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise UploadError("Upload not found", 404)
+    if user_id is not None and manifest.get("user_id") not in (None, user_id):
+        raise UploadError("Upload belongs to another user", 403)
+    return directory, manifest
+
+
+def expected_chunk_size(manifest, index):
+    if index == manifest["total_chunks"] - 1:
+        return manifest["size"] - index * manifest["chunk_size"]
+    return manifest["chunk_size"]
+
+
+def received_chunks(directory, manifest):
+    return [i for i in range(manifest["total_chunks"]) if chunk_path(directory, i).exists()]
+
+
+def describe(upload_id, directory, manifest):
+    received = received_chunks(directory, manifest)
+    done = set(received)
+    return {
+        "id": upload_id,
+        "filename": manifest["filename"],
+        "size": manifest["size"],
+        "chunk_size": manifest["chunk_size"],
+        "total_chunks": manifest["total_chunks"],
+        "received": received,
+        "missing": [i for i in range(manifest["total_chunks"]) if i not in done],
+    }
+
+
+def create_upload(filename, size, target="uploads", project_id=None, sha256="", chunk_size=None, user_id=None):
+    filename = get_valid_filename(os.path.basename(filename or ""))
+    if not filename:
+        raise UploadError("filename is required")
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError("size must be an integer")
+    if size <= 0 or size > getattr(settings, "UPLOAD_MAX_BYTES", 2 * 1024 ** 3):
+        raise UploadError("size is out of range")
+    if target not in TARGETS:
+        raise UploadError(f"target must be one of {', '.join(TARGETS)}")
+    if target in TARGET_EXTENSIONS and not filename.lower().endswith(TARGET_EXTENSIONS[target]):
+        raise UploadError(f"File type not allowed for {target}")
+    if target != "uploads" and not project_id:
+        raise UploadError("project_id is required for this target")
+    max_chunk = getattr(settings, "UPLOAD_CHUNK_MAX_BYTES", 16 * 1024 ** 2)
+    try:
+        chunk_size = min(int(chunk_size or getattr(settings, "UPLOAD_CHUNK_SIZE", 5 * 1024 ** 2)), max_chunk)
+    except (TypeError, ValueError):
+        raise UploadError("chunk_size must be an integer")
+    if chunk_size <= 0:
+        raise UploadError("chunk_size must be positive")
+    manifest = {
+        "filename": filename,
+        "size": size,
+        "chunk_size": chunk_size,
+        "total_chunks": -(-size // chunk_size),
+        "sha256": (sha256 or "").lower(),
+        "target": target,
+        "project_id": project_id,
+        "user_id": user_id,
+        "created_at": time.time(),
+    }
+    upload_id = str(uuid.uuid4())
+    directory = session_dir(upload_id)
+    directory.mkdir(parents=True)
+    with open(directory / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    return describe(upload_id, directory, manifest)
+
+
+def write_chunk(upload_id, index, stream, checksum="", user_id=None):
+    """
+    Streams one chunk from the request body to disk while hashing it. The
+    chunk only becomes visible (and counts as received) once its size and
+    optional SHA-256 match, so a dropped connection just means a retry.
+    """
+    directory, manifest = load_manifest(upload_id, user_id)
+    if (directory / COMPLETING_NAME).exists():
+        raise UploadError("Upload is being completed", 409)
+    if not 0 <= index < manifest["total_chunks"]:
+        raise UploadError("Chunk index out of range")
+    expected = expected_chunk_size(manifest, index)
+    digest = hashlib.sha256()
+    written = 0
+    tmp = directory / f"{index:06d}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            while written <= expected:
+                block = stream.read(min(COPY_BUFFER, expected + 1 - written))
+                if not block:
+                    break
+                digest.update(block)
+                f.write(block)
+                written += len(block)
+        if written != expected:
+            raise UploadError(f"Chunk {index} must be {expected} bytes, got {written if written <= expected else 'more'}")
+        if checksum and digest.hexdigest() != checksum.lower():
+            raise UploadError(f"Checksum mismatch for chunk {index}", 422)
+        os.replace(tmp, chunk_path(directory, index))
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return describe(upload_id, directory, manifest)
+
+
+def assemble(directory, manifest):
+    """Concatenates the chunks into one file with a fixed-size copy buffer."""
+    digest = hashlib.sha256()
+    assembled = directory / "assembled"
+    with open(assembled, "wb") as out:
+        for index in range(manifest["total_chunks"]):
+            with open(chunk_path(directory, index), "rb") as part:
+                while True:
+                    block = part.read(COPY_BUFFER)
+                    if not block:
+                        break
+                    digest.update(block)
+                    out.write(block)
+    return assembled, digest.hexdigest()
+
+
+def claim_completion(directory):
+    """Creates the session's completing marker; only one caller can, the others get a 409."""
+    try:
+        os.close(os.open(directory / COMPLETING_NAME, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        raise UploadError("Upload is already being completed", 409)
+    except FileNotFoundError:
+        # Completed (and removed) by a concurrent request.
+        raise UploadError("Upload not found", 404)
+
+
+def complete_upload(upload_id, user_id=None):
+    """
+    Verifies and assembles the upload, stores it and returns (storage name,
+    manifest). Concurrent calls for one upload store it once.
+    """
+    directory, manifest = load_manifest(upload_id, user_id)
+    claim_completion(directory)
+    try:
+        missing = describe(upload_id, directory, manifest)["missing"]
+        if missing:
+            raise UploadError(f"Missing chunks: {missing[:20]}", 409)
+        assembled, sha256 = assemble(directory, manifest)
+        if manifest["sha256"] and sha256 != manifest["sha256"]:
+            raise UploadError("Checksum mismatch for the assembled file", 422)
+        name = TARGET_UPLOAD_TO[manifest["target"]] + manifest["filename"]
+        with open(assembled, "rb") as f:
+            stored = default_storage.save(name, AssembledFile(f, name=manifest["filename"]))
+    except BaseException:
+        # Let the client fix the upload and complete it again.
+        (directory / COMPLETING_NAME).unlink(missing_ok=True)
+        raise
+    shutil.rmtree(directory, ignore_errors=True)
+    manifest["sha256"] = sha256
+    return stored, manifest
+
+
+def abort_upload(upload_id, user_id=None):
+    directory, _ = load_manifest(upload_id, user_id)
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def expire_stale_uploads(max_age_hours=None):
+    """Removes sessions nobody has touched for UPLOAD_SESSION_TTL_HOURS."""
+    max_age_hours = max_age_hours or getattr(settings, "UPLOAD_SESSION_TTL_HOURS", 24)
+    root = get_upload_temp_dir()
+    if not root.exists():
+        return 0
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    for directory in root.iterdir():
+        if not directory.is_dir():
+            continue
+        last_touch = max((p.stat().st_mtime for p in directory.iterdir()), default=directory.stat().st_mtime)
+        if last_touch < cutoff:
+            shutil.rmtree(directory, ignore_errors=True)
+            removed += 1
+    return removed
@@ -3,11 +3,11 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     ProfileViewSet, SocialLinkViewSet, SkillViewSet, 
     ExperienceViewSet, EducationViewSet, ProjectViewSet, 
-    CertificateViewSet, MessageViewSet, SiteSettingsViewSet, HomeContentViewSet, AboutContentViewSet, ProjectCategoryViewSet, SubscriberViewSet, login_view, me_view, get_captcha_api_view, SkillCategoryViewSet, CertificateCategoryViewSet, WATemplateViewSet, BlockEntryViewSet, BlogCategoryViewSet, BlogPostViewSet, admin_login_view, admin_logout_view, monitor_dashboard_view, export_logs_view, upload_media_view,
+    CertificateViewSet, MessageViewSet, SiteSettingsViewSet, HomeContentViewSet, AboutContentViewSet, ProjectCategoryViewSet, SubscriberViewSet, login_view, me_view, get_captcha_api_view, SkillCategoryViewSet, CertificateCategoryViewSet, WATemplateViewSet, BlockEntryViewSet, BlogCategoryViewSet, BlogPostViewSet, admin_login_view, admin_logout_view, monitor_dashboard_view, monitor_range_view, top_talkers_view, block_talker_view, route_latency_view, metrics_view, export_logs_view, upload_media_view, chunked_upload_init_view, chunked_upload_detail_view, chunked_upload_chunk_view, chunked_upload_complete_view,
     admin_2fa_verify_view, admin_profile_view, admin_users_list_view, admin_create_view, admin_toggle_status_view, admin_delete_view, admin_reset_password_view, AIKeyViewSet, dashboard_stats_view
 )
 from .views import list_media_view
-from .ai_views import ai_write, ai_analyze_message, ai_chat, ai_seo, upload_ai_keys, list_ai_keys, test_ai_key, delete_ai_key, add_ai_key
+from .ai_views import ai_write, ai_write_stream, ai_analyze_message, ai_chat, ai_chat_stream, ai_seo, upload_ai_keys, list_ai_keys, test_ai_key, delete_ai_key, add_ai_key
 
 router = DefaultRouter()
 # Note: Profile and SiteSettings are treated as singletons in viewset, but routed normally
@@ -49,9 +49,18 @@ urlpatterns = [
     path('admin/users/delete/', admin_delete_view, name='admin_delete'),
     path('admin/users/reset-password/', admin_reset_password_view, name='admin_reset_password'),
     path('monitor/', monitor_dashboard_view, name='monitor_dashboard'),
+    path('monitor/range/', monitor_range_view, name='monitor_range'),
     path('monitor/export/', export_logs_view, name='monitor_export'),
+    path('monitor/top-talkers/', top_talkers_view, name='monitor_top_talkers'),
+    path('monitor/top-talkers/block/', block_talker_view, name='monitor_block_talker'),
+    path('monitor/latency/', route_latency_view, name='monitor_latency'),
+    path('metrics/', metrics_view, name='metrics'),
     path('dashboard/stats/', dashboard_stats_view, name='dashboard_stats'),
     path('upload/', upload_media_view, name='upload-media'),
+    path('uploads/', chunked_upload_init_view, name='chunked-upload-init'),
+    path('uploads/<uuid:upload_id>/', chunked_upload_detail_view, name='chunked-upload-detail'),
+    path('uploads/<uuid:upload_id>/chunks/<int:index>/', chunked_upload_chunk_view, name='chunked-upload-chunk'),
+    path('uploads/<uuid:upload_id>/complete/', chunked_upload_complete_view, name='chunked-upload-complete'),
     path('media/list/', list_media_view, name='list-media'),
     # AI Endpoints
     path('ai/keys/', list_ai_keys, name='ai-keys-list'),
@@ -59,8 +68,10 @@ urlpatterns = [
     path('ai/keys/add/', add_ai_key, name='ai-keys-add'),
     path('ai/keys/<int:key_id>/', delete_ai_key, name='ai-keys-delete'),
     path('ai/write/', ai_write, name='ai-write'),
+    path('ai/write/stream/', ai_write_stream, name='ai-write-stream'),
     path('ai/analyze-message/', ai_analyze_message, name='ai-analyze-message'),
     path('ai/chat/', ai_chat, name='ai-chat'),
+    path('ai/chat/stream/', ai_chat_stream, name='ai-chat-stream'),
     path('ai/seo/', ai_seo, name='ai-seo'),
     path('ai/upload-keys/', upload_ai_keys, name='ai-upload-keys'),
     path('', include(router.urls)),
@@ -1,5 +1,7 @@
 from deep_translator import GoogleTranslator
+from . import metrics
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -11,14 +13,19 @@ def translate_text(text, target_lang='en', source_lang='id'):
     if not text:
         return ""
         
+    started = time.monotonic()
     try:
         # Check if text is already in target language (basic check: skipped for now to ensure consistency)
         
         translator = GoogleTranslator(source=source_lang, target=target_lang)
         translated = translator.translate(text)
+        metrics.inc("translate_calls", {"outcome": "success"})
         
         return translated
     except Exception as e:
+        metrics.inc("translate_calls", {"outcome": "failure"})
         logger.error(f"Translation failed for text '{text[:20]}...': {str(e)}")
         # Fallback: Return original text if translation fails
         return text
+    finally:
+        metrics.observe("translate_duration_seconds", time.monotonic() - started)
@@ -9,22 +9,37 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.shortcuts import render, redirect
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.conf import settings
 from django.utils import timezone
 from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
 from django.core.signing import Signer
+from django.views.decorators.http import require_safe
+import hmac
+import io
 import json
 import traceback
 import os
-from django.db.models import Q
-from .models import Profile, HomeContent, AboutContent, SocialLink, Skill, Experience, Education, Project, Certificate, Message, SiteSettings, ProjectImage, ProjectCategory, Subscriber, SkillCategory, CertificateCategory, WATemplate, BlockEntry, BlogCategory, BlogPost
+from datetime import timezone as dt_timezone
+from django.db.models import Max, Q
+from .models import Profile, HomeContent, AboutContent, SocialLink, Skill, Experience, Education, Project, Certificate, Message, SiteSettings, ProjectImage, ProjectCategory, Subscriber, SkillCategory, CertificateCategory, WATemplate, BlockEntry, BlogCategory, BlogPost, MediaAsset
 from .serializers import (
     ProfileSerializer, SocialLinkSerializer, SkillSerializer, 
     ExperienceSerializer, EducationSerializer, ProjectSerializer, 
     CertificateSerializer, MessageSerializer, SiteSettingsSerializer, HomeContentSerializer, AboutContentSerializer, ProjectCategorySerializer, SubscriberSerializer, SkillCategorySerializer, CertificateCategorySerializer, WATemplateSerializer, BlockEntrySerializer, BlogCategorySerializer, BlogPostSerializer, AIKeySerializer
 )
 from .models import AIKey
+from .rollups import day_start, get_day_rollup, get_day_rollups, get_hourly_counts
+from .latency import route_latency_summary
+from .gallery import GalleryError, ingest_gallery, validate_gallery_uploads
+from .images import schedule_derivatives
+from .media_serving import serve_media
+from .storage import CAS_PREFIX
+from .uploads import UploadError, abort_upload, complete_upload, create_upload, describe as describe_upload, load_manifest, write_chunk
+from . import heavy_hitters, metrics
+from .middleware import invalidate_blocklist_cache
+from .analytics import device_stats, monthly_visitors, total_views, weekly_visitors
+from .log_store import date_range, export_log_stream, get_log_dir, iter_log_range, parse_log_filters, read_log_page
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -398,15 +413,24 @@ class ProjectViewSet(viewsets.ModelViewSet):
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     def perform_create(self, serializer):
+        self._validate_uploaded_images()
         project = serializer.save()
         self._handle_images(project)
         self._handle_summaries(project)
     
     def perform_update(self, serializer):
+        self._validate_uploaded_images()
         project = serializer.save()
         self._handle_images(project)
         self._handle_summaries(project)
 
+    def _validate_uploaded_images(self):
+        # Reject a bad gallery before the project is saved.
+        try:
+            validate_gallery_uploads(self.request.FILES.getlist('uploaded_images'))
+        except GalleryError as e:
+            raise ValidationError({'uploaded_images': str(e)})
+
     def _handle_summaries(self, project):
         data = self.request.data
         if 'summaries' in data:
@@ -430,26 +454,22 @@ class ProjectViewSet(viewsets.ModelViewSet):
                 print(f"Error handling summaries: {e}")
 
     def _handle_images(self, project):
-        # Handle uploaded images
-        if self.request.FILES:
-            images = self.request.FILES.getlist('uploaded_images')
-            for image in images:
-                ProjectImage.objects.create(project=project, image=image)
-        
-        # Handle image URLs (new feature)
+        # Uploaded files first, then image URLs, appended after the current
+        # gallery in one batch (api.gallery)
+        images = self.request.FILES.getlist('uploaded_images') if self.request.FILES else []
+        urls = []
         data = self.request.data
         if 'image_urls' in data:
             try:
                 urls = data['image_urls']
                 if isinstance(urls, str):
                     urls = json.loads(urls)
-                
-                if isinstance(urls, list):
-                    for url in urls:
-                        if url and isinstance(url, str):
-                            ProjectImage.objects.create(project=project, image_url=url)
+                if not isinstance(urls, list):
+                    urls = []
             except Exception as e:
+                urls = []
                 print(f"Error handling image URLs: {e}")
+        ingest_gallery(project, images, urls)
 
     @action(detail=True, methods=['post'])
     def delete_image(self, request, pk=None):
@@ -530,6 +550,18 @@ class BlockEntryViewSet(viewsets.ModelViewSet):
     serializer_class = BlockEntrySerializer
     permission_classes = [IsAdminUser]
 
+    def perform_create(self, serializer):
+        serializer.save()
+        invalidate_blocklist_cache()
+
+    def perform_update(self, serializer):
+        serializer.save()
+        invalidate_blocklist_cache()
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        invalidate_blocklist_cache()
+
 
 class BlogCategoryViewSet(viewsets.ModelViewSet):
     queryset = BlogCategory.objects.all().order_by("name")
@@ -570,98 +602,9 @@ class BlogPostViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-def read_log_file(date_str):
-    base_dir = settings.BASE_DIR
-    file_name = f"logs_{date_str}.json"
-    file_path = base_dir / file_name
-    if not os.path.exists(file_path):
-        return []
-    entries = []
-    with open(file_path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                entries.append(json.loads(line))
-            except Exception:
-                continue
-    return entries
-
-
-def filter_logs(entries, params):
-    domain = (params.get("domain") or "").strip().lower()
-    ip = (params.get("ip") or "").strip()
-    endpoint = (params.get("endpoint") or "").strip()
-    method = (params.get("method") or "").strip().upper()
-    status = (params.get("status") or "").strip()
-    blocked = params.get("blocked")
-    result = []
-    for entry in entries:
-        if domain and str(entry.get("origin", "")).lower().find(domain) == -1 and str(entry.get("host", "")).lower().find(domain) == -1:
-            continue
-        if ip and str(entry.get("ip", "")) != ip:
-            continue
-        if endpoint and str(entry.get("path", "")).find(endpoint) == -1:
-            continue
-        if method and str(entry.get("method", "")).upper() != method:
-            continue
-        if status:
-            try:
-                if int(entry.get("status_code", 0)) != int(status):
-                    continue
-            except Exception:
-                continue
-        if blocked is not None and blocked != "":
-            blocked_flag = str(blocked).lower() in ["1", "true", "yes"]
-            if bool(entry.get("blocked", False)) != blocked_flag:
-                continue
-        result.append(entry)
-    return result
-
-
-def paginate_list(items, page, page_size):
-    total = len(items)
-    if page_size <= 0:
-        page_size = 50
-    total_pages = (total + page_size - 1) // page_size
-    if page < 1:
-        page = 1
-    if total_pages > 0 and page > total_pages:
-        page = total_pages
-    start = (page - 1) * page_size
-    end = start + page_size
-    return items[start:end], total, total_pages
-
-
-def build_stats(entries):
-    per_hour = {}
-    for entry in entries:
-        ts = entry.get("timestamp")
-        if not ts:
-            continue
-        try:
-            dt = datetime_from_iso(ts)
-            key = dt.strftime("%H:00")
-        except Exception:
-            key = "unknown"
-        per_hour[key] = per_hour.get(key, 0) + 1
-    return per_hour
-
-
-def datetime_from_iso(value):
-    try:
-        if value.endswith("Z"):
-            value = value[:-1]
-        return timezone.datetime.fromisoformat(value)
-    except Exception:
-        return timezone.now()
-
-
 def get_available_log_dates():
-    base_dir = settings.BASE_DIR
     result = []
-    for name in os.listdir(base_dir):
+    for name in os.listdir(get_log_dir()):
         if name.startswith("logs_") and name.endswith(".json"):
             date_part = name[5:-5]
             result.append(date_part)
@@ -884,44 +827,20 @@ def dashboard_stats_view(request):
         messages_new = Message.objects.filter(createdAt__gte=last_month).count()
         subscribers_new = Subscriber.objects.filter(subscribedAt__gte=last_month).count()
         
-        # Mock Visitor Data (since we don't have a dedicated Analytics model yet)
-        # Ideally, we would fetch this from Google Analytics or a custom tracker
-        # We will generate "realistic" data based on log entries if possible, or return a structure
-        
-        # Use log files to estimate visitors? Too slow.
-        # Return static structure for charts, but with real counts
-        
+        views_total, views_change = total_views()
+
         stats = {
-            "totalViews": 12500, # Placeholder or sum of project views if we had it
-            "viewsChange": 12,
+            "totalViews": views_total,
+            "viewsChange": views_change,
             "totalMessages": total_messages,
             "messagesChange": messages_new,
             "totalProjects": total_projects,
             "projectsChange": projects_new,
             "totalSubscribers": total_subscribers,
             "subscribersChange": subscribers_new,
-            "weeklyVisitors": [
-                { "day": 'Mon', "visitors": 1200, "pageViews": 1800 },
-                { "day": 'Tue', "visitors": 980, "pageViews": 1500 },
-                { "day": 'Wed', "visitors": 1500, "pageViews": 2200 },
-                { "day": 'Thu', "visitors": 1100, "pageViews": 1700 },
-                { "day": 'Fri', "visitors": 1600, "pageViews": 2400 },
-                { "day": 'Sat', "visitors": 900, "pageViews": 1300 },
-                { "day": 'Sun', "visitors": 800, "pageViews": 1200 },
-            ],
-            "monthlyVisitors": [
-                { "month": 'Jan', "visitors": 8500, "pageViews": 12000 },
-                { "month": 'Feb', "visitors": 7800, "pageViews": 11000 },
-                { "month": 'Mar', "visitors": 9200, "pageViews": 13500 },
-                { "month": 'Apr', "visitors": 8800, "pageViews": 12800 },
-                { "month": 'May', "visitors": 10000, "pageViews": 15000 },
-                { "month": 'Jun', "visitors": 9500, "pageViews": 14200 },
-            ],
-            "deviceStats": [
-                { "name": 'Desktop', "value": 62, "color": '#6366F1' },
-                { "name": 'Mobile', "value": 28, "color": '#22C55E' },
-                { "name": 'Tablet', "value": 10, "color": '#F59E0B' },
-            ],
+            "weeklyVisitors": weekly_visitors(),
+            "monthlyVisitors": monthly_visitors(),
+            "deviceStats": device_stats(),
         }
         return Response(stats)
     except Exception as e:
@@ -1002,6 +921,15 @@ def monitor_dashboard_view(request):
     if not request.user.is_staff:
         return Response({"detail": "Forbidden"}, status=403)
     params = request.GET
+    try:
+        page = int(params.get("page", "1"))
+    except Exception:
+        page = 1
+    page_size = 20
+    filters = parse_log_filters(params)
+    dates = get_requested_date_range(params)
+    if dates:
+        return monitor_range_response(request, dates, page, page_size, filters)
     date_str = params.get("date")
     if not date_str:
         dates = get_available_log_dates()
@@ -1009,52 +937,243 @@ def monitor_dashboard_view(request):
             date_str = dates[0]
         else:
             date_str = timezone.now().date().isoformat()
-    entries = read_log_file(date_str)
-    entries = filter_logs(entries, params)
-    success_count = 0
-    error_count = 0
-    for entry in entries:
-        try:
-            code = int(entry.get("status_code", 0))
-        except Exception:
-            continue
-        if code < 400:
-            success_count += 1
-        else:
-            error_count += 1
-    try:
-        page = int(params.get("page", "1"))
-    except Exception:
-        page = 1
-    page_size = 20
-    page_items, total, total_pages = paginate_list(entries, page, page_size)
-    stats_per_hour = build_stats(entries)
+    # Unfiltered stats come from the write-time rollups; only filtered views
+    # (or days recorded before rollups existed) need a pass over the file.
+    # Rollups count every request while the file keeps each IP's first
+    # request of the day, so the figures are taken from one source only and
+    # count_source tells the template which ("requests" or "log entries").
+    day_rollup = None if filters else get_day_rollup(date_str)
+    result = read_log_page(date_str, page, page_size, filters, collect_stats=day_rollup is None)
+    page = result["page"]
+    if day_rollup is not None:
+        total = day_rollup.requests
+        success_count = day_rollup.status_2xx + day_rollup.status_3xx
+        error_count = day_rollup.status_4xx + day_rollup.status_5xx
+        stats_per_hour = get_hourly_counts(date_str)
+    else:
+        total = result["total"]
+        success_count = result["scan"].success_count
+        error_count = result["scan"].error_count
+        stats_per_hour = result["scan"].per_hour
     block_entries = BlockEntry.objects.filter(is_active=True).order_by("-created_at")
     context = {
         "date": date_str,
         "available_dates": get_available_log_dates(),
-        "logs": page_items,
+        "logs": result["items"],
         "total": total,
+        "logged_total": result["total"],
+        "count_source": "requests" if day_rollup is not None else "log entries",
         "success_count": success_count,
         "error_count": error_count,
         "page": page,
-        "total_pages": total_pages,
+        "total_pages": result["total_pages"],
         "stats_per_hour": stats_per_hour,
         "block_entries": block_entries,
+        "top_talkers": heavy_hitters.tracker.snapshot(),
+        "route_latency": latency_for_days(date_str, date_str),
         "params": params,
     }
     return render(request, "api/monitor_dashboard.html", context)
 
 
+def get_requested_date_range(params):
+    date_from = (params.get("date_from") or "").strip()
+    date_to = (params.get("date_to") or "").strip()
+    if not date_from and not date_to:
+        return None
+    today = timezone.now().date().isoformat()
+    try:
+        return date_range(date_from or date_to, date_to or today)
+    except ValueError:
+        return None
+
+
+def latency_for_days(first_date, last_date):
+    try:
+        start = day_start(timezone.datetime.fromisoformat(first_date).date())
+        end = day_start(timezone.datetime.fromisoformat(last_date).date()) + timezone.timedelta(days=1)
+    except ValueError:
+        return []
+    return route_latency_summary(start, end)
+
+
+def monitor_range_response(request, dates, page, page_size, filters):
+    day_rollups = {} if filters else get_day_rollups(dates)
+    use_rollups = bool(dates) and len(day_rollups) == len(dates)
+    events = {}
+    for event in iter_log_range(dates, page, page_size, filters, collect_stats=not use_rollups):
+        events[event["event"]] = event
+    summary = events["summary"]
+    if use_rollups:
+        # One source for every figure, as in monitor_dashboard_view.
+        total = sum(r.requests for r in day_rollups.values())
+        success_count = sum(r.status_2xx + r.status_3xx for r in day_rollups.values())
+        error_count = sum(r.status_4xx + r.status_5xx for r in day_rollups.values())
+        per_hour = get_hourly_counts(dates[0], dates[-1])
+        per_day = {date: day_rollups[date].requests for date in dates}
+    else:
+        total = summary["total"]
+        success_count = summary["success_count"]
+        error_count = summary["error_count"]
+        per_hour = summary["per_hour"]
+        per_day = summary["per_day"]
+    context = {
+        "date": dates[-1],
+        "date_from": dates[0],
+        "date_to": dates[-1],
+        "available_dates": get_available_log_dates(),
+        "logs": events["page"]["items"],
+        "total": total,
+        "logged_total": summary["total"],
+        "count_source": "requests" if use_rollups else "log entries",
+        "success_count": success_count,
+        "error_count": error_count,
+        "page": summary["page"],
+        "total_pages": summary["total_pages"],
+        "stats_per_hour": per_hour,
+        "stats_per_day": per_day,
+        "block_entries": BlockEntry.objects.filter(is_active=True).order_by("-created_at"),
+        "top_talkers": heavy_hitters.tracker.snapshot(),
+        "route_latency": latency_for_days(dates[0], dates[-1]),
+        "params": request.GET,
+    }
+    return render(request, "api/monitor_dashboard.html", context)
+
+
+@login_required(login_url="/api/admin/login/")
+def monitor_range_view(request):
+    """
+    NDJSON stream for date_from/date_to queries: the page line is sent as soon
+    as it is known, the summary line once every day has been scanned.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({"detail": "Forbidden"}, status=403)
+    params = request.GET
+    dates = get_requested_date_range(params)
+    if not dates:
+        return JsonResponse({"detail": "date_from or date_to is required"}, status=400)
+    try:
+        page = int(params.get("page", "1"))
+    except Exception:
+        page = 1
+    try:
+        page_size = min(max(int(params.get("page_size", "20")), 1), 200)
+    except Exception:
+        page_size = 20
+    events = iter_log_range(dates, page, page_size, parse_log_filters(params))
+    stream = (json.dumps(event, ensure_ascii=False) + "\n" for event in events)
+    return StreamingHttpResponse(stream, content_type="application/x-ndjson")
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def top_talkers_view(request):
+    try:
+        limit = min(max(int(request.query_params.get("limit", "10")), 1), 50)
+    except Exception:
+        limit = 10
+    return Response(heavy_hitters.tracker.snapshot(limit))
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def route_latency_view(request):
+    """
+    Latency percentiles per route for a day range (date, or date_from/date_to).
+    `since` (ISO datetime) narrows the window, e.g. to the hours after a deploy.
+    """
+    params = request.query_params
+    dates = get_requested_date_range(params)
+    if not dates:
+        dates = [params.get("date") or timezone.now().date().isoformat()]
+    since = params.get("since")
+    if since:
+        try:
+            since = timezone.datetime.fromisoformat(since.replace("Z", "+00:00"))
+        except ValueError:
+            return Response({"detail": "Invalid since"}, status=400)
+        if timezone.is_naive(since):
+            since = since.replace(tzinfo=dt_timezone.utc)
+        routes = route_latency_summary(since.replace(minute=0, second=0, microsecond=0), timezone.now() + timezone.timedelta(hours=1))
+    else:
+        routes = latency_for_days(dates[0], dates[-1])
+    return Response({"date_from": dates[0], "date_to": dates[-1], "routes": routes})
+
+
+def metrics_request_allowed(request):
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated and user.is_staff:
+        return True
+    scheme, _, credential = request.META.get("HTTP_AUTHORIZATION", "").partition(" ")
+    credential = credential.strip()
+    if not credential:
+        return False
+    metrics_token = getattr(settings, "METRICS_TOKEN", "")
+    if scheme.lower() == "bearer" and metrics_token:
+        return hmac.compare_digest(credential, metrics_token)
+    if scheme.lower() == "token":
+        return Token.objects.filter(key=credential, user__is_staff=True, user__is_active=True).exists()
+    return False
+
+
+def metrics_view(request):
+    """
+    OpenMetrics exposition for Prometheus. Scrapers authenticate with
+    `Authorization: Bearer <METRICS_TOKEN>`; staff can use their session or
+    API token.
+    """
+    if not metrics_request_allowed(request):
+        return HttpResponse("Unauthorized\n", status=401, content_type="text/plain")
+    return HttpResponse(metrics.render_openmetrics(), content_type=metrics.CONTENT_TYPE)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def block_talker_view(request):
+    """Promotes a top talker (IP or origin domain) into an active BlockEntry."""
+    data = {
+        "type": request.data.get("type"),
+        "value": request.data.get("value"),
+        "reason": request.data.get("reason") or "Top talker (monitor)",
+        "is_active": True,
+    }
+    serializer = BlockEntrySerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    entry = BlockEntry.objects.filter(type=serializer.validated_data["type"], value=serializer.validated_data["value"]).first()
+    if entry:
+        entry.is_active = True
+        entry.save()
+    else:
+        entry = serializer.save()
+    invalidate_blocklist_cache()
+    return Response(BlockEntrySerializer(entry).data, status=201)
+
+
 @login_required(login_url="/api/admin/login/")
 def export_logs_view(request):
     if not request.user.is_staff:
-        return Response({"detail": "Forbidden"}, status=403)
-    date_str = request.GET.get("date") or timezone.now().date().isoformat()
-    entries = read_log_file(date_str)
-    file_name = f"logs_{date_str}.json"
-    data = "\n".join(json.dumps(entry, ensure_ascii=False) for entry in entries)
-    response = Response(data, content_type="application/json")
+        return JsonResponse({"detail": "Forbidden"}, status=403)
+    params = request.GET
+    dates = get_requested_date_range(params)
+    if dates:
+        file_stem = f"logs_{dates[0]}_to_{dates[-1]}"
+    else:
+        date_str = params.get("date") or timezone.now().date().isoformat()
+        dates = [date_str]
+        file_stem = f"logs_{date_str}"
+    fmt = (params.get("format") or "ndjson").lower()
+    if fmt not in ("ndjson", "json", "csv"):
+        return JsonResponse({"detail": "format must be ndjson or csv"}, status=400)
+    compress = str(params.get("gzip", "")).lower() in ["1", "true", "yes"]
+
+    stream = export_log_stream(dates, parse_log_filters(params), "csv" if fmt == "csv" else "ndjson", compress)
+    if fmt == "csv":
+        file_name, content_type = f"{file_stem}.csv", "text/csv"
+    else:
+        file_name, content_type = f"{file_stem}.json", "application/x-ndjson"
+    if compress:
+        file_name, content_type = f"{file_name}.gz", "application/gzip"
+    response = StreamingHttpResponse(stream, content_type=content_type)
     response["Content-Disposition"] = f'attachment; filename="{file_name}"'
     return response
 
@@ -1066,8 +1185,9 @@ def upload_media_view(request):
         return Response({'error': 'No file provided'}, status=400)
     
     file = request.FILES['file']
-    # Use default storage to save file
-    file_name = default_storage.save(f'uploads/{file.name}', ContentFile(file.read()))
+    # Use default storage to save file (streams the upload in chunks)
+    file_name = default_storage.save(f'uploads/{file.name}', file)
+    schedule_derivatives(file_name)
     
     # Generate full URL
     relative_url = default_storage.url(file_name)
@@ -1076,11 +1196,116 @@ def upload_media_view(request):
     return Response({'url': full_url})
 
 
+@require_safe
+def media_view(request, path):
+    if path.startswith(CAS_PREFIX):
+        cache_control = getattr(settings, "MEDIA_IMMUTABLE_CACHE_CONTROL", "public, max-age=31536000, immutable")
+    else:
+        cache_control = getattr(settings, "MEDIA_CACHE_CONTROL", "public, max-age=3600")
+    return serve_media(request, path, cache_control)
+
+
+def attach_upload(stored_name, manifest):
+    target = manifest["target"]
+    if target == "project_video":
+        project = Project.objects.get(pk=manifest["project_id"])
+        project.video_file.name = stored_name
+        project.save()
+        return {"project_id": project.id}
+    if target == "project_image":
+        project = Project.objects.get(pk=manifest["project_id"])
+        last = project.images.aggregate(last=Max("order"))["last"]
+        image = ProjectImage.objects.create(project=project, image=stored_name, order=0 if last is None else last + 1)
+        return {"project_id": project.id, "image_id": image.id}
+    schedule_derivatives(stored_name)
+    return {}
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def chunked_upload_init_view(request):
+    """
+    Starts a resumable upload: POST {filename, size, sha256?, chunk_size?,
+    target: uploads|project_video|project_image, project_id?}, then PUT each
+    chunk to chunks/<n>/ and POST complete/. GET the upload to resume.
+    """
+    data = request.data
+    target = data.get("target") or "uploads"
+    project_id = data.get("project_id")
+    if project_id not in (None, ""):
+        try:
+            project_id = int(project_id)
+        except (TypeError, ValueError):
+            return Response({"error": "project_id must be an integer"}, status=400)
+    if target != "uploads" and project_id and not Project.objects.filter(pk=project_id).exists():
+        return Response({"error": "Project not found"}, status=404)
+    try:
+        upload = create_upload(
+            data.get("filename"), data.get("size"), target=target, project_id=project_id,
+            sha256=data.get("sha256", ""), chunk_size=data.get("chunk_size"), user_id=request.user.id,
+        )
+    except UploadError as e:
+        return Response({"error": str(e)}, status=e.status)
+    return Response(upload, status=201)
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def chunked_upload_detail_view(request, upload_id):
+    try:
+        if request.method == 'DELETE':
+            abort_upload(upload_id, request.user.id)
+            return Response(status=204)
+        directory, manifest = load_manifest(upload_id, request.user.id)
+    except UploadError as e:
+        return Response({"error": str(e)}, status=e.status)
+    return Response(describe_upload(str(upload_id), directory, manifest))
+
+
+@api_view(['PUT'])
+@permission_classes([IsAdminUser])
+def chunked_upload_chunk_view(request, upload_id, index):
+    # Read the raw body as a stream; touching request.data would buffer it.
+    stream = request.stream or io.BytesIO()
+    try:
+        upload = write_chunk(upload_id, index, stream, request.headers.get("X-Chunk-Sha256", ""), request.user.id)
+    except UploadError as e:
+        return Response({"error": str(e)}, status=e.status)
+    return Response(upload)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def chunked_upload_complete_view(request, upload_id):
+    try:
+        stored_name, manifest = complete_upload(upload_id, request.user.id)
+    except UploadError as e:
+        return Response({"error": str(e)}, status=e.status)
+    try:
+        attached = attach_upload(stored_name, manifest)
+    except Project.DoesNotExist:
+        return Response({"error": "Project not found", "path": stored_name}, status=404)
+    return Response({
+        "path": stored_name,
+        "url": request.build_absolute_uri(default_storage.url(stored_name)),
+        "size": manifest["size"],
+        "sha256": manifest["sha256"],
+        **attached,
+    })
+
+
 class AIKeyViewSet(viewsets.ModelViewSet):
     queryset = AIKey.objects.all().order_by("-created_at")
     serializer_class = AIKeySerializer
     permission_classes = [IsAdminUser]
 
+    def perform_update(self, serializer):
+        # Counters and cooldowns are written by the gateway meanwhile; save only the edited fields.
+        instance = serializer.instance
+        for attr, value in serializer.validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=list(serializer.validated_data))
+
     @action(detail=False, methods=['get'])
     def active_keys(self, request):
         # Return all active keys so frontend can perform failover
@@ -1120,48 +1345,58 @@ class AIKeyViewSet(viewsets.ModelViewSet):
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def list_media_view(request):
-    media_root = settings.MEDIA_ROOT
-    files_list = []
-    
-    if not os.path.exists(media_root):
-         return Response([])
-
-    # Walk through the media directory
-    for root, dirs, files in os.walk(media_root):
-        for file in files:
-            # Get relative path from MEDIA_ROOT
-            full_path = os.path.join(root, file)
-            relative_path = os.path.relpath(full_path, media_root)
-            
-            # Convert Windows path separators to forward slashes for URL
-            url_path = relative_path.replace('\\', '/')
-            
-            # Construct URL - ensure MEDIA_URL is used correctly
-            # settings.MEDIA_URL usually is '/media/'
-            media_url = settings.MEDIA_URL.rstrip('/')
-            url = f"{media_url}/{url_path}"
-            full_url = request.build_absolute_uri(url)
-            
-            # Get file stats
-            try:
-                stats = os.stat(full_path)
-                size = stats.st_size
-                modified = stats.st_mtime
-            except:
-                size = 0
-                modified = 0
-            
-            files_list.append({
-                'name': file,
-                'path': relative_path,
-                'url': full_url,
-                'size': size,
-                'modified': modified,
-                'type': 'image' if file.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp', '.svg')) else 'file'
-            })
-            
-    # Sort by modified date desc
-    files_list.sort(key=lambda x: x['modified'], reverse=True)
-    
-    return Response(files_list)
+    """
+    Paginated media library from the MediaAsset index (newest first).
+    Filters: type (image/video/audio/document/file), folder, prefix (name
+    starts with), date_from / date_to (YYYY-MM-DD, by modification date).
+    """
+    params = request.query_params
+    assets = MediaAsset.objects.all()
+    if params.get('type'):
+        assets = assets.filter(kind=params['type'])
+    if params.get('folder'):
+        assets = assets.filter(folder=params['folder'].strip('/'))
+    if params.get('prefix'):
+        assets = assets.filter(name__startswith=params['prefix'])
+    try:
+        if params.get('date_from'):
+            assets = assets.filter(modified_at__gte=day_start(timezone.datetime.strptime(params['date_from'], '%Y-%m-%d').date()))
+        if params.get('date_to'):
+            date_to = timezone.datetime.strptime(params['date_to'], '%Y-%m-%d').date()
+            assets = assets.filter(modified_at__lt=day_start(date_to + timezone.timedelta(days=1)))
+    except ValueError:
+        return Response({'error': 'Invalid date format, expected YYYY-MM-DD'}, status=400)
+
+    try:
+        page = max(int(params.get('page', '1')), 1)
+    except ValueError:
+        page = 1
+    try:
+        page_size = min(max(int(params.get('page_size', '50')), 1), 200)
+    except ValueError:
+        page_size = 50
+    count = assets.count()
+    offset = (page - 1) * page_size
+    results = []
+    for asset in assets[offset:offset + page_size]:
+        results.append({
+            'name': asset.name,
+            'path': asset.path,
+            'folder': asset.folder,
+            'url': request.build_absolute_uri(default_storage.url(asset.path)),
+            'size': asset.size,
+            'modified': asset.modified_at.timestamp(),
+            'type': asset.kind,
+            'mime_type': asset.mime_type,
+            'width': asset.width,
+            'height': asset.height,
+            'owners': asset.owners,
+        })
+    return Response({
+        'results': results,
+        'count': count,
+        'page': page,
+        'page_size': page_size,
+        'total_pages': max(-(-count // page_size), 1),
+    })
 
@@ -2,6 +2,11 @@
 ASGI config for portfolio_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server, e.g. ``uvicorn portfolio_backend.asgi:application``
+(or gunicorn with ``-k uvicorn.workers.UvicornWorker``), so the async AI views
+wait on the providers without holding a worker. Here the event loop outlives
+the requests, so the AI gateway keeps one pooled HTTP client, closed at
+lifespan shutdown.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
@@ -13,4 +18,21 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'portfolio_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from api import ai_gateway  # noqa: E402  (needs the app registry)
+
+ai_gateway.pool_clients = True
+
+
+async def application(scope, receive, send):
+    if scope['type'] != 'lifespan':
+        return await django_application(scope, receive, send)
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await ai_gateway.close_clients()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
 import os
+import tempfile
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -185,6 +186,141 @@ MEDIA_URL = '/media/'
 # Standard MEDIA_ROOT configuration
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads are stored content-addressed under media/cas/ and deduplicated
+# (api.storage). cas/ URLs never change content, so they are served with
+# MEDIA_IMMUTABLE_CACHE_CONTROL; mirror that header in the front proxy.
+STORAGES = {
+    "default": {"BACKEND": "api.storage.ContentAddressedStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+MEDIA_IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+MEDIA_CACHE_CONTROL = "public, max-age=3600"
+# Let the front server send media bodies (api.media_serving): "x-sendfile"
+# (Apache mod_xsendfile, lighttpd) or "x-accel-redirect" (nginx, with an
+# internal location at MEDIA_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT).
+MEDIA_SENDFILE_BACKEND = os.getenv('MEDIA_SENDFILE_BACKEND') or None
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv('MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+
+# CDN rewriting (api.cdn) is on when SiteSettings.cdn_url is set. Absolute
+# media URLs in content are only rewritten for the request host and these.
+CDN_ORIGIN_HOSTS = []
+CDN_CONTENT_CACHE_SECONDS = 3600
+
+# Daily API access logs (logs_<date>.json + logs_<date>.idx offset index)
+API_LOG_DIR = os.getenv('API_LOG_DIR', BASE_DIR)
+
+# Process pool size for multi-day monitor queries (defaults to min(4, CPUs))
+LOG_SCAN_WORKERS = None
+
+# Write-time traffic rollups (api.rollups)
+ROLLUP_FLUSH_SECONDS = 10
+ROLLUP_MINUTE_RETENTION_HOURS = 48
+
+# Visitor analytics sketches (api.analytics)
+ANALYTICS_FLUSH_SECONDS = 30
+
+# Counters per top-talker summary (api.heavy_hitters)
+HEAVY_HITTER_CAPACITY = 64
+
+# Per-route latency histograms (api.latency)
+LATENCY_FLUSH_SECONDS = 30
+LATENCY_RETENTION_DAYS = 30
+
+# Responsive image derivatives (api.images); AVIF is added when Pillow supports it
+IMAGE_DERIVATIVE_WIDTHS = (320, 640, 960, 1280, 1920)
+IMAGE_WORKERS = 2
+# Threads that validate and store a multi-file gallery upload (api.gallery)
+GALLERY_INGEST_WORKERS = 4
+
+# Local copies of third-party images (api.image_proxy); subdomains of an
+# allowed host are allowed too. Off unless opted in, so dev, tests and
+# snapshot builds make no outbound fetches
+IMAGE_PROXY_ENABLED = os.getenv('IMAGE_PROXY_ENABLED', 'False') == 'True'
+IMAGE_PROXY_ALLOWED_HOSTS = ['unsplash.com', 'picsum.photos']
+IMAGE_PROXY_WORKERS = 4
+IMAGE_PROXY_QUEUE_LIMIT = 100
+IMAGE_PROXY_TIMEOUT = 10
+IMAGE_PROXY_MAX_BYTES = 15 * 1024 * 1024
+IMAGE_PROXY_RETRY_SECONDS = 3600
+
+# Resumable chunked uploads (api.uploads)
+UPLOAD_TEMP_DIR = os.getenv('UPLOAD_TEMP_DIR', os.path.join(BASE_DIR, 'upload_tmp'))
+UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+UPLOAD_CHUNK_MAX_BYTES = 16 * 1024 * 1024
+UPLOAD_MAX_BYTES = 2 * 1024 * 1024 * 1024
+UPLOAD_SESSION_TTL_HOURS = 24
+
+# Periodic maintenance jobs (api.jobs: block expiry, stale uploads, AI key
+# sync and usage flush, media GC, snapshot rebuilds) run on a thread in each
+# web process when SCHEDULER_ENABLED is set. Otherwise run them from cron
+# with `manage.py run_jobs --once [--only JOB]`. Jobs that touch shared
+# state (GC, snapshots, uploads, image proxy retries) take a file lock in
+# SCHEDULER_LOCK_DIR so one process runs them at a time; the lock is per
+# host, so with several hosts enable the scheduler on one of them only.
+SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'False') == 'True'
+SCHEDULER_LOCK_DIR = os.getenv('SCHEDULER_LOCK_DIR') or None
+
+# Unreferenced media collection (api.media_gc, manage.py gc_media). The
+# scheduled run is off unless MEDIA_GC_INTERVAL_HOURS is set; MEDIA_GC_MODE
+# is "quarantine" (move to media/.quarantine/) or "delete".
+MEDIA_GC_INTERVAL_HOURS = int(os.getenv('MEDIA_GC_INTERVAL_HOURS', '0'))
+MEDIA_GC_MODE = os.getenv('MEDIA_GC_MODE', 'quarantine')
+MEDIA_GC_MIN_AGE_HOURS = 24
+
+# AI providers (api.ai_gateway). The admin AI endpoints are async views;
+# served through asgi.py one process holds AI_MAX_CONNECTIONS in-flight
+# provider calls. Point the base URLs at `manage.py mock_ai_provider` to test.
+AI_GEMINI_BASE_URL = os.getenv('AI_GEMINI_BASE_URL', 'https://generativelanguage.googleapis.com/v1beta')
+AI_GROQ_BASE_URL = os.getenv('AI_GROQ_BASE_URL', 'https://api.groq.com/openai/v1')
+AI_REQUEST_TIMEOUT = 60
+AI_MAX_CONNECTIONS = 500
+# Key pool (api.ai_keys): a key's circuit breaker opens on 429 (for
+# Retry-After or AI_KEY_COOLDOWN_SECONDS, doubling), on 401/403 and after
+# AI_KEY_FAILURE_THRESHOLD other errors in a row. Key health is written to
+# the database and the keys reloaded every AI_KEY_SYNC_SECONDS.
+AI_KEY_SYNC_SECONDS = 15
+AI_KEY_FAILURE_THRESHOLD = 3
+AI_KEY_COOLDOWN_SECONDS = 30
+AI_KEY_MAX_COOLDOWN_SECONDS = 3600
+# Per-key call counts, tokens and latency are buffered in memory and added
+# to the AIKey rows by the first call after AI_USAGE_FLUSH_SECONDS, and at
+# exit (api.ai_usage).
+AI_USAGE_FLUSH_SECONDS = 10
+# Answers of deterministic AI tasks are kept for their TTL (seconds; tasks
+# not listed are never cached), up to AI_CACHE_MAX_ENTRIES least recently
+# used rows (api.ai_cache). Requests with "refresh": true skip the lookup.
+AI_CACHE_ENABLED = os.getenv('AI_CACHE_ENABLED', 'True') == 'True'
+AI_CACHE_MAX_ENTRIES = 5000
+AI_CACHE_TTLS = {
+    "seo": 7 * 24 * 3600,
+    "inbox": 30 * 24 * 3600,
+    "write:excerpt": 24 * 3600,
+    "write:project_description": 24 * 3600,
+}
+
+# Static JSON copy of the public API for CDN hosting (api.snapshots,
+# manage.py export_snapshots). Setting SNAPSHOT_DIR also rebuilds the files
+# touched by content saves every SNAPSHOT_DEBOUNCE_SECONDS. Absolute URLs in
+# the files are built against SNAPSHOT_BASE_URL.
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', '')
+SNAPSHOT_BASE_URL = os.getenv('SNAPSHOT_BASE_URL', 'http://localhost:8000')
+SNAPSHOT_DEBOUNCE_SECONDS = 10
+
+# Automatic blocking of repeat rate-limit offenders (api.abuse)
+ABUSE_SCORE_THRESHOLD = 50
+ABUSE_HALF_LIFE_SECONDS = 600
+ABUSE_MAX_TRACKED_IPS = 10000
+ABUSE_BLOCK_SECONDS = 3600
+ABUSE_SWEEP_SECONDS = 60
+
+# Background log writer (api.log_store.LogWriter); 0 writes inline
+API_LOG_QUEUE_SIZE = 10000
+
+# /api/metrics/ exposition (api.metrics); one snapshot file per worker process
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'portfolio-metrics'))
+METRICS_WRITE_SECONDS = 5
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 
 
 REST_FRAMEWORK = {
@@ -15,15 +15,19 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
 from django.shortcuts import redirect
+from api.views import media_view
 
 urlpatterns = [
     path('superuser/', admin.site.urls),
     path('api/', include('api.urls')),
 ]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Media is served by api.media_serving (ranges, ETags, X-Sendfile /
+# X-Accel-Redirect offload) in every environment, not only with DEBUG.
+urlpatterns += [
+    re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), media_view, name='media'),
+]
 
@@ -29,8 +29,15 @@ export function FloatingAssistant() {
   const [inputValue, setInputValue] = useState('');
   const [isLoading, setIsLoading] = useState(false);
   const scrollRef = useRef<HTMLDivElement>(null);
+  const abortRef = useRef<AbortController | null>(null);
   const location = useLocation();
 
+  // Stop a running answer when the assistant closes or unmounts
+  useEffect(() => {
+    if (!isOpen) abortRef.current?.abort();
+  }, [isOpen]);
+  useEffect(() => () => abortRef.current?.abort(), []);
+
   // Scroll to bottom on new message
   useEffect(() => {
     if (scrollRef.current) {
@@ -52,29 +59,30 @@ export function FloatingAssistant() {
     setMessages(prev => [...prev, userMessage]);
     setInputValue('');
     setIsLoading(true);
+    const aiMessageId = (Date.now() + 1).toString();
 
     try {
       // Get current page context
       const context = `Current Page: ${location.pathname}`;
-      const response = await aiService.chat(userMessage.content, context);
-      
-      const aiMessage: Message = {
-        id: (Date.now() + 1).toString(),
-        role: 'assistant',
-        content: response,
-        timestamp: new Date()
-      };
-      
-      setMessages(prev => [...prev, aiMessage]);
+      setMessages(prev => [...prev, { id: aiMessageId, role: 'assistant', content: '', timestamp: new Date() }]);
+      abortRef.current = new AbortController();
+      await aiService.streamChat(
+        userMessage.content,
+        (text) => setMessages(prev => prev.map(m => (m.id === aiMessageId ? { ...m, content: m.content + text } : m))),
+        context,
+        abortRef.current.signal
+      );
     } catch (error) {
+      if (error instanceof DOMException && error.name === 'AbortError') return;
       console.error('AI Chat Error:', error);
       const errorMessage: Message = {
-        id: (Date.now() + 1).toString(),
+        id: (Date.now() + 2).toString(),
         role: 'assistant',
         content: 'Sorry, I encountered an error connecting to the AI service. Please check your API keys or try again later.',
         timestamp: new Date()
       };
-      setMessages(prev => [...prev, errorMessage]);
+      // Drop the streaming placeholder if nothing arrived
+      setMessages(prev => [...prev.filter(m => m.id !== aiMessageId || m.content), errorMessage]);
     } finally {
       setIsLoading(false);
     }
@@ -70,7 +70,7 @@ const AIKeys = () => {
             await updateAIKey({ id: editingKey.id, data: editingKey });
             toast.success('API Key updated successfully');
         } else {
-            await createAIKey(editingKey as Omit<AIKey, 'id' | 'created_at' | 'last_used' | 'error_count'>);
+            await createAIKey(editingKey as Omit<AIKey, 'id' | 'created_at' | 'last_used' | 'error_count' | 'success_count' | 'token_count' | 'average_latency' | 'cooldown_until'>);
             toast.success('API Key added successfully');
         }
         setDialogOpen(false);
@@ -179,12 +179,30 @@ const AIKeys = () => {
                             {key.is_active ? "Active" : "Inactive"}
                         </Badge>
                     </div>
+                    <div className="flex justify-between text-sm">
+                        <span className="text-muted-foreground">Calls</span>
+                        <span>{key.success_count ?? 0}</span>
+                    </div>
                     <div className="flex justify-between text-sm">
                         <span className="text-muted-foreground">Errors</span>
                         <span className={key.error_count > 0 ? "text-destructive" : "text-muted-foreground"}>
                             {key.error_count}
                         </span>
                     </div>
+                    <div className="flex justify-between text-sm">
+                        <span className="text-muted-foreground">Tokens</span>
+                        <span>{(key.token_count ?? 0).toLocaleString()}</span>
+                    </div>
+                    <div className="flex justify-between text-sm">
+                        <span className="text-muted-foreground">Avg. Latency</span>
+                        <span>{key.average_latency != null ? `${key.average_latency.toFixed(2)}s` : '-'}</span>
+                    </div>
+                    {key.cooldown_until && new Date(key.cooldown_until) > new Date() && (
+                        <div className="flex justify-between text-sm">
+                            <span className="text-muted-foreground">Cooling Down Until</span>
+                            <span className="text-destructive">{new Date(key.cooldown_until).toLocaleTimeString()}</span>
+                        </div>
+                    )}
                     <div className="flex justify-between text-sm">
                         <span className="text-muted-foreground">Last Used</span>
                         <span>{key.last_used ? new Date(key.last_used).toLocaleDateString() : 'Never'}</span>
@@ -24,6 +24,10 @@ export interface AIKey {
   created_at: string;
   last_used?: string;
   error_count: number;
+  success_count: number;
+  token_count: number;
+  average_latency: number | null;
+  cooldown_until: string | null;
 }
 
 // AI Key Management Functions
@@ -64,16 +68,79 @@ export const uploadAIKeys = async (file: File) => {
     return response.data;
 };
 
+// Reads a server-sent event stream from a POST endpoint (EventSource only does GET).
+// Calls onToken for every `token` event and resolves with the full text.
+const streamSSE = async (
+  path: string,
+  body: Record<string, unknown>,
+  onToken: (text: string) => void,
+  signal?: AbortSignal
+): Promise<string> => {
+  const token = localStorage.getItem('auth_token');
+  const response = await fetch(`${api.defaults.baseURL}${path}`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      Accept: 'text/event-stream',
+      ...(token ? { Authorization: `Token ${token}` } : {}),
+    },
+    body: JSON.stringify(body),
+    signal,
+  });
+  if (!response.ok || !response.body) {
+    const data = await response.json().catch(() => ({}));
+    throw new Error(data.error || data.detail || `HTTP ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let text = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      const event = block.match(/^event: (.*)$/m)?.[1];
+      const data = JSON.parse(block.match(/^data: (.*)$/m)?.[1] || '{}');
+      if (event === 'token') {
+        text += data.text;
+        onToken(data.text);
+      } else if (event === 'error') {
+        throw new Error(data.error);
+      }
+    }
+  }
+  return text;
+};
+
 export const aiService = {
   // AI Writing Assistant
-  writeContent: async (topic: string, tone: string = 'professional', type: string = 'blog'): Promise<string> => {
-    const response = await api.post<{ content: string }>('/ai/write/', { topic, tone, type });
+  // refresh skips the server's cache of repeatable answers (excerpts, descriptions, analyses)
+  writeContent: async (topic: string, tone: string = 'professional', type: string = 'blog', refresh: boolean = false): Promise<string> => {
+    const response = await api.post<{ content: string }>('/ai/write/', { topic, tone, type, refresh });
     return response.data.content;
   },
 
+  // Streaming variant: tokens arrive through onToken as they are generated
+  streamWriteContent: (
+    topic: string,
+    onToken: (text: string) => void,
+    options: { tone?: string; type?: string; refresh?: boolean; signal?: AbortSignal } = {}
+  ): Promise<string> =>
+    streamSSE(
+      '/ai/write/stream/',
+      { topic, tone: options.tone || 'professional', type: options.type || 'blog', refresh: !!options.refresh },
+      onToken,
+      options.signal
+    ),
+
   // Analyze Message (Smart Inbox)
-  analyzeMessage: async (message: string, sender: string = ''): Promise<AIAnalysisResult> => {
-    const response = await api.post<AIAnalysisResult>('/ai/analyze-message/', { message, sender });
+  analyzeMessage: async (message: string, sender: string = '', refresh: boolean = false): Promise<AIAnalysisResult> => {
+    const response = await api.post<AIAnalysisResult>('/ai/analyze-message/', { message, sender, refresh });
     return response.data;
   },
 
@@ -83,9 +150,12 @@ export const aiService = {
     return response.data.response;
   },
 
+  streamChat: (query: string, onToken: (text: string) => void, context: string = '', signal?: AbortSignal): Promise<string> =>
+    streamSSE('/ai/chat/stream/', { query, context }, onToken, signal),
+
   // SEO Optimizer
-  optimizeSEO: async (content: string, keyword: string = ''): Promise<SEOAnalysisResult> => {
-    const response = await api.post<SEOAnalysisResult>('/ai/seo/', { content, keyword });
+  optimizeSEO: async (content: string, keyword: string = '', refresh: boolean = false): Promise<SEOAnalysisResult> => {
+    const response = await api.post<SEOAnalysisResult>('/ai/seo/', { content, keyword, refresh });
     return response.data;
   }
 };
@@ -1,5 +1,37 @@
 import { api } from '@/lib/api';
 
+export interface MediaAsset {
+  name: string;
+  path: string;
+  folder: string;
+  url: string;
+  size: number;
+  modified: number;
+  type: 'image' | 'video' | 'audio' | 'document' | 'file';
+  mime_type: string;
+  width: number | null;
+  height: number | null;
+  owners: string[];
+}
+
+export interface MediaPage {
+  results: MediaAsset[];
+  count: number;
+  page: number;
+  page_size: number;
+  total_pages: number;
+}
+
+export interface MediaListParams {
+  type?: MediaAsset['type'];
+  folder?: string;
+  prefix?: string;
+  date_from?: string;
+  date_to?: string;
+  page?: number;
+  page_size?: number;
+}
+
 export const mediaService = {
   upload: async (file: File): Promise<{ url: string }> => {
     const formData = new FormData();
@@ -13,8 +45,8 @@ export const mediaService = {
     return response.data;
   },
   
-  getList: async (): Promise<string[]> => {
-      const response = await api.get<string[]>('/media/list/');
+  getList: async (params: MediaListParams = {}): Promise<MediaPage> => {
+      const response = await api.get<MediaPage>('/media/list/', { params });
       return response.data;
   }
 };
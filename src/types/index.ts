@@ -249,4 +249,8 @@ export interface AIKey {
   created_at: string;
   last_used: string | null;
   error_count: number;
+  success_count: number;
+  token_count: number;
+  average_latency: number | null;
+  cooldown_until: string | null;
 }